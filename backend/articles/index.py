@@ -1,237 +1,1561 @@
 import json
 import os
+import io
+import re
+import csv
 import base64
-import boto3
+import random
 from uuid import uuid4
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from email.utils import format_datetime, parsedate_to_datetime
+import sys
+import gzip
+import hashlib
+import hmac
+import time
+import threading
+import traceback
+import itertools
+from contextlib import contextmanager
+from collections import Counter, OrderedDict
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INERROR
+from psycopg2.extras import RealDictCursor, Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 
-def get_db_connection():
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def upload_image_to_s3(image_data: str, filename: str) -> str:
-    s3 = boto3.client('s3',
-        endpoint_url='https://bucket.poehali.dev',
-        aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-        aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
-    )
+CATEGORIES = ('administrative', 'rights', 'laws', 'documents')
+ARTICLE_COLUMNS = 'id, title, content, category, tags, image_url, image_thumbnails, image_status, created_at, updated_at'
+SUMMARY_COLUMNS = 'id, title, category, tags, image_url, image_thumbnails, image_status, created_at, left(content, %s) AS excerpt'
+SUMMARY_EXCERPT_LENGTH = 200
+LIST_DEFAULT_LIMIT = 20
+LIST_MAX_LIMIT = 100
+SEARCH_LIMIT = 50
+SEARCH_HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2'
+TRIGRAM_THRESHOLD = 0.25
+CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', '300'))
+COLLECTION_CACHE_PARAMS = ('category', 'search', 'view', 'cursor', 'limit', 'since')
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, If-None-Match, If-Modified-Since, X-Auth-Token, Authorization, X-Min-LSN',
+    'Access-Control-Max-Age': '86400'
+}
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+S3_ENDPOINT_URL = 'https://bucket.poehali.dev'
+S3_BUCKET = 'files'
+IMAGE_KEY_PREFIX = 'articles/'
+IMAGE_KEY_RE = re.compile(r'articles/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_[\w.\-]{1,100}')
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+UPLOAD_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+UPLOAD_URL_TTL = 900
+THUMBNAIL_WIDTHS = (320, 640)
+THUMBNAIL_QUALITY = 80
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+IMAGE_JOB_MAX_ATTEMPTS = 5
+IMAGE_JOB_BACKOFF_BASE = 10
+IMAGE_JOB_BACKOFF_MAX = 3600
+IMAGE_JOB_BATCH_SIZE = 5
+IMAGE_WORKER_IDLE_SLEEP = 2
+IMAGE_TRIGGER_TIME_BUDGET = 45
+TRIGGER_EVENT_TYPES = (
+    'yandex.cloud.events.serverless.triggers.TimerMessage',
+    'yandex.cloud.events.messagequeue.QueueMessage',
+)
+IMPORT_FORMATS = ('ndjson', 'csv')
+IMPORT_MAX_ERRORS = 100
+IMPORT_TITLE_MAX_LENGTH = 500
+IMPORT_KEY_MAX_LENGTH = 50
+RELATED_TOP_K = 10
+RELATED_MIN_SCORE = 0.1
+RELATED_TITLE_WEIGHT = 3
+RELATED_TAG_WEIGHT = 3
+RELATED_STEM_LENGTH = 6
+RELATED_BLOCK_SIZE = 128
+RELATED_TOKEN_RE = re.compile(r'[0-9a-zа-яё]{3,}')
+RELATED_COLUMNS = 'a.id, a.title, a.category, a.tags, a.image_url, a.image_thumbnails, n.score'
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.environ.get('DB_POOL_ACQUIRE_TIMEOUT', '5'))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', '30'))
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', '5'))
+PRIMARY_READ_PARAMS = ()
+
+_db_pools = {}
+_db_pool_lock = threading.Lock()
+_db_pool_slots = {}
+_db_conn_urls = {}
+_db_last_used = {}
+_replica_turn = itertools.count()
+_replica_states = {}
+db_pool_stats = {'acquired': 0, 'reconnects': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0, 'replica_reads': 0, 'primary_fallbacks': 0}
+
+FUNCTION_NAME = 'articles'
+TRACE_LOG = os.environ.get('TRACE_LOG', '1') == '1'
+TRACE_SLOW_QUERY_MS = float(os.environ.get('TRACE_SLOW_QUERY_MS', '200'))
+TRACE_EXPLAIN_SLOW = os.environ.get('TRACE_EXPLAIN_SLOW', '0') == '1'
+
+_trace_local = threading.local()
+
+REVOCATION_REFRESH_INTERVAL = float(os.environ.get('REVOCATION_REFRESH_INTERVAL', '30'))
+
+_revoked_versions = {}
+_revocations_checked_at = 0.0
+_revocations_seen_until = None
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+response_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'stale': 0, 'invalidations': 0, 'bytes': 0}
+
+class LazyConnectionPool(ThreadedConnectionPool):
+    '''Соединения открываются по требованию, а возвращённые остаются в пуле до maxconn штук'''
+    
+    def __init__(self, maxconn: int, *args, **kwargs):
+        super().__init__(0, maxconn, *args, **kwargs)
+        self.minconn = maxconn
+    
+    def counts(self) -> tuple:
+        '''(открыто, выдано) — читает внутренние списки ThreadedConnectionPool под его же блокировкой'''
+        with self._lock:
+            return len(self._pool) + len(self._used), len(self._used)
+
+def get_db_pool(url: str = None) -> ThreadedConnectionPool:
+    '''Пул соединений живёт между тёплыми вызовами функции; у primary и каждой реплики свой пул'''
+    url = url or os.environ['DATABASE_URL']
+    pool = _db_pools.get(url)
+    if pool is None:
+        with _db_pool_lock:
+            pool = _db_pools.get(url)
+            if pool is None:
+                _db_pool_slots[url] = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+                pool = _db_pools[url] = LazyConnectionPool(DB_POOL_MAX_SIZE, url, cursor_factory=TracedCursor)
+    return pool
+
+def is_connection_healthy(conn) -> bool:
+    if conn.closed or conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+        return False
+    last_used = _db_last_used.get(id(conn))
+    if last_used is None or time.monotonic() - last_used < DB_POOL_PING_AFTER:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def get_db_connection(url: str = None):
+    url = url or os.environ['DATABASE_URL']
+    started = time.perf_counter()
+    pool = get_db_pool(url)
+    slots = _db_pool_slots[url]
+    if not slots.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT):
+        raise PoolError('Connection pool exhausted')
+    try:
+        conn = pool.getconn()
+        if not is_connection_healthy(conn):
+            _db_last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+            db_pool_stats['reconnects'] += 1
+    except Exception:
+        slots.release()
+        raise
+    _db_conn_urls[id(conn)] = url
+    wait_ms = (time.perf_counter() - started) * 1000
+    db_pool_stats['acquired'] += 1
+    db_pool_stats['wait_ms_total'] += wait_ms
+    db_pool_stats['wait_ms_max'] = max(db_pool_stats['wait_ms_max'], wait_ms)
+    return conn
+
+def release_db_connection(conn) -> None:
+    url = _db_conn_urls.pop(id(conn))
+    pool = _db_pools[url]
+    try:
+        if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        broken = bool(conn.closed)
+    except psycopg2.Error:
+        broken = True
+    try:
+        if broken:
+            _db_last_used.pop(id(conn), None)
+        else:
+            _db_last_used[id(conn)] = time.monotonic()
+        pool.putconn(conn, close=broken)
+    finally:
+        _db_pool_slots[url].release()
+
+def parse_lsn(value):
+    '''pg_lsn вида 16/B374D848 в число для сравнения; None для пустого или некорректного значения'''
+    try:
+        high, low = value.split('/')
+        return (int(high, 16) << 32) + int(low, 16)
+    except (AttributeError, ValueError):
+        return None
+
+def mark_replica_down(url: str) -> None:
+    _replica_states[url] = {'ok': False, 'lag_seconds': None, 'replay_lsn': None, 'checked_at': time.monotonic()}
+
+def check_replica(url: str, conn, min_lsn) -> bool:
+    '''Реплика годится, если отстаёт не больше REPLICA_MAX_LAG_SECONDS и уже проиграла WAL до min_lsn клиента'''
+    now = time.monotonic()
+    state = _replica_states.get(url)
+    if (
+        state is None
+        or now - state['checked_at'] >= REPLICA_CHECK_INTERVAL
+        or (min_lsn is not None and (state['replay_lsn'] or 0) < min_lsn)
+    ):
+        with conn.cursor() as cur:
+            cur.execute(
+                '''SELECT pg_last_wal_replay_lsn()::text,
+                          CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                               ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'''
+            )
+            replay_lsn, lag = cur.fetchone()
+        conn.rollback()
+        lag = float(lag) if lag is not None else None
+        state = _replica_states[url] = {
+            'ok': replay_lsn is not None and lag is not None and lag <= REPLICA_MAX_LAG_SECONDS,
+            'lag_seconds': lag,
+            'replay_lsn': parse_lsn(replay_lsn),
+            'checked_at': now
+        }
+    return state['ok'] and (min_lsn is None or state['replay_lsn'] >= min_lsn)
+
+def get_read_connection(min_lsn=None):
+    '''Реплики по кругу; отстающие и недоступные пропускаются до следующей проверки, в крайнем случае — primary'''
+    for _ in range(len(DATABASE_REPLICA_URLS)):
+        url = DATABASE_REPLICA_URLS[next(_replica_turn) % len(DATABASE_REPLICA_URLS)]
+        state = _replica_states.get(url)
+        if state and not state['ok'] and time.monotonic() - state['checked_at'] < REPLICA_CHECK_INTERVAL:
+            continue
+        try:
+            conn = get_db_connection(url)
+        except (psycopg2.Error, PoolError):
+            mark_replica_down(url)
+            continue
+        try:
+            usable = check_replica(url, conn, min_lsn)
+        except psycopg2.Error:
+            mark_replica_down(url)
+            usable = False
+        if usable:
+            db_pool_stats['replica_reads'] += 1
+            return conn
+        release_db_connection(conn)
+    db_pool_stats['primary_fallbacks'] += 1
+    return get_db_connection()
+
+def get_request_connection(event: dict):
+    '''GET читает с реплики; записи, long-poll и чтение после своей записи без догнавшей реплики — с primary'''
+    params = event.get('queryStringParameters') or {}
+    if (
+        not DATABASE_REPLICA_URLS
+        or event.get('httpMethod', 'GET') != 'GET'
+        or any(params.get(name) for name in PRIMARY_READ_PARAMS)
+    ):
+        return get_db_connection()
+    return get_read_connection(parse_lsn(get_request_header(event, 'X-Min-LSN')))
+
+def write_position_headers(cur) -> dict:
+    '''LSN после записи: клиент возвращает его в X-Min-LSN, и следующее чтение увидит эту запись'''
+    try:
+        cur.execute('SELECT pg_current_wal_lsn()::text AS lsn')
+        lsn = cur.fetchone()['lsn']
+    except psycopg2.Error:
+        return {}
+    return {'X-LSN': lsn, 'Access-Control-Expose-Headers': 'X-LSN'}
+
+def get_db_pool_stats() -> dict:
+    pool = _db_pools.get(os.environ.get('DATABASE_URL'))
+    open_count, in_use = pool.counts() if pool else (0, 0)
+    acquired = db_pool_stats['acquired']
+    return {
+        **db_pool_stats,
+        'open': open_count,
+        'in_use': in_use,
+        'max_size': DB_POOL_MAX_SIZE,
+        'wait_ms_avg': db_pool_stats['wait_ms_total'] / acquired if acquired else 0.0,
+        'replicas': [
+            {'ok': state['ok'], 'lag_seconds': state['lag_seconds']} if state else None
+            for state in map(_replica_states.get, DATABASE_REPLICA_URLS)
+        ]
+    }
+
+class RequestTrace:
+    '''Суммарное время по именованным участкам запроса и счётчики SQL'''
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.queries = 0
+        self.rows = 0
+    
+    def add(self, name: str, elapsed_ms: float) -> None:
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + elapsed_ms, count + 1)
     
-    image_bytes = base64.b64decode(image_data)
-    key = f'articles/{uuid4()}_{filename}'
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+    
+    def server_timing(self) -> str:
+        metrics = [f'{name};dur={total:.1f}' for name, (total, _) in self.spans.items()]
+        metrics.append(f'total;dur={self.elapsed_ms():.1f}')
+        return ', '.join(metrics)
+
+def current_trace():
+    return getattr(_trace_local, 'trace', None)
+
+@contextmanager
+def trace_span(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = current_trace()
+        if trace is not None:
+            trace.add(name, (time.perf_counter() - started) * 1000)
+
+def log_event(event: str, **fields) -> None:
+    if TRACE_LOG:
+        print(json.dumps({'event': event, 'function': FUNCTION_NAME, **fields}, ensure_ascii=False, default=str), flush=True)
+
+def explain_query(conn, query, vars) -> list:
+    '''План без выполнения запроса; под savepoint, чтобы ошибка EXPLAIN не сломала транзакцию обработчика'''
+    if conn.get_transaction_status() == TRANSACTION_STATUS_INERROR:
+        return None
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        cur.execute('SAVEPOINT trace_explain')
+        try:
+            cur.execute('EXPLAIN (FORMAT JSON) ' + query, vars)
+            plan = cur.fetchone()[0]
+            cur.execute('RELEASE SAVEPOINT trace_explain')
+            return plan
+        except psycopg2.Error:
+            cur.execute('ROLLBACK TO SAVEPOINT trace_explain')
+            return None
+
+def record_query(cursor, query, vars, elapsed_ms: float) -> None:
+    trace = current_trace()
+    if trace is None:
+        return
+    trace.add('sql', elapsed_ms)
+    trace.queries += 1
+    trace.rows += max(cursor.rowcount, 0)
     
-    s3.put_object(
-        Bucket='files',
-        Key=key,
-        Body=image_bytes,
-        ContentType='image/jpeg'
+    if elapsed_ms >= TRACE_SLOW_QUERY_MS:
+        text = query.decode() if isinstance(query, bytes) else str(query)
+        plan = None
+        if TRACE_EXPLAIN_SLOW and text.lstrip().upper().startswith(('SELECT', 'WITH')):
+            plan = explain_query(cursor.connection, text, vars)
+        log_event('slow_query', duration_ms=round(elapsed_ms, 1), rows=cursor.rowcount, query=' '.join(text.split()), plan=plan)
+
+class TracedCursorMixin:
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(self, query, vars, (time.perf_counter() - started) * 1000)
+
+class TracedCursor(TracedCursorMixin, psycopg2.extensions.cursor):
+    pass
+
+class TracedDictCursor(TracedCursorMixin, RealDictCursor):
+    pass
+
+def log_request(event: dict, trace: RequestTrace, response) -> None:
+    log_event(
+        'request',
+        request_id=(event.get('requestContext') or {}).get('requestId'),
+        method=event.get('httpMethod'),
+        status=response['statusCode'] if response else 500,
+        duration_ms=round(trace.elapsed_ms(), 1),
+        queries=trace.queries,
+        rows=trace.rows,
+        spans={name: {'ms': round(total, 1), 'count': count} for name, (total, count) in trace.spans.items()},
+        db_pool=get_db_pool_stats(),
+        response_cache=get_response_cache_stats()
     )
+
+def get_request_header(event: dict, name: str):
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def b64url_decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+def decode_token(token: str):
+    '''Проверяет HMAC-подпись и срок действия токена локально, без запроса к БД'''
+    try:
+        payload_part, signature_part = token.split('.')
+        expected = hmac.new(os.environ['AUTH_TOKEN_SECRET'].encode(), payload_part.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, b64url_decode(signature_part)):
+            return None
+        payload = json.loads(b64url_decode(payload_part))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(payload, dict) or payload.get('exp', 0) < time.time():
+        return None
+    return payload
+
+def refresh_revocations(conn) -> None:
+    '''Раз в REVOCATION_REFRESH_INTERVAL подтягивает отозванные версии токенов, изменившиеся с прошлой проверки'''
+    global _revocations_checked_at, _revocations_seen_until
+    now = time.monotonic()
+    if now - _revocations_checked_at < REVOCATION_REFRESH_INTERVAL:
+        return
     
-    return f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{key}"
+    with conn.cursor() as cur:
+        if _revocations_seen_until is None:
+            cur.execute('SELECT id, token_version, token_revoked_at FROM t_p18143168_police_reminder_app.users WHERE token_revoked_at IS NOT NULL')
+        else:
+            cur.execute(
+                "SELECT id, token_version, token_revoked_at FROM t_p18143168_police_reminder_app.users WHERE token_revoked_at > %s - INTERVAL '1 minute'",
+                (_revocations_seen_until,)
+            )
+        for user_id, token_version, revoked_at in cur.fetchall():
+            _revoked_versions[user_id] = token_version
+            if _revocations_seen_until is None or revoked_at > _revocations_seen_until:
+                _revocations_seen_until = revoked_at
+    _revocations_checked_at = now
 
-def handler(event: dict, context) -> dict:
-    '''API для управления статьями памятки полицейского'''
-    method = event.get('httpMethod', 'GET')
+def authenticate(event: dict, conn):
+    '''Данные пользователя из токена X-Auth-Token (или Authorization: Bearer) либо None'''
+    token = get_request_header(event, 'X-Auth-Token')
+    if not token:
+        authorization = get_request_header(event, 'Authorization') or ''
+        token = authorization[7:] if authorization.startswith('Bearer ') else None
+    if not token:
+        return None
+    
+    payload = decode_token(token)
+    if not payload:
+        return None
+    
+    refresh_revocations(conn)
+    if payload.get('ver', 0) < _revoked_versions.get(payload.get('sub'), 0):
+        return None
+    return payload
+
+def require_admin(event: dict, conn) -> dict:
+    auth = authenticate(event, conn)
+    if not auth:
+        raise HttpError(401, 'Требуется авторизация')
+    if not auth.get('adm'):
+        raise HttpError(403, 'Недостаточно прав')
+    return auth
+
+class HttpError(Exception):
+    '''Ошибка с HTTP-статусом, которую dispatch превращает в единый JSON-ответ'''
+    
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def encode_json(data) -> str:
+    with trace_span('json_encode'):
+        if orjson is not None:
+            return orjson.dumps(data, default=json_default).decode()
+        return json.dumps(data, ensure_ascii=False, default=json_default, separators=(',', ':'))
+
+def raw_json_response(body: str, status: int = 200, headers: dict = None) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+def json_response(data, status: int = 200, headers: dict = None) -> dict:
+    return raw_json_response(encode_json(data), status, headers)
+
+def error_response(status: int, message: str, headers: dict = None) -> dict:
+    return json_response({'error': message}, status, headers)
+
+def parse_json_body(event: dict) -> dict:
+    '''Тело запроса как JSON-объект; пустое или отсутствующее тело — пустой объект'''
+    try:
+        data = json.loads(event.get('body') or '{}')
+    except ValueError:
+        raise HttpError(400, 'Invalid JSON body')
+    if not isinstance(data, dict):
+        raise HttpError(400, 'JSON body must be an object')
+    return data
+
+def parse_int(value, name: str) -> int:
+    '''Целое из query-параметра или поля тела; мусор и чужой тип — 400, а не 500'''
+    if isinstance(value, bool):
+        raise HttpError(400, f'{name} must be an integer')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f'{name} must be an integer')
+
+def compress_response(event: dict, response: dict) -> dict:
+    '''gzip для тел больше GZIP_MIN_BYTES, если клиент его принимает'''
+    body = response['body']
+    if response['isBase64Encoded'] or len(body) < GZIP_MIN_BYTES or 'Content-Encoding' in response['headers']:
+        return response
+    if 'gzip' not in (get_request_header(event, 'Accept-Encoding') or ''):
+        return response
     
+    response['headers'] = {**response['headers'], 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
+    with trace_span('gzip'):
+        response['body'] = base64.b64encode(gzip.compress(body.encode(), compresslevel=GZIP_LEVEL)).decode()
+    response['isBase64Encoded'] = True
+    return response
+
+def dispatch(event: dict, routes: dict) -> dict:
+    '''Общий путь запроса: preflight, маршрут по методу, соединение из пула, единые ошибки, сжатие, трассировка'''
+    method = event.get('httpMethod', 'GET')
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return {'statusCode': 200, 'headers': PREFLIGHT_HEADERS, 'body': '', 'isBase64Encoded': False}
     
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    route = routes.get(method)
+    if route is None:
+        return error_response(405, 'Method not allowed')
     
+    trace = RequestTrace()
+    _trace_local.trace = trace
+    response = None
     try:
-        if method == 'GET':
-            params = event.get('queryStringParameters') or {}
-            article_id = params.get('id')
-            category = params.get('category')
-            search = params.get('search')
-            
-            if article_id:
-                cursor.execute('SELECT * FROM t_p18143168_police_reminder_app.articles WHERE id = %s', (article_id,))
-                article = cursor.fetchone()
-                if article:
-                    return {
-                        'statusCode': 200,
-                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'body': json.dumps(dict(article), ensure_ascii=False),
-                        'isBase64Encoded': False
-                    }
-                return {
-                    'statusCode': 404,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Article not found'}, ensure_ascii=False),
-                    'isBase64Encoded': False
-                }
-            
-            query = 'SELECT * FROM t_p18143168_police_reminder_app.articles WHERE 1=1'
-            query_params = []
-            
-            if category:
-                query += ' AND category = %s'
-                query_params.append(category)
-            
-            if search:
-                query += ' AND (title ILIKE %s OR content ILIKE %s OR %s = ANY(tags))'
-                search_pattern = f'%{search}%'
-                query_params.extend([search_pattern, search_pattern, search])
-            
-            query += ' ORDER BY created_at DESC'
-            
-            cursor.execute(query, query_params)
-            articles = cursor.fetchall()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps([dict(a) for a in articles], ensure_ascii=False, default=str),
-                'isBase64Encoded': False
-            }
-        
-        elif method == 'POST':
-            data = json.loads(event.get('body', '{}'))
-            title = data.get('title')
-            content = data.get('content')
-            category = data.get('category')
-            tags = data.get('tags', [])
-            image_data = data.get('image')
-            filename = data.get('filename', 'image.jpg')
-            
-            if not all([title, content, category]):
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Missing required fields'}, ensure_ascii=False),
-                    'isBase64Encoded': False
-                }
-            
-            image_url = None
-            if image_data:
-                image_url = upload_image_to_s3(image_data, filename)
-            
+        try:
+            with trace_span('db_connect'):
+                conn = get_request_connection(event)
+        except (psycopg2.Error, PoolError) as e:
+            log_event('db_unavailable', error=str(e))
+            response = error_response(503, 'Database unavailable', {'Retry-After': '1'})
+        except Exception as e:
+            log_event('request_failed', error=repr(e), traceback=traceback.format_exc())
+            response = error_response(500, 'Internal server error')
+        else:
+            cursor = conn.cursor(cursor_factory=TracedDictCursor)
+            try:
+                response = route(event, conn, cursor)
+                if DATABASE_REPLICA_URLS and method != 'GET' and response['statusCode'] < 400:
+                    response['headers'] = {**response['headers'], **write_position_headers(cursor)}
+            except HttpError as e:
+                response = error_response(e.status, e.message, e.headers)
+            except psycopg2.DataError as e:
+                response = error_response(400, e.diag.message_primary or 'Invalid value')
+            except Exception as e:
+                log_event('request_failed', error=repr(e), traceback=traceback.format_exc())
+                response = error_response(500, 'Internal server error')
+            finally:
+                cursor.close()
+                release_db_connection(conn)
+        response = compress_response(event, response)
+    finally:
+        _trace_local.trace = None
+        log_request(event, trace, response)
+    
+    response['headers'] = {**response['headers'], 'Server-Timing': trace.server_timing(), 'Timing-Allow-Origin': '*'}
+    return response
+
+def get_s3_client():
+    '''Клиент S3 создаётся один раз на экземпляр функции; boto3 импортируется только здесь —
+    его импорт стоит сотни миллисекунд, а GET-запросам S3 не нужен'''
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
+                _s3_client = boto3.client('s3',
+                    endpoint_url=S3_ENDPOINT_URL,
+                    aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
+                    aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
+                )
+    return _s3_client
+
+def cdn_url(key: str) -> str:
+    return f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{key}"
+
+def new_image_key(filename: str) -> str:
+    safe_name = re.sub(r'[^\w.\-]', '_', os.path.basename(filename or '') or 'image')[-100:]
+    return f'{IMAGE_KEY_PREFIX}{uuid4()}_{safe_name}'
+
+def sniff_image_type(image_bytes: bytes):
+    '''Определяет MIME-тип по сигнатуре файла, а не по расширению'''
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, content_type in IMAGE_SIGNATURES:
+        if image_bytes.startswith(signature):
+            return content_type
+    return None
+
+def upload_image_to_s3(image_bytes: bytes, filename: str) -> str:
+    content_type = sniff_image_type(image_bytes)
+    if not content_type:
+        raise HttpError(400, 'Unsupported image format')
+    
+    key = new_image_key(filename)
+    with trace_span('s3_put'):
+        get_s3_client().put_object(
+            Bucket=S3_BUCKET,
+            Key=key,
+            Body=image_bytes,
+            ContentType=content_type,
+            CacheControl=IMMUTABLE_CACHE_CONTROL
+        )
+    return key
+
+def make_thumbnails(image_bytes: bytes, key: str) -> dict:
+    '''Генерирует WebP-превью фиксированной ширины рядом с оригиналом'''
+    from PIL import Image, ImageOps
+    
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    
+    base_key = key.rsplit('.', 1)[0]
+    thumbnails = {}
+    for width in THUMBNAIL_WIDTHS:
+        with trace_span('thumbnail'):
+            thumbnail = image.copy()
+            thumbnail.thumbnail((width, width * 4))
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+        thumbnail_key = f'{base_key}_w{width}.webp'
+        with trace_span('s3_put'):
+            get_s3_client().put_object(
+                Bucket=S3_BUCKET,
+                Key=thumbnail_key,
+                Body=buffer.getvalue(),
+                ContentType='image/webp',
+                CacheControl=IMMUTABLE_CACHE_CONTROL
+            )
+        thumbnails[str(width)] = cdn_url(thumbnail_key)
+    return thumbnails
+
+def create_upload_url(filename: str, content_type: str) -> dict:
+    key = new_image_key(filename)
+    upload_url = get_s3_client().generate_presigned_url(
+        'put_object',
+        Params={'Bucket': S3_BUCKET, 'Key': key, 'ContentType': content_type},
+        ExpiresIn=UPLOAD_URL_TTL
+    )
+    return {'upload_url': upload_url, 'image_key': key, 'image_url': cdn_url(key), 'expires_in': UPLOAD_URL_TTL}
+
+def prepare_image_job(data: dict):
+    '''Проверяет изображение из запроса и возвращает задание для очереди. В очередь попадает только
+    ключ S3: base64 из старых клиентов сначала загружается в бакет как оригинал'''
+    if data.get('image_key'):
+        key = data['image_key']
+        if not isinstance(key, str) or not IMAGE_KEY_RE.fullmatch(key):
+            raise HttpError(400, 'Invalid image key')
+        return {'image_key': key}
+    
+    if data.get('image'):
+        filename = data.get('filename') or 'image.jpg'
+        if not isinstance(data['image'], str) or not isinstance(filename, str):
+            raise HttpError(400, 'image and filename must be strings')
+        try:
+            image_bytes = base64.b64decode(data['image'])
+        except ValueError:
+            raise HttpError(400, 'image must be base64')
+        return {'image_key': upload_image_to_s3(image_bytes, filename)}
+    
+    return None
+
+def enqueue_image_job(cursor, article_id, job: dict) -> None:
+    '''Ставит задание в очередь, отменяя ещё не взятые задания для той же статьи'''
+    cursor.execute(
+        '''UPDATE t_p18143168_police_reminder_app.image_jobs SET status = 'cancelled', image_data = NULL, updated_at = CURRENT_TIMESTAMP
+           WHERE id IN (
+               SELECT id FROM t_p18143168_police_reminder_app.image_jobs
+               WHERE article_id = %s AND status = 'pending'
+               FOR UPDATE SKIP LOCKED
+           )''',
+        (article_id,)
+    )
+    cursor.execute(
+        'INSERT INTO t_p18143168_police_reminder_app.image_jobs (article_id, image_key, max_attempts) VALUES (%s, %s, %s)',
+        (article_id, job['image_key'], IMAGE_JOB_MAX_ATTEMPTS)
+    )
+
+def process_image_job(job: dict) -> dict:
+    if job['image_key']:
+        key = job['image_key']
+        with trace_span('s3_get'):
+            image_bytes = get_s3_client().get_object(Bucket=S3_BUCKET, Key=key)['Body'].read()
+        if not sniff_image_type(image_bytes):
+            raise ValueError('Unsupported image format')
+    else:
+        # Задания, поставленные до V0019, ещё несут байты в image_data
+        image_bytes = bytes(job['image_data'])
+        key = upload_image_to_s3(image_bytes, job['filename'])
+    
+    return {'image_url': cdn_url(key), 'image_thumbnails': make_thumbnails(image_bytes, key)}
+
+def fail_image_job(conn, cursor, job: dict, error: Exception) -> None:
+    '''Планирует повтор с экспоненциальной задержкой или переводит задание в dead-letter'''
+    conn.rollback()
+    cursor.execute(
+        'SELECT id, article_id, attempts, max_attempts FROM t_p18143168_police_reminder_app.image_jobs WHERE id = %s AND status = %s FOR UPDATE',
+        (job['id'], 'pending')
+    )
+    job = cursor.fetchone()
+    if not job:
+        conn.rollback()
+        return
+    
+    attempts = job['attempts'] + 1
+    dead = attempts >= job['max_attempts']
+    delay = min(IMAGE_JOB_BACKOFF_BASE * 2 ** (attempts - 1), IMAGE_JOB_BACKOFF_MAX) * random.uniform(0.8, 1.2)
+    cursor.execute(
+        '''UPDATE t_p18143168_police_reminder_app.image_jobs
+           SET attempts = %s, status = %s, last_error = %s,
+               run_after = CURRENT_TIMESTAMP + %s * INTERVAL '1 second', updated_at = CURRENT_TIMESTAMP
+           WHERE id = %s''',
+        (attempts, 'dead' if dead else 'pending', str(error)[:2000], delay, job['id'])
+    )
+    if dead:
+        cursor.execute(
+            "UPDATE t_p18143168_police_reminder_app.articles SET image_status = 'failed' WHERE id = %s",
+            (job['article_id'],)
+        )
+    conn.commit()
+
+def process_image_jobs(conn, limit: int = IMAGE_JOB_BATCH_SIZE) -> dict:
+    '''Обрабатывает до limit готовых заданий; строки блокируются через SKIP LOCKED, поэтому воркеров может быть несколько'''
+    cursor = conn.cursor(cursor_factory=TracedDictCursor)
+    stats = {'done': 0, 'failed': 0}
+    try:
+        for _ in range(limit):
             cursor.execute(
-                'INSERT INTO t_p18143168_police_reminder_app.articles (title, content, category, tags, image_url) VALUES (%s, %s, %s, %s, %s) RETURNING *',
-                (title, content, category, tags, image_url)
+                '''SELECT * FROM t_p18143168_police_reminder_app.image_jobs
+                   WHERE status = 'pending' AND run_after <= CURRENT_TIMESTAMP
+                   ORDER BY run_after
+                   LIMIT 1
+                   FOR UPDATE SKIP LOCKED'''
             )
-            article = cursor.fetchone()
-            conn.commit()
+            job = cursor.fetchone()
+            if not job:
+                conn.rollback()
+                break
             
-            return {
-                'statusCode': 201,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps(dict(article), ensure_ascii=False, default=str),
-                'isBase64Encoded': False
-            }
+            try:
+                image = process_image_job(job)
+                cursor.execute(
+                    '''UPDATE t_p18143168_police_reminder_app.articles
+                       SET image_url = %s, image_thumbnails = %s, image_status = 'ready', updated_at = CURRENT_TIMESTAMP
+                       WHERE id = %s''',
+                    (image['image_url'], Json(image['image_thumbnails']), job['article_id'])
+                )
+                cursor.execute(
+                    "UPDATE t_p18143168_police_reminder_app.image_jobs SET status = 'done', image_data = NULL, attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+                    (job['id'],)
+                )
+                conn.commit()
+                stats['done'] += 1
+            except Exception as e:
+                fail_image_job(conn, cursor, job, e)
+                stats['failed'] += 1
+    finally:
+        cursor.close()
+    return stats
+
+def is_trigger_event(event: dict) -> bool:
+    '''Вызов от таймера или очереди сообщений, а не HTTP-запрос'''
+    messages = event.get('messages') if 'httpMethod' not in event else None
+    return bool(messages) and all(
+        (message.get('event_metadata') or {}).get('event_type') in TRIGGER_EVENT_TYPES for message in messages
+    )
+
+def run_background_trigger() -> dict:
+    '''Разбирает очередь изображений пачками, пока она не опустеет или не выйдет бюджет времени вызова, затем пересчитывает похожие статьи из очереди'''
+    deadline = time.monotonic() + IMAGE_TRIGGER_TIME_BUDGET
+    totals = {'done': 0, 'failed': 0}
+    related = {'skipped': True}
+    trace = RequestTrace()
+    conn = get_db_connection()
+    _trace_local.trace = trace
+    try:
+        while time.monotonic() < deadline:
+            stats = process_image_jobs(conn)
+            totals['done'] += stats['done']
+            totals['failed'] += stats['failed']
+            if stats['done'] + stats['failed'] < IMAGE_JOB_BATCH_SIZE:
+                break
+        if time.monotonic() < deadline:
+            related = recompute_related(conn)
+    finally:
+        _trace_local.trace = None
+        release_db_connection(conn)
+    log_event('image_jobs', **totals, queries=trace.queries, duration_ms=round(trace.elapsed_ms(), 1))
+    log_event('related', **related)
+    body = json.dumps({**totals, 'related': related})
+    return {'statusCode': 200, 'headers': {'Content-Type': 'application/json'}, 'body': body, 'isBase64Encoded': False}
+
+def run_image_worker() -> None:
+    '''Долгоживущий воркер очереди изображений для запуска вне облачной функции'''
+    while True:
+        conn = get_db_connection()
+        try:
+            stats = process_image_jobs(conn)
+        finally:
+            release_db_connection(conn)
+        if not stats['done'] and not stats['failed']:
+            time.sleep(IMAGE_WORKER_IDLE_SLEEP)
+
+def import_text(record: dict, field: str, types: tuple = (str,)) -> str:
+    '''Поле записи импорта как строка: чужой тип и NUL (его не примет TEXT) — ошибка строки, а не всего запроса'''
+    value = record.get(field)
+    if value is None:
+        return ''
+    if isinstance(value, bool) or not isinstance(value, types):
+        raise ValueError(f'{field} must be a string')
+    value = str(value)
+    if '\x00' in value:
+        raise ValueError(f'{field} must not contain NUL characters')
+    return value
+
+def validate_import_record(record) -> tuple:
+    if not isinstance(record, dict):
+        raise ValueError('Expected an object')
+    code = import_text(record, 'code', (str, int)).strip()
+    number = import_text(record, 'number', (str, int)).strip()
+    title = import_text(record, 'title').strip()
+    content = import_text(record, 'content')
+    category = record.get('category')
+    tags = record.get('tags') or []
+    
+    if not code or not number:
+        raise ValueError('code and number are required')
+    if len(code) > IMPORT_KEY_MAX_LENGTH or len(number) > IMPORT_KEY_MAX_LENGTH:
+        raise ValueError(f'code and number must be at most {IMPORT_KEY_MAX_LENGTH} characters')
+    if not title or not content.strip():
+        raise ValueError('title and content are required')
+    if len(title) > IMPORT_TITLE_MAX_LENGTH:
+        raise ValueError(f'title must be at most {IMPORT_TITLE_MAX_LENGTH} characters')
+    if not isinstance(category, str) or category not in CATEGORIES:
+        raise ValueError(f'Unknown category: {category}')
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(';') if tag.strip()]
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError('tags must be a list of strings')
+    if any('\x00' in tag for tag in tags):
+        raise ValueError('tags must not contain NUL characters')
+    return code, number, title, content, category, tags
+
+def copy_escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def iter_import_copy_lines(lines, fmt: str, report: dict):
+    '''Проверяет записи по одной и отдаёт строки в текстовом формате COPY; ошибки копятся в отчёте'''
+    reader = csv.DictReader(lines) if fmt == 'csv' else lines
+    for index, record in enumerate(reader, start=1):
+        line = reader.line_num if fmt == 'csv' else index
+        if fmt == 'ndjson' and not record.strip():
+            continue
+        report['received'] += 1
+        try:
+            values = validate_import_record(json.loads(record) if fmt == 'ndjson' else record)
+        except ValueError as e:
+            report['error_count'] += 1
+            if len(report['errors']) < IMPORT_MAX_ERRORS:
+                report['errors'].append({'line': line, 'error': str(e)})
+            continue
+        code, number, title, content, category, tags = values
+        fields = (str(line), code, number, title, content, category, json.dumps(tags, ensure_ascii=False))
+        yield '\t'.join(copy_escape(field) for field in fields) + '\n'
+
+class CopyStream:
+    '''Файлоподобная обёртка над генератором строк для copy_expert: данные не собираются в памяти целиком'''
+    
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = b''
+    
+    def read(self, size: int = -1) -> bytes:
+        parts = [self.buffer]
+        available = len(self.buffer)
+        while size < 0 or available < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            encoded = chunk.encode()
+            parts.append(encoded)
+            available += len(encoded)
+        data = b''.join(parts)
+        if size < 0:
+            self.buffer = b''
+            return data
+        self.buffer = data[size:]
+        return data[:size]
+
+def import_articles(conn, lines, fmt: str = 'ndjson') -> dict:
+    '''Массовый импорт: COPY во временную таблицу и одно слияние по (source_code, source_number)'''
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError('Unsupported import format')
+    
+    report = {'received': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'duplicates': 0, 'error_count': 0, 'errors': []}
+    with conn.cursor() as cur:
+        cur.execute(
+            '''CREATE TEMP TABLE article_import (
+                   line INTEGER, source_code TEXT, source_number TEXT, title TEXT, content TEXT, category TEXT, tags TEXT
+               ) ON COMMIT DROP'''
+        )
+        with trace_span('copy'):
+            cur.copy_expert('COPY article_import FROM STDIN', CopyStream(iter_import_copy_lines(lines, fmt, report)))
+        cur.execute('SELECT count(*) - count(DISTINCT (source_code, source_number)), count(DISTINCT (source_code, source_number)) FROM article_import')
+        report['duplicates'], distinct = cur.fetchone()
         
-        elif method == 'PUT':
-            data = json.loads(event.get('body', '{}'))
-            article_id = data.get('id')
-            
-            if not article_id:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Article ID is required'}, ensure_ascii=False),
-                    'isBase64Encoded': False
-                }
-            
-            updates = []
-            params = []
-            
-            if 'title' in data:
-                updates.append('title = %s')
-                params.append(data['title'])
-            if 'content' in data:
-                updates.append('content = %s')
-                params.append(data['content'])
-            if 'category' in data:
-                updates.append('category = %s')
-                params.append(data['category'])
-            if 'tags' in data:
-                updates.append('tags = %s')
-                params.append(data['tags'])
-            if 'image' in data and data['image']:
-                image_url = upload_image_to_s3(data['image'], data.get('filename', 'image.jpg'))
-                updates.append('image_url = %s')
-                params.append(image_url)
-            
-            updates.append('updated_at = CURRENT_TIMESTAMP')
-            params.append(article_id)
-            
-            query = f'UPDATE t_p18143168_police_reminder_app.articles SET {", ".join(updates)} WHERE id = %s RETURNING *'
-            cursor.execute(query, params)
-            article = cursor.fetchone()
-            conn.commit()
-            
-            if article:
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps(dict(article), ensure_ascii=False, default=str),
-                    'isBase64Encoded': False
-                }
-            
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Article not found'}, ensure_ascii=False),
-                'isBase64Encoded': False
-            }
+        cur.execute(
+            '''INSERT INTO t_p18143168_police_reminder_app.articles (source_code, source_number, title, content, category, tags)
+               SELECT DISTINCT ON (source_code, source_number)
+                      source_code, source_number, title, content, category, ARRAY(SELECT jsonb_array_elements_text(tags::jsonb))
+               FROM article_import
+               ORDER BY source_code, source_number, line DESC
+               ON CONFLICT (source_code, source_number) DO UPDATE
+               SET title = EXCLUDED.title, content = EXCLUDED.content, category = EXCLUDED.category,
+                   tags = EXCLUDED.tags, updated_at = CURRENT_TIMESTAMP
+               WHERE (articles.title, articles.content, articles.category, articles.tags)
+                     IS DISTINCT FROM (EXCLUDED.title, EXCLUDED.content, EXCLUDED.category, EXCLUDED.tags)
+               RETURNING xmax = 0'''
+        )
+        merged = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    
+    report['inserted'] = sum(merged)
+    report['updated'] = len(merged) - report['inserted']
+    report['unchanged'] = distinct - len(merged)
+    if merged:
+        invalidate_response_cache()
+    return report
+
+def similarity_tokens(text: str) -> list:
+    '''Слова от трёх букв, обрезанные до RELATED_STEM_LENGTH: грубая замена стеммингу для падежных окончаний'''
+    return [token[:RELATED_STEM_LENGTH] for token in RELATED_TOKEN_RE.findall(text.lower())]
+
+def build_similarity_matrix(conn) -> tuple:
+    '''TF-IDF по заголовку, тегам и тексту всех статей: разреженная матрица с L2-нормированными строками'''
+    import numpy as np
+    from scipy import sparse
+    
+    ids, rows, cols, counts = [], [], [], []
+    vocabulary = {}
+    with conn.cursor(name='similarity_corpus') as cur:
+        cur.itersize = 2000
+        cur.execute('SELECT id, title, content, tags FROM t_p18143168_police_reminder_app.articles ORDER BY id')
+        for article_id, title, content, tags in cur:
+            terms = Counter(similarity_tokens(content))
+            for token in similarity_tokens(title):
+                terms[token] += RELATED_TITLE_WEIGHT
+            for token in similarity_tokens(' '.join(tags or [])):
+                terms[token] += RELATED_TAG_WEIGHT
+            row = len(ids)
+            ids.append(article_id)
+            for token, count in terms.items():
+                rows.append(row)
+                cols.append(vocabulary.setdefault(token, len(vocabulary)))
+                counts.append(count)
+    
+    matrix = sparse.csr_matrix((np.asarray(counts, dtype=np.float32), (rows, cols)), shape=(len(ids), len(vocabulary)))
+    matrix.data = 1 + np.log(matrix.data)
+    document_frequency = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = (np.log((1 + len(ids)) / (1 + document_frequency)) + 1).astype(np.float32)
+    matrix = matrix @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return ids, (sparse.diags(1 / norms) @ matrix).tocsr()
+
+def similarity_blocks(matrix, positions: list):
+    '''Косинусная близость блоков строк ко всем статьям; плотный блок ограничен RELATED_BLOCK_SIZE строками'''
+    transposed = matrix.T.tocsc()
+    for start in range(0, len(positions), RELATED_BLOCK_SIZE):
+        block = positions[start:start + RELATED_BLOCK_SIZE]
+        yield block, (matrix[block] @ transposed).toarray()
+
+def top_neighbors(ids: list, matrix, targets: list) -> list:
+    '''Строки (article_id, rank, neighbor_id, score) для RELATED_TOP_K ближайших соседей каждой статьи из targets'''
+    import numpy as np
+    
+    k = min(RELATED_TOP_K, len(ids) - 1)
+    if k <= 0:
+        return []
+    neighbors = []
+    for block, scores in similarity_blocks(matrix, targets):
+        scores[np.arange(len(block)), block] = 0
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for row, article in enumerate(block):
+            ranked = [other for other in top[row][np.argsort(-scores[row, top[row]])] if scores[row, other] >= RELATED_MIN_SCORE]
+            neighbors.extend((ids[article], rank, ids[other], float(scores[row, other])) for rank, other in enumerate(ranked))
+    return neighbors
+
+def recompute_related(conn, full: bool = False) -> dict:
+    '''Пересчёт соседей для статей из очереди (или всех при full) и статей, в чей топ они теперь попадают'''
+    import numpy as np
+    
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_xact_lock(hashtext('article_neighbors'))")
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            return {'skipped': True}
         
-        elif method == 'DELETE':
-            params = event.get('queryStringParameters') or {}
-            article_id = params.get('id')
-            
-            if not article_id:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Article ID is required'}, ensure_ascii=False),
-                    'isBase64Encoded': False
-                }
-            
-            cursor.execute('DELETE FROM t_p18143168_police_reminder_app.articles WHERE id = %s RETURNING id', (article_id,))
-            deleted = cursor.fetchone()
+        cur.execute('DELETE FROM t_p18143168_police_reminder_app.article_similarity_queue RETURNING article_id')
+        dirty = {row[0] for row in cur.fetchall()}
+        if not dirty and not full:
             conn.commit()
-            
-            if deleted:
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'message': 'Article deleted successfully'}, ensure_ascii=False),
-                    'isBase64Encoded': False
-                }
-            
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Article not found'}, ensure_ascii=False),
-                'isBase64Encoded': False
-            }
+            return {'recomputed': 0}
         
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}, ensure_ascii=False),
-            'isBase64Encoded': False
-        }
+        ids, matrix = build_similarity_matrix(conn)
+        position = {article_id: i for i, article_id in enumerate(ids)}
+        if full:
+            targets = list(range(len(ids)))
+        else:
+            targets = sorted(position[article_id] for article_id in dirty if article_id in position)
+            cur.execute('SELECT article_id, count(*), min(score) FROM t_p18143168_police_reminder_app.article_neighbors GROUP BY article_id')
+            thresholds = np.full(len(ids), RELATED_MIN_SCORE, dtype=np.float32)
+            for article_id, count, min_score in cur.fetchall():
+                if count >= RELATED_TOP_K and article_id in position:
+                    thresholds[position[article_id]] = max(min_score, RELATED_MIN_SCORE)
+            affected = set(targets)
+            for _, scores in similarity_blocks(matrix, targets):
+                affected.update(np.nonzero((scores > thresholds).any(axis=0))[0].tolist())
+            targets = sorted(affected)
+        
+        neighbors = top_neighbors(ids, matrix, targets)
+        cur.execute(
+            'DELETE FROM t_p18143168_police_reminder_app.article_neighbors WHERE article_id = ANY(%s)',
+            ([ids[p] for p in targets],)
+        )
+        execute_values(
+            cur,
+            'INSERT INTO t_p18143168_police_reminder_app.article_neighbors (article_id, rank, neighbor_id, score) VALUES %s',
+            neighbors,
+            page_size=1000
+        )
+    conn.commit()
+    return {'recomputed': len(targets), 'articles': len(ids), 'neighbors': len(neighbors)}
+
+def get_related_articles(cursor, article_id) -> list:
+    '''Похожие статьи одним запросом по первичному ключу article_neighbors'''
+    cursor.execute(
+        f'''SELECT {RELATED_COLUMNS}
+            FROM t_p18143168_police_reminder_app.article_neighbors n
+            JOIN t_p18143168_police_reminder_app.articles a ON a.id = n.neighbor_id
+            WHERE n.article_id = %s
+            ORDER BY n.rank''',
+        (article_id,)
+    )
+    return cursor.fetchall()
+
+def search_articles(cursor, search: str, category=None, limit: int = SEARCH_LIMIT) -> list:
+    '''Полнотекстовый поиск с ранжированием и сниппетами, при пустом результате — по триграммам'''
+    category_filter = ' AND category = %s' if category else ''
+    category_params = [category] if category else []
     
-    except Exception as e:
-        conn.rollback()
+    cursor.execute(
+        f'''SELECT {ARTICLE_COLUMNS},
+               ts_rank(search_vector, q) AS rank,
+               ts_headline('russian', content, q, %s) AS snippet
+           FROM t_p18143168_police_reminder_app.articles, websearch_to_tsquery('russian', %s) q
+           WHERE search_vector @@ q{category_filter}
+           ORDER BY rank DESC, created_at DESC
+           LIMIT %s''',
+        [SEARCH_HEADLINE_OPTIONS, search, *category_params, limit]
+    )
+    articles = cursor.fetchall()
+    if articles:
+        return articles
+    
+    # Оператор <% сравнивает с pg_trgm.word_similarity_threshold (по умолчанию 0.6), поэтому порог задаётся на транзакцию
+    cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", (str(TRIGRAM_THRESHOLD),))
+    cursor.execute(
+        f'''SELECT {ARTICLE_COLUMNS},
+               word_similarity(lower(%s), lower(title)) AS rank,
+               NULL AS snippet
+           FROM t_p18143168_police_reminder_app.articles
+           WHERE lower(%s) <%% lower(title){category_filter}
+           ORDER BY rank DESC, created_at DESC
+           LIMIT %s''',
+        [search, search, *category_params, limit]
+    )
+    return cursor.fetchall()
+
+def parse_limit(value, default: int, maximum: int) -> int:
+    '''limit из query-параметра, зажатый в [1, maximum]'''
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, 'limit должен быть целым числом')
+    return max(1, min(limit, maximum))
+
+def encode_cursor(article: dict) -> str:
+    raw = f"{article['created_at'].isoformat()}|{article['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, article_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return created_at, int(article_id)
+    except ValueError:
+        raise HttpError(400, 'Invalid cursor')
+
+def list_article_summaries(cursor, category=None, after=None, limit: int = LIST_DEFAULT_LIMIT) -> dict:
+    '''Страница кратких карточек статей с keyset-курсором по (created_at, id)'''
+    query = f'SELECT {SUMMARY_COLUMNS} FROM t_p18143168_police_reminder_app.articles WHERE 1=1'
+    query_params = [SUMMARY_EXCERPT_LENGTH]
+    
+    if category:
+        query += ' AND category = %s'
+        query_params.append(category)
+    
+    if after:
+        query += ' AND (created_at, id) < (%s, %s)'
+        query_params.extend(decode_cursor(after))
+    
+    query += ' ORDER BY created_at DESC, id DESC LIMIT %s'
+    query_params.append(limit + 1)
+    
+    cursor.execute(query, query_params)
+    articles = cursor.fetchall()
+    has_more = len(articles) > limit
+    articles = articles[:limit]
+    
+    return {
+        'items': [dict(a) for a in articles],
+        'next_cursor': encode_cursor(articles[-1]) if has_more else None
+    }
+
+def get_collection_version(cursor) -> tuple:
+    '''Версия всей коллекции статей: счётчик, который триггер увеличивает при любой записи'''
+    cursor.execute('SELECT version, updated_at FROM t_p18143168_police_reminder_app.articles_version WHERE id = 1')
+    row = cursor.fetchone()
+    return f'W/"articles-{row["version"]}"', row['updated_at']
+
+def get_article_version(cursor, article_id):
+    cursor.execute('SELECT id, updated_at FROM t_p18143168_police_reminder_app.articles WHERE id = %s', (article_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return f'W/"article-{row["id"]}-{row["updated_at"].timestamp():.6f}"', row['updated_at']
+
+def cache_headers(etag: str, last_modified) -> dict:
+    return {
+        'ETag': etag,
+        'Last-Modified': format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        'Cache-Control': CACHE_CONTROL,
+        'Access-Control-Expose-Headers': 'ETag, Last-Modified, X-Cache, Content-Encoding'
+    }
+
+def is_not_modified(event: dict, etag: str, last_modified) -> bool:
+    if_none_match = get_request_header(event, 'If-None-Match')
+    if if_none_match:
+        return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+    
+    if_modified_since = get_request_header(event, 'If-Modified-Since')
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+def not_modified_response(headers: dict) -> dict:
+    return {
+        'statusCode': 304,
+        'headers': {'Access-Control-Allow-Origin': '*', **headers},
+        'body': '',
+        'isBase64Encoded': False
+    }
+
+def response_cache_get(key: tuple, etag: str):
+    '''Готовое JSON-тело из кэша, если запись жива и её версия совпадает с текущей версией в БД'''
+    with _response_cache_lock:
+        entry = _response_cache.get(key)
+        if entry is None:
+            response_cache_stats['misses'] += 1
+            return None
+        
+        body, entry_etag, size, expires_at = entry
+        if entry_etag != etag or expires_at < time.monotonic():
+            del _response_cache[key]
+            response_cache_stats['bytes'] -= size
+            response_cache_stats['misses'] += 1
+            response_cache_stats['expirations' if entry_etag == etag else 'stale'] += 1
+            return None
+        
+        _response_cache.move_to_end(key)
+        response_cache_stats['hits'] += 1
+        return body
+
+def response_cache_put(key: tuple, etag: str, body: str) -> None:
+    size = sys.getsizeof(body)
+    if size > RESPONSE_CACHE_MAX_BYTES // 4:
+        return
+    
+    with _response_cache_lock:
+        previous = _response_cache.pop(key, None)
+        if previous:
+            response_cache_stats['bytes'] -= previous[2]
+        
+        while _response_cache and response_cache_stats['bytes'] + size > RESPONSE_CACHE_MAX_BYTES:
+            _, evicted = _response_cache.popitem(last=False)
+            response_cache_stats['bytes'] -= evicted[2]
+            response_cache_stats['evictions'] += 1
+        
+        _response_cache[key] = (body, etag, size, time.monotonic() + RESPONSE_CACHE_TTL)
+        response_cache_stats['bytes'] += size
+
+def invalidate_response_cache(article_id=None) -> None:
+    '''Сбрасывает все списки и, если указан id, карточку статьи'''
+    with _response_cache_lock:
+        for key in list(_response_cache):
+            if key[0] == 'collection' or (article_id is not None and key == ('article', str(article_id))):
+                response_cache_stats['bytes'] -= _response_cache.pop(key)[2]
+                response_cache_stats['invalidations'] += 1
+
+def get_response_cache_stats() -> dict:
+    '''Счётчики кэша ответов экземпляра: пишутся в лог каждого запроса и отдаются админу в ?view=cache_stats'''
+    with _response_cache_lock:
+        return {**response_cache_stats, 'entries': len(_response_cache), 'max_bytes': RESPONSE_CACHE_MAX_BYTES}
+
+def get_facets(cursor, search=None) -> dict:
+    '''Счётчики по категориям и тегам: из предрассчитанной таблицы или по результатам поиска'''
+    if search:
+        cursor.execute(
+            '''WITH matched AS (
+                   SELECT id, category, tags FROM t_p18143168_police_reminder_app.articles
+                   WHERE search_vector @@ websearch_to_tsquery('russian', %s)
+               )
+               SELECT 'category' AS kind, category AS value, count(*) AS count FROM matched GROUP BY category
+               UNION ALL
+               SELECT 'tag', tag, count(*) FROM (SELECT DISTINCT id, unnest(tags) AS tag FROM matched) t GROUP BY tag''',
+            (search,)
+        )
+    else:
+        cursor.execute('SELECT kind, value, count FROM t_p18143168_police_reminder_app.article_facets')
+    
+    facets = {'categories': {category: 0 for category in CATEGORIES}, 'tags': []}
+    for row in cursor.fetchall():
+        if row['kind'] == 'category':
+            facets['categories'][row['value']] = row['count']
+        else:
+            facets['tags'].append({'tag': row['value'], 'count': row['count']})
+    facets['tags'].sort(key=lambda t: (-t['count'], t['tag']))
+    return facets
+
+def begin_snapshot(cursor) -> None:
+    '''Переводит соединение в REPEATABLE READ, чтобы версия и данные читались из одного снимка'''
+    cursor.connection.rollback()
+    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+
+def get_snapshot_version(cursor) -> int:
+    '''xmin снимка: все транзакции с меньшим xid уже завершены и видны в этом снимке'''
+    cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS version')
+    return cursor.fetchone()['version']
+
+def build_export_bundle(cursor) -> bytes:
+    '''Полный офлайн-снимок статей: версия для последующих дельт, хэш содержимого, gzip'''
+    begin_snapshot(cursor)
+    version = get_snapshot_version(cursor)
+    cursor.execute(f'SELECT {ARTICLE_COLUMNS} FROM t_p18143168_police_reminder_app.articles ORDER BY id')
+    articles = encode_json(cursor.fetchall())
+    content_hash = hashlib.sha256(articles.encode()).hexdigest()
+    bundle = f'{{"version":{version},"hash":"{content_hash}","articles":{articles}}}'
+    return gzip.compress(bundle.encode(), compresslevel=9, mtime=0)
+
+def build_delta(cursor, since: int) -> dict:
+    '''Изменения после снимка клиента: строки транзакций с xid >= его xmin, уже полученные могут прийти повторно'''
+    begin_snapshot(cursor)
+    version = get_snapshot_version(cursor)
+    cursor.execute(
+        f'''SELECT {ARTICLE_COLUMNS}, row_version FROM t_p18143168_police_reminder_app.articles
+           WHERE row_xid >= %s::text::xid8 ORDER BY row_xid, id''',
+        (str(since),)
+    )
+    updated = [dict(a) for a in cursor.fetchall()]
+    cursor.execute(
+        '''SELECT article_id FROM t_p18143168_police_reminder_app.article_tombstones
+           WHERE row_xid >= %s::text::xid8 ORDER BY row_xid, article_id''',
+        (str(since),)
+    )
+    deleted = cursor.fetchall()
+    
+    return {
+        'version': max(version, since),
+        'updated': updated,
+        'deleted': [d['article_id'] for d in deleted]
+    }
+
+def export_response(event: dict, cursor, validators: dict, cache_key: tuple, etag: str) -> dict:
+    bundle = response_cache_get(cache_key, etag)
+    cache_status = 'HIT'
+    if bundle is None:
+        cache_status = 'MISS'
+        bundle = base64.b64encode(build_export_bundle(cursor)).decode()
+        response_cache_put(cache_key, etag, bundle)
+    
+    headers = {**validators, 'X-Cache': cache_status, 'Vary': 'Accept-Encoding'}
+    if 'gzip' in (get_request_header(event, 'Accept-Encoding') or ''):
         return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}, ensure_ascii=False),
-            'isBase64Encoded': False
+            'statusCode': 200,
+            'headers': {**JSON_HEADERS, **headers, 'Content-Encoding': 'gzip'},
+            'body': bundle,
+            'isBase64Encoded': True
         }
+    return raw_json_response(gzip.decompress(base64.b64decode(bundle)).decode(), headers=headers)
+
+def build_collection_body(cursor, params: dict) -> str:
+    category = params.get('category')
+    search = params.get('search')
     
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+    if params.get('view') == 'facets':
+        return encode_json(get_facets(cursor, search))
+    
+    if params.get('view') == 'delta':
+        return encode_json(build_delta(cursor, parse_int(params.get('since') or 0, 'since')))
+    
+    if search:
+        limit = parse_limit(params.get('limit'), SEARCH_LIMIT, SEARCH_LIMIT)
+        articles = search_articles(cursor, search, category, limit)
+        return encode_json(articles)
+    
+    if params.get('view') == 'summary':
+        limit = parse_limit(params.get('limit'), LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT)
+        page = list_article_summaries(cursor, category, params.get('cursor'), limit)
+        return encode_json(page)
+    
+    query = f'SELECT {ARTICLE_COLUMNS} FROM t_p18143168_police_reminder_app.articles WHERE 1=1'
+    query_params = []
+    
+    if category:
+        query += ' AND category = %s'
+        query_params.append(category)
+    
+    query += ' ORDER BY created_at DESC'
+    
+    cursor.execute(query, query_params)
+    return encode_json(cursor.fetchall())
+
+def article_fields(data: dict, required: bool) -> dict:
+    '''Поля статьи из тела POST/PUT: при required нужны все три текстовых поля, иначе только переданные.
+    Чужой тип, NUL и неизвестная категория — 400 до запроса, а не 500 из psycopg2'''
+    fields = {}
+    for field in ('title', 'content', 'category'):
+        if field not in data and not required:
+            continue
+        value = data.get(field)
+        if not value:
+            raise HttpError(400, 'Missing required fields' if required else f'{field} must not be empty')
+        if not isinstance(value, str) or '\x00' in value:
+            raise HttpError(400, f'{field} must be a string without NUL characters')
+        fields[field] = value
+    if 'category' in fields and fields['category'] not in CATEGORIES:
+        raise HttpError(400, f"Unknown category: {fields['category']}")
+    if 'tags' in data or required:
+        tags = data.get('tags') or []
+        if not isinstance(tags, list) or not all(isinstance(tag, str) and '\x00' not in tag for tag in tags):
+            raise HttpError(400, 'tags must be a list of strings')
+        fields['tags'] = tags
+    return fields
+
+def handle_get(event: dict, conn, cursor) -> dict:
+    params = event.get('queryStringParameters') or {}
+    article_id = parse_int(params['id'], 'id') if params.get('id') else None
+    
+    if params.get('view') == 'cache_stats':
+        require_admin(event, conn)
+        return json_response(get_response_cache_stats(), headers={'Cache-Control': 'no-store'})
+    
+    if article_id is not None and params.get('view') == 'related':
+        return json_response(get_related_articles(cursor, article_id))
+    
+    if article_id is not None:
+        version = get_article_version(cursor, article_id)
+        if not version:
+            raise HttpError(404, 'Article not found')
+        
+        validators = cache_headers(*version)
+        if is_not_modified(event, *version):
+            return not_modified_response(validators)
+        
+        cache_key = ('article', str(article_id))
+        body = response_cache_get(cache_key, version[0])
+        cache_status = 'HIT'
+        if body is None:
+            cache_status = 'MISS'
+            cursor.execute(f'SELECT {ARTICLE_COLUMNS} FROM t_p18143168_police_reminder_app.articles WHERE id = %s', (article_id,))
+            body = encode_json(cursor.fetchone())
+            response_cache_put(cache_key, version[0], body)
+        return raw_json_response(body, headers={**validators, 'X-Cache': cache_status})
+    
+    version = get_collection_version(cursor)
+    validators = cache_headers(*version)
+    if is_not_modified(event, *version):
+        return not_modified_response(validators)
+    
+    cache_key = ('collection', *(params.get(name) for name in COLLECTION_CACHE_PARAMS))
+    if params.get('view') == 'export':
+        return export_response(event, cursor, validators, cache_key, version[0])
+    
+    body = response_cache_get(cache_key, version[0])
+    cache_status = 'HIT'
+    if body is None:
+        cache_status = 'MISS'
+        body = build_collection_body(cursor, params)
+        response_cache_put(cache_key, version[0], body)
+    return raw_json_response(body, headers={**validators, 'X-Cache': cache_status})
+
+def handle_post(event: dict, conn, cursor) -> dict:
+    require_admin(event, conn)
+    params = event.get('queryStringParameters') or {}
+    if params.get('action') == 'import':
+        body = event.get('body') or ''
+        if event.get('isBase64Encoded'):
+            try:
+                body = base64.b64decode(body).decode()
+            except ValueError:
+                raise HttpError(400, 'Import body must be base64-encoded UTF-8')
+        fmt = params.get('format') or ('csv' if 'csv' in (get_request_header(event, 'Content-Type') or '') else 'ndjson')
+        if fmt not in IMPORT_FORMATS:
+            raise HttpError(400, 'Unsupported import format')
+        return json_response(import_articles(conn, io.StringIO(body, newline=''), fmt))
+    
+    data = parse_json_body(event)
+    
+    if data.get('action') == 'process_image_jobs':
+        return json_response(process_image_jobs(conn, min(parse_int(data.get('limit', IMAGE_JOB_BATCH_SIZE), 'limit'), 50)))
+    
+    if data.get('action') == 'recompute_related':
+        return json_response(recompute_related(conn, full=bool(data.get('full'))))
+    
+    if data.get('action') == 'upload_url':
+        content_type = data.get('content_type')
+        filename = data.get('filename', 'image')
+        if not isinstance(content_type, str) or content_type not in UPLOAD_CONTENT_TYPES:
+            raise HttpError(400, 'Unsupported content type')
+        if not isinstance(filename, str):
+            raise HttpError(400, 'filename must be a string')
+        return json_response(create_upload_url(filename, content_type))
+    
+    fields = article_fields(data, required=True)
+    image_job = prepare_image_job(data)
+    
+    cursor.execute(
+        f'INSERT INTO t_p18143168_police_reminder_app.articles (title, content, category, tags, image_status) VALUES (%s, %s, %s, %s, %s) RETURNING {ARTICLE_COLUMNS}',
+        (fields['title'], fields['content'], fields['category'], fields['tags'], 'pending' if image_job else 'none')
+    )
+    article = cursor.fetchone()
+    if image_job:
+        enqueue_image_job(cursor, article['id'], image_job)
+    conn.commit()
+    invalidate_response_cache()
+    return json_response(article, 201)
+
+def handle_put(event: dict, conn, cursor) -> dict:
+    require_admin(event, conn)
+    data = parse_json_body(event)
+    if not data.get('id'):
+        raise HttpError(400, 'Article ID is required')
+    article_id = parse_int(data['id'], 'id')
+    
+    fields = article_fields(data, required=False)
+    updates = [f'{field} = %s' for field in fields]
+    params = list(fields.values())
+    image_job = prepare_image_job(data)
+    if image_job:
+        updates.append("image_status = 'pending'")
+    
+    updates.append('updated_at = CURRENT_TIMESTAMP')
+    params.append(article_id)
+    
+    query = f'UPDATE t_p18143168_police_reminder_app.articles SET {", ".join(updates)} WHERE id = %s RETURNING {ARTICLE_COLUMNS}'
+    cursor.execute(query, params)
+    article = cursor.fetchone()
+    if article and image_job:
+        enqueue_image_job(cursor, article['id'], image_job)
+    conn.commit()
+    invalidate_response_cache(article_id)
+    
+    if not article:
+        raise HttpError(404, 'Article not found')
+    return json_response(article)
+
+def handle_delete(event: dict, conn, cursor) -> dict:
+    require_admin(event, conn)
+    params = event.get('queryStringParameters') or {}
+    if not params.get('id'):
+        raise HttpError(400, 'Article ID is required')
+    article_id = parse_int(params['id'], 'id')
+    
+    cursor.execute('DELETE FROM t_p18143168_police_reminder_app.articles WHERE id = %s RETURNING id', (article_id,))
+    deleted = cursor.fetchone()
+    conn.commit()
+    invalidate_response_cache(article_id)
+    
+    if not deleted:
+        raise HttpError(404, 'Article not found')
+    return json_response({'message': 'Article deleted successfully'})
+
+ROUTES = {'GET': handle_get, 'POST': handle_post, 'PUT': handle_put, 'DELETE': handle_delete}
+
+def handler(event: dict, context) -> dict:
+    '''API для управления статьями памятки полицейского'''
+    if is_trigger_event(event):
+        return run_background_trigger()
+    return dispatch(event, ROUTES)
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'worker'
+    if command == 'import':
+        path = sys.argv[2]
+        fmt = sys.argv[3] if len(sys.argv) > 3 else ('csv' if path.endswith('.csv') else 'ndjson')
+        conn = get_db_connection()
+        try:
+            with open(path, encoding='utf-8', newline='') as f:
+                print(json.dumps(import_articles(conn, f, fmt), ensure_ascii=False))
+        finally:
+            release_db_connection(conn)
+    elif command == 'related':
+        conn = get_db_connection()
+        try:
+            print(json.dumps(recompute_related(conn, full='full' in sys.argv[2:])))
+        finally:
+            release_db_connection(conn)
+    else:
+        run_image_worker()
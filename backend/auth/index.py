@@ -1,150 +1,710 @@
 import json
 import os
 import hashlib
+import base64
+import hmac
+import math
+import random
 import secrets
+import time
+import threading
+import traceback
+from contextlib import contextmanager
+import gzip
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import date, datetime
+from decimal import Decimal
 import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INERROR
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SCRYPT_N = int(os.environ.get('SCRYPT_N', str(2 ** 14)))
+SCRYPT_R = int(os.environ.get('SCRYPT_R', '8'))
+SCRYPT_P = int(os.environ.get('SCRYPT_P', '1'))
+SCRYPT_SALT_LENGTH = 16
+SCRYPT_KEY_LENGTH = 32
+SCRYPT_TARGET_MS = 50
+KDF_MAX_WORKERS = int(os.environ.get('KDF_MAX_WORKERS', '2'))
+KDF_MAX_PENDING = int(os.environ.get('KDF_MAX_PENDING', '8'))
+KDF_TIMEOUT = 10
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_WINDOW = 300
+RATE_LIMITS = {
+    'login:user': 10,
+    'login:ip': 50,
+    'register:ip': 10
+}
+RATE_LIMIT_CLEANUP_PROBABILITY = 0.01
+TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', str(30 * 24 * 3600)))
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, Authorization',
+    'Access-Control-Max-Age': '86400'
+}
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.environ.get('DB_POOL_ACQUIRE_TIMEOUT', '5'))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', '30'))
+
+_db_pools = {}
+_db_pool_lock = threading.Lock()
+_db_pool_slots = {}
+_db_conn_urls = {}
+_db_last_used = {}
+db_pool_stats = {'acquired': 0, 'reconnects': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0}
+
+FUNCTION_NAME = 'auth'
+TRACE_LOG = os.environ.get('TRACE_LOG', '1') == '1'
+TRACE_SLOW_QUERY_MS = float(os.environ.get('TRACE_SLOW_QUERY_MS', '200'))
+TRACE_EXPLAIN_SLOW = os.environ.get('TRACE_EXPLAIN_SLOW', '0') == '1'
+
+_trace_local = threading.local()
+
+_kdf_executor = ThreadPoolExecutor(max_workers=KDF_MAX_WORKERS, thread_name_prefix='kdf')
+_kdf_slots = threading.BoundedSemaphore(KDF_MAX_PENDING)
+_dummy_hash = None
+
+REVOCATION_REFRESH_INTERVAL = float(os.environ.get('REVOCATION_REFRESH_INTERVAL', '30'))
+
+_revoked_versions = {}
+_revocations_checked_at = 0.0
+_revocations_seen_until = None
+
+class LazyConnectionPool(ThreadedConnectionPool):
+    '''Соединения открываются по требованию, а возвращённые остаются в пуле до maxconn штук'''
+    
+    def __init__(self, maxconn: int, *args, **kwargs):
+        super().__init__(0, maxconn, *args, **kwargs)
+        self.minconn = maxconn
+    
+    def counts(self) -> tuple:
+        '''(открыто, выдано) — читает внутренние списки ThreadedConnectionPool под его же блокировкой'''
+        with self._lock:
+            return len(self._pool) + len(self._used), len(self._used)
+
+def get_db_pool(url: str) -> ThreadedConnectionPool:
+    '''Пул соединений живёт между тёплыми вызовами функции. Реплики функции не нужны: все её запросы — записи'''
+    pool = _db_pools.get(url)
+    if pool is None:
+        with _db_pool_lock:
+            pool = _db_pools.get(url)
+            if pool is None:
+                _db_pool_slots[url] = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+                pool = _db_pools[url] = LazyConnectionPool(DB_POOL_MAX_SIZE, url, cursor_factory=TracedCursor)
+    return pool
+
+def is_connection_healthy(conn) -> bool:
+    if conn.closed or conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+        return False
+    last_used = _db_last_used.get(id(conn))
+    if last_used is None or time.monotonic() - last_used < DB_POOL_PING_AFTER:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
 
 def get_db_connection():
-    dsn = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(dsn)
+    url = os.environ['DATABASE_URL']
+    started = time.perf_counter()
+    pool = get_db_pool(url)
+    slots = _db_pool_slots[url]
+    if not slots.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT):
+        raise PoolError('Connection pool exhausted')
+    try:
+        conn = pool.getconn()
+        if not is_connection_healthy(conn):
+            _db_last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+            db_pool_stats['reconnects'] += 1
+    except Exception:
+        slots.release()
+        raise
+    _db_conn_urls[id(conn)] = url
+    wait_ms = (time.perf_counter() - started) * 1000
+    db_pool_stats['acquired'] += 1
+    db_pool_stats['wait_ms_total'] += wait_ms
+    db_pool_stats['wait_ms_max'] = max(db_pool_stats['wait_ms_max'], wait_ms)
+    return conn
 
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+def release_db_connection(conn) -> None:
+    url = _db_conn_urls.pop(id(conn))
+    pool = _db_pools[url]
+    try:
+        if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        broken = bool(conn.closed)
+    except psycopg2.Error:
+        broken = True
+    try:
+        if broken:
+            _db_last_used.pop(id(conn), None)
+        else:
+            _db_last_used[id(conn)] = time.monotonic()
+        pool.putconn(conn, close=broken)
+    finally:
+        _db_pool_slots[url].release()
 
-def generate_token() -> str:
-    return secrets.token_urlsafe(32)
+def get_db_pool_stats() -> dict:
+    pool = _db_pools.get(os.environ.get('DATABASE_URL'))
+    open_count, in_use = pool.counts() if pool else (0, 0)
+    acquired = db_pool_stats['acquired']
+    return {
+        **db_pool_stats,
+        'open': open_count,
+        'in_use': in_use,
+        'max_size': DB_POOL_MAX_SIZE,
+        'wait_ms_avg': db_pool_stats['wait_ms_total'] / acquired if acquired else 0.0
+    }
 
-def handler(event: dict, context) -> dict:
-    method = event.get('httpMethod', 'GET')
+class RequestTrace:
+    '''Суммарное время по именованным участкам запроса и счётчики SQL'''
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.queries = 0
+        self.rows = 0
+    
+    def add(self, name: str, elapsed_ms: float) -> None:
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + elapsed_ms, count + 1)
+    
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+    
+    def server_timing(self) -> str:
+        metrics = [f'{name};dur={total:.1f}' for name, (total, _) in self.spans.items()]
+        metrics.append(f'total;dur={self.elapsed_ms():.1f}')
+        return ', '.join(metrics)
+
+def current_trace():
+    return getattr(_trace_local, 'trace', None)
+
+@contextmanager
+def trace_span(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = current_trace()
+        if trace is not None:
+            trace.add(name, (time.perf_counter() - started) * 1000)
+
+def log_event(event: str, **fields) -> None:
+    if TRACE_LOG:
+        print(json.dumps({'event': event, 'function': FUNCTION_NAME, **fields}, ensure_ascii=False, default=str), flush=True)
+
+def explain_query(conn, query, vars) -> list:
+    '''План без выполнения запроса; под savepoint, чтобы ошибка EXPLAIN не сломала транзакцию обработчика'''
+    if conn.get_transaction_status() == TRANSACTION_STATUS_INERROR:
+        return None
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        cur.execute('SAVEPOINT trace_explain')
+        try:
+            cur.execute('EXPLAIN (FORMAT JSON) ' + query, vars)
+            plan = cur.fetchone()[0]
+            cur.execute('RELEASE SAVEPOINT trace_explain')
+            return plan
+        except psycopg2.Error:
+            cur.execute('ROLLBACK TO SAVEPOINT trace_explain')
+            return None
+
+def record_query(cursor, query, vars, elapsed_ms: float) -> None:
+    trace = current_trace()
+    if trace is None:
+        return
+    trace.add('sql', elapsed_ms)
+    trace.queries += 1
+    trace.rows += max(cursor.rowcount, 0)
+    
+    if elapsed_ms >= TRACE_SLOW_QUERY_MS:
+        text = query.decode() if isinstance(query, bytes) else str(query)
+        plan = None
+        if TRACE_EXPLAIN_SLOW and text.lstrip().upper().startswith(('SELECT', 'WITH')):
+            plan = explain_query(cursor.connection, text, vars)
+        log_event('slow_query', duration_ms=round(elapsed_ms, 1), rows=cursor.rowcount, query=' '.join(text.split()), plan=plan)
+
+class TracedCursorMixin:
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(self, query, vars, (time.perf_counter() - started) * 1000)
+
+class TracedCursor(TracedCursorMixin, psycopg2.extensions.cursor):
+    pass
+
+class TracedDictCursor(TracedCursorMixin, RealDictCursor):
+    pass
+
+def log_request(event: dict, trace: RequestTrace, response) -> None:
+    log_event(
+        'request',
+        request_id=(event.get('requestContext') or {}).get('requestId'),
+        method=event.get('httpMethod'),
+        status=response['statusCode'] if response else 500,
+        duration_ms=round(trace.elapsed_ms(), 1),
+        queries=trace.queries,
+        rows=trace.rows,
+        spans={name: {'ms': round(total, 1), 'count': count} for name, (total, count) in trace.spans.items()},
+        db_pool=get_db_pool_stats()
+    )
+
+def get_request_header(event: dict, name: str):
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def b64url_decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+def decode_token(token: str):
+    '''Проверяет HMAC-подпись и срок действия токена локально, без запроса к БД'''
+    try:
+        payload_part, signature_part = token.split('.')
+        expected = hmac.new(os.environ['AUTH_TOKEN_SECRET'].encode(), payload_part.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, b64url_decode(signature_part)):
+            return None
+        payload = json.loads(b64url_decode(payload_part))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(payload, dict) or payload.get('exp', 0) < time.time():
+        return None
+    return payload
+
+def refresh_revocations(conn) -> None:
+    '''Раз в REVOCATION_REFRESH_INTERVAL подтягивает отозванные версии токенов, изменившиеся с прошлой проверки'''
+    global _revocations_checked_at, _revocations_seen_until
+    now = time.monotonic()
+    if now - _revocations_checked_at < REVOCATION_REFRESH_INTERVAL:
+        return
+    
+    with conn.cursor() as cur:
+        if _revocations_seen_until is None:
+            cur.execute('SELECT id, token_version, token_revoked_at FROM t_p18143168_police_reminder_app.users WHERE token_revoked_at IS NOT NULL')
+        else:
+            cur.execute(
+                "SELECT id, token_version, token_revoked_at FROM t_p18143168_police_reminder_app.users WHERE token_revoked_at > %s - INTERVAL '1 minute'",
+                (_revocations_seen_until,)
+            )
+        for user_id, token_version, revoked_at in cur.fetchall():
+            _revoked_versions[user_id] = token_version
+            if _revocations_seen_until is None or revoked_at > _revocations_seen_until:
+                _revocations_seen_until = revoked_at
+    _revocations_checked_at = now
+
+def authenticate(event: dict, conn):
+    '''Данные пользователя из токена X-Auth-Token (или Authorization: Bearer) либо None'''
+    token = get_request_header(event, 'X-Auth-Token')
+    if not token:
+        authorization = get_request_header(event, 'Authorization') or ''
+        token = authorization[7:] if authorization.startswith('Bearer ') else None
+    if not token:
+        return None
+    
+    payload = decode_token(token)
+    if not payload:
+        return None
+    
+    refresh_revocations(conn)
+    if payload.get('ver', 0) < _revoked_versions.get(payload.get('sub'), 0):
+        return None
+    return payload
+
+def require_auth(event: dict, conn) -> dict:
+    auth = authenticate(event, conn)
+    if not auth:
+        raise HttpError(401, 'Требуется авторизация')
+    return auth
+
+class HttpError(Exception):
+    '''Ошибка с HTTP-статусом, которую dispatch превращает в единый JSON-ответ'''
+    
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def encode_json(data) -> str:
+    with trace_span('json_encode'):
+        if orjson is not None:
+            return orjson.dumps(data, default=json_default).decode()
+        return json.dumps(data, ensure_ascii=False, default=json_default, separators=(',', ':'))
+
+def raw_json_response(body: str, status: int = 200, headers: dict = None) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+def json_response(data, status: int = 200, headers: dict = None) -> dict:
+    return raw_json_response(encode_json(data), status, headers)
+
+def error_response(status: int, message: str, headers: dict = None) -> dict:
+    return json_response({'error': message}, status, headers)
+
+def parse_json_body(event: dict) -> dict:
+    '''Тело запроса как JSON-объект; пустое или отсутствующее тело — пустой объект'''
+    try:
+        data = json.loads(event.get('body') or '{}')
+    except ValueError:
+        raise HttpError(400, 'Invalid JSON body')
+    if not isinstance(data, dict):
+        raise HttpError(400, 'JSON body must be an object')
+    return data
+
+def body_text(data: dict, field: str) -> str:
+    '''Строковое поле тела: отсутствие — пустая строка, чужой тип или NUL (его не примет TEXT) — 400'''
+    value = data.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise HttpError(400, f'Поле {field} должно быть строкой')
+    if '\x00' in value:
+        raise HttpError(400, f'Поле {field} не должно содержать NUL')
+    return value
+
+def compress_response(event: dict, response: dict) -> dict:
+    '''gzip для тел больше GZIP_MIN_BYTES, если клиент его принимает'''
+    body = response['body']
+    if response['isBase64Encoded'] or len(body) < GZIP_MIN_BYTES or 'Content-Encoding' in response['headers']:
+        return response
+    if 'gzip' not in (get_request_header(event, 'Accept-Encoding') or ''):
+        return response
     
+    response['headers'] = {**response['headers'], 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
+    with trace_span('gzip'):
+        response['body'] = base64.b64encode(gzip.compress(body.encode(), compresslevel=GZIP_LEVEL)).decode()
+    response['isBase64Encoded'] = True
+    return response
+
+def dispatch(event: dict, routes: dict) -> dict:
+    '''Общий путь запроса: preflight, маршрут по методу, соединение из пула, единые ошибки, сжатие, трассировка'''
+    method = event.get('httpMethod', 'GET')
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return {'statusCode': 200, 'headers': PREFLIGHT_HEADERS, 'body': '', 'isBase64Encoded': False}
+    
+    route = routes.get(method)
+    if route is None:
+        return error_response(405, 'Method not allowed')
     
+    trace = RequestTrace()
+    _trace_local.trace = trace
+    response = None
     try:
-        body = json.loads(event.get('body', '{}'))
-        action = body.get('action')
-        
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        if action == 'register':
-            username = body.get('username', '').strip()
-            email = body.get('email', '').strip()
-            password = body.get('password', '')
-            
-            if not username or not email or not password:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Все поля обязательны'}),
-                    'isBase64Encoded': False
-                }
-            
-            password_hash = hash_password(password)
-            
+        try:
+            with trace_span('db_connect'):
+                conn = get_db_connection()
+        except (psycopg2.Error, PoolError) as e:
+            log_event('db_unavailable', error=str(e))
+            response = error_response(503, 'Database unavailable', {'Retry-After': '1'})
+        except Exception as e:
+            log_event('request_failed', error=repr(e), traceback=traceback.format_exc())
+            response = error_response(500, 'Internal server error')
+        else:
+            cursor = conn.cursor(cursor_factory=TracedDictCursor)
             try:
-                cur.execute(
-                    "INSERT INTO t_p18143168_police_reminder_app.users (username, email, password_hash) VALUES (%s, %s, %s) RETURNING id, username, email, is_admin",
-                    (username, email, password_hash)
-                )
-                user = cur.fetchone()
-                conn.commit()
-                
-                token = generate_token()
-                
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({
-                        'user': dict(user),
-                        'token': token
-                    }),
-                    'isBase64Encoded': False
-                }
-            except psycopg2.IntegrityError:
-                conn.rollback()
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Пользователь с таким именем или email уже существует'}),
-                    'isBase64Encoded': False
-                }
-        
-        elif action == 'login':
-            username = body.get('username', '').strip()
-            password = body.get('password', '')
-            
-            if not username or not password:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Все поля обязательны'}),
-                    'isBase64Encoded': False
-                }
-            
-            password_hash = hash_password(password)
-            
+                response = route(event, conn, cursor)
+            except HttpError as e:
+                response = error_response(e.status, e.message, e.headers)
+            except psycopg2.DataError as e:
+                response = error_response(400, e.diag.message_primary or 'Invalid value')
+            except Exception as e:
+                log_event('request_failed', error=repr(e), traceback=traceback.format_exc())
+                response = error_response(500, 'Internal server error')
+            finally:
+                cursor.close()
+                release_db_connection(conn)
+        response = compress_response(event, response)
+    finally:
+        _trace_local.trace = None
+        log_request(event, trace, response)
+    
+    response['headers'] = {**response['headers'], 'Server-Timing': trace.server_timing(), 'Timing-Allow-Origin': '*'}
+    return response
+
+class MemoryRateLimitStore:
+    '''Счётчики внутри тёплого экземпляра функции: без сетевых запросов, но не общие между экземплярами'''
+    
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+    
+    def hit(self, conn, keys: list, bucket: int) -> dict:
+        with self.lock:
+            if len(self.counts) > 10000:
+                self.counts = {k: v for k, v in self.counts.items() if k[1] >= bucket - 1}
+            result = {}
+            for key in keys:
+                current = self.counts.get((key, bucket), 0) + 1
+                self.counts[(key, bucket)] = current
+                result[key] = (current, self.counts.get((key, bucket - 1), 0))
+            return result
+
+class PostgresRateLimitStore:
+    '''Счётчики в UNLOGGED-таблице: общие для всех экземпляров, один запрос на все ключи'''
+    
+    def hit(self, conn, keys: list, bucket: int) -> dict:
+        with conn.cursor() as cur:
             cur.execute(
-                "SELECT id, username, email, is_admin FROM t_p18143168_police_reminder_app.users WHERE username = %s AND password_hash = %s",
-                (username, password_hash)
+                '''WITH hit AS (
+                       INSERT INTO t_p18143168_police_reminder_app.rate_limits (key, bucket, count)
+                       SELECT unnest(%s::text[]), %s, 1
+                       ON CONFLICT (key, bucket) DO UPDATE SET count = rate_limits.count + 1
+                       RETURNING key, count
+                   )
+                   SELECT hit.key, hit.count, COALESCE(previous.count, 0)
+                   FROM hit
+                   LEFT JOIN t_p18143168_police_reminder_app.rate_limits previous
+                       ON previous.key = hit.key AND previous.bucket = %s''',
+                (keys, bucket, bucket - 1)
             )
-            user = cur.fetchone()
-            
-            if not user:
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Неверные учетные данные'}),
-                    'isBase64Encoded': False
-                }
-            
-            token = generate_token()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'user': dict(user),
-                    'token': token
-                }),
-                'isBase64Encoded': False
-            }
-        
+            result = {key: (current, previous) for key, current, previous in cur.fetchall()}
+            if random.random() < RATE_LIMIT_CLEANUP_PROBABILITY:
+                cur.execute('DELETE FROM t_p18143168_police_reminder_app.rate_limits WHERE bucket < %s', (bucket - 1,))
+        conn.commit()
+        return result
+
+RATE_LIMIT_STORES = {'memory': MemoryRateLimitStore, 'postgres': PostgresRateLimitStore}
+_rate_limit_store = RATE_LIMIT_STORES[RATE_LIMIT_BACKEND]()
+
+def get_source_ip(event: dict) -> str:
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    if identity.get('sourceIp'):
+        return identity['sourceIp']
+    forwarded = get_request_header(event, 'X-Forwarded-For') or ''
+    return forwarded.split(',')[0].strip() or 'unknown'
+
+def check_rate_limit(conn, limits: dict):
+    '''Скользящее окно: текущий интервал плюс взвешенная доля предыдущего. Возвращает Retry-After в секундах или None'''
+    now = time.time()
+    bucket = int(now // RATE_LIMIT_WINDOW)
+    elapsed = now - bucket * RATE_LIMIT_WINDOW
+    counts = _rate_limit_store.hit(conn, list(limits), bucket)
+    
+    retry_after = 0
+    for key, limit in limits.items():
+        current, previous = counts[key]
+        if previous * (1 - elapsed / RATE_LIMIT_WINDOW) + current <= limit:
+            continue
+        if current > limit or not previous:
+            wait = RATE_LIMIT_WINDOW - elapsed
         else:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Неверное действие'}),
-                'isBase64Encoded': False
-            }
-    
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+            wait = RATE_LIMIT_WINDOW * (1 - (limit - current) / previous) - elapsed
+        retry_after = max(retry_after, wait)
+    return max(1, math.ceil(retry_after)) if retry_after else None
+
+def b64url_encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b'=').decode()
+
+class KdfBusyError(HttpError):
+    def __init__(self):
+        super().__init__(503, 'Сервер перегружен, повторите попытку', {
+            'Access-Control-Expose-Headers': 'Retry-After',
+            'Retry-After': '1'
+        })
+
+def scrypt_maxmem(n: int, r: int, p: int) -> int:
+    return 128 * r * (n + 2) + 128 * r * p + 1024 * 1024
+
+def derive_key(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=scrypt_maxmem(n, r, p), dklen=SCRYPT_KEY_LENGTH)
+
+def run_kdf(fn, *args):
+    '''Выполняет KDF в ограниченном пуле потоков; при переполнении очереди или ожидании дольше KDF_TIMEOUT — 503'''
+    if not _kdf_slots.acquire(blocking=False):
+        raise KdfBusyError()
+    try:
+        with trace_span('kdf'):
+            future = _kdf_executor.submit(fn, *args)
+            try:
+                return future.result(timeout=KDF_TIMEOUT)
+            except FutureTimeoutError:
+                future.cancel()
+                log_event('kdf_timeout', timeout=KDF_TIMEOUT)
+                raise KdfBusyError()
     finally:
-        if 'cur' in locals():
-            cur.close()
-        if 'conn' in locals():
-            conn.close()
+        _kdf_slots.release()
+
+def hash_password(password: str) -> str:
+    '''Хэш в формате scrypt$n$r$p$salt$key: параметры стоимости хранятся вместе с хэшем'''
+    salt = secrets.token_bytes(SCRYPT_SALT_LENGTH)
+    key = run_kdf(derive_key, password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f'scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${b64url_encode(salt)}${b64url_encode(key)}'
+
+def verify_password(password: str, password_hash: str) -> bool:
+    if not password_hash.startswith('scrypt$'):
+        legacy_hash = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy_hash, password_hash)
+    
+    _, n, r, p, salt, key = password_hash.split('$')
+    derived = run_kdf(derive_key, password, b64url_decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(derived, b64url_decode(key))
+
+def needs_rehash(password_hash: str) -> bool:
+    '''Устаревший SHA-256 или параметры scrypt слабее текущих'''
+    if not password_hash.startswith('scrypt$'):
+        return True
+    _, n, r, p, _, _ = password_hash.split('$')
+    return (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+def _dummy_password_hash() -> str:
+    '''Хэш для несуществующих пользователей, чтобы время ответа не выдавало наличие логина'''
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(secrets.token_urlsafe(16))
+    return _dummy_hash
+
+def calibrate_scrypt(target_ms: float = SCRYPT_TARGET_MS, r: int = 8, p: int = 1) -> dict:
+    '''Подбирает наибольшее n (степень двойки), при котором проверка пароля укладывается в target_ms'''
+    salt = secrets.token_bytes(SCRYPT_SALT_LENGTH)
+    n = 2 ** 12
+    best = {'n': n, 'r': r, 'p': p, 'ms': 0.0}
+    while n <= 2 ** 20:
+        started = time.perf_counter()
+        derive_key('calibration-password', salt, n, r, p)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms > target_ms and best['ms']:
+            break
+        best = {'n': n, 'r': r, 'p': p, 'ms': round(elapsed_ms, 2)}
+        n *= 2
+    return best
+
+def issue_token(user: dict) -> str:
+    '''Подписанный HMAC-SHA256 токен: id, имя, флаг админа, версия токенов пользователя и срок действия'''
+    payload = {
+        'sub': user['id'],
+        'name': user['username'],
+        'adm': bool(user['is_admin']),
+        'ver': user['token_version'],
+        'exp': int(time.time()) + TOKEN_TTL
+    }
+    payload_part = b64url_encode(json.dumps(payload, separators=(',', ':')).encode())
+    signature = hmac.new(os.environ['AUTH_TOKEN_SECRET'].encode(), payload_part.encode(), hashlib.sha256).digest()
+    return f'{payload_part}.{b64url_encode(signature)}'
+
+def public_user(user: dict) -> dict:
+    return {key: user[key] for key in ('id', 'username', 'email', 'is_admin')}
+
+def enforce_rate_limit(event: dict, conn, action: str, body: dict) -> None:
+    source_ip = get_source_ip(event)
+    limits = {f'{action}:ip:{source_ip}': RATE_LIMITS[f'{action}:ip']}
+    if action == 'login':
+        limits[f"login:user:{body_text(body, 'username').strip().lower()}"] = RATE_LIMITS['login:user']
+    
+    retry_after = check_rate_limit(conn, limits)
+    if retry_after:
+        raise HttpError(429, 'Слишком много попыток, повторите позже', {
+            'Access-Control-Expose-Headers': 'Retry-After',
+            'Retry-After': str(retry_after)
+        })
+
+def register(event: dict, conn, cur, body: dict) -> dict:
+    enforce_rate_limit(event, conn, 'register', body)
+    username = body_text(body, 'username').strip()
+    email = body_text(body, 'email').strip()
+    password = body_text(body, 'password')
+    if not username or not email or not password:
+        raise HttpError(400, 'Все поля обязательны')
+    
+    password_hash = hash_password(password)
+    try:
+        cur.execute(
+            "INSERT INTO t_p18143168_police_reminder_app.users (username, email, password_hash) VALUES (%s, %s, %s) RETURNING id, username, email, is_admin, token_version",
+            (username, email, password_hash)
+        )
+        user = cur.fetchone()
+        conn.commit()
+    except psycopg2.IntegrityError:
+        conn.rollback()
+        raise HttpError(400, 'Пользователь с таким именем или email уже существует')
+    
+    return json_response({'user': public_user(user), 'token': issue_token(user)})
+
+def login(event: dict, conn, cur, body: dict) -> dict:
+    enforce_rate_limit(event, conn, 'login', body)
+    username = body_text(body, 'username').strip()
+    password = body_text(body, 'password')
+    if not username or not password:
+        raise HttpError(400, 'Все поля обязательны')
+    
+    cur.execute(
+        "SELECT id, username, email, is_admin, token_version, password_hash FROM t_p18143168_police_reminder_app.users WHERE username = %s",
+        (username,)
+    )
+    user = cur.fetchone()
+    
+    if not user:
+        verify_password(password, _dummy_password_hash())
+    elif verify_password(password, user['password_hash']):
+        if needs_rehash(user['password_hash']):
+            cur.execute(
+                "UPDATE t_p18143168_police_reminder_app.users SET password_hash = %s WHERE id = %s",
+                (hash_password(password), user['id'])
+            )
+            conn.commit()
+    else:
+        user = None
+    
+    if not user:
+        raise HttpError(401, 'Неверные учетные данные')
+    return json_response({'user': public_user(user), 'token': issue_token(user)})
+
+def logout(event: dict, conn, cur, body: dict) -> dict:
+    auth = require_auth(event, conn)
+    cur.execute(
+        "UPDATE t_p18143168_police_reminder_app.users SET token_version = token_version + 1, token_revoked_at = CURRENT_TIMESTAMP WHERE id = %s RETURNING token_version",
+        (auth['sub'],)
+    )
+    revoked = cur.fetchone()
+    conn.commit()
+    if revoked:
+        _revoked_versions[auth['sub']] = revoked['token_version']
+    return json_response({'success': True})
+
+ACTIONS = {'register': register, 'login': login, 'logout': logout}
+
+def handle_post(event: dict, conn, cur) -> dict:
+    body = parse_json_body(event)
+    action = body.get('action')
+    action = ACTIONS.get(action) if isinstance(action, str) else None
+    if action is None:
+        raise HttpError(400, 'Неверное действие')
+    return action(event, conn, cur, body)
+
+ROUTES = {'POST': handle_post}
+
+def handler(event: dict, context) -> dict:
+    return dispatch(event, ROUTES)
+
+if __name__ == '__main__':
+    print(json.dumps(calibrate_scrypt()))
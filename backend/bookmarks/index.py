@@ -1,134 +1,641 @@
 import json
 import os
+import base64
+import hmac
+import hashlib
+import time
+import threading
+import traceback
+import itertools
+from contextlib import contextmanager
+import gzip
+from datetime import date, datetime
+from decimal import Decimal
 import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INERROR
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 
-def get_db_connection():
-    dsn = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(dsn)
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def handler(event: dict, context) -> dict:
-    method = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.environ.get('DB_POOL_ACQUIRE_TIMEOUT', '5'))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', '30'))
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', '5'))
+PRIMARY_READ_PARAMS = ()
+
+_db_pools = {}
+_db_pool_lock = threading.Lock()
+_db_pool_slots = {}
+_db_conn_urls = {}
+_db_last_used = {}
+_replica_turn = itertools.count()
+_replica_states = {}
+db_pool_stats = {'acquired': 0, 'reconnects': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0, 'replica_reads': 0, 'primary_fallbacks': 0}
+
+FUNCTION_NAME = 'bookmarks'
+TRACE_LOG = os.environ.get('TRACE_LOG', '1') == '1'
+TRACE_SLOW_QUERY_MS = float(os.environ.get('TRACE_SLOW_QUERY_MS', '200'))
+TRACE_EXPLAIN_SLOW = os.environ.get('TRACE_EXPLAIN_SLOW', '0') == '1'
+
+_trace_local = threading.local()
+
+BOOKMARK_BATCH_MAX = 100
+BOOKMARK_PAGE_DEFAULT = 20
+BOOKMARK_PAGE_MAX = 100
+SUMMARY_EXCERPT_LENGTH = 200
+BOOKMARK_ARTICLE_COLUMNS = 'a.id, a.title, a.category, a.tags, a.image_url, a.image_thumbnails, left(a.content, %s) AS excerpt, b.created_at AS bookmarked_at'
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, Authorization, X-Min-LSN',
+    'Access-Control-Max-Age': '86400'
+}
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+REVOCATION_REFRESH_INTERVAL = float(os.environ.get('REVOCATION_REFRESH_INTERVAL', '30'))
+
+_revoked_versions = {}
+_revocations_checked_at = 0.0
+_revocations_seen_until = None
+
+class LazyConnectionPool(ThreadedConnectionPool):
+    '''Соединения открываются по требованию, а возвращённые остаются в пуле до maxconn штук'''
     
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    def __init__(self, maxconn: int, *args, **kwargs):
+        super().__init__(0, maxconn, *args, **kwargs)
+        self.minconn = maxconn
     
+    def counts(self) -> tuple:
+        '''(открыто, выдано) — читает внутренние списки ThreadedConnectionPool под его же блокировкой'''
+        with self._lock:
+            return len(self._pool) + len(self._used), len(self._used)
+
+def get_db_pool(url: str = None) -> ThreadedConnectionPool:
+    '''Пул соединений живёт между тёплыми вызовами функции; у primary и каждой реплики свой пул'''
+    url = url or os.environ['DATABASE_URL']
+    pool = _db_pools.get(url)
+    if pool is None:
+        with _db_pool_lock:
+            pool = _db_pools.get(url)
+            if pool is None:
+                _db_pool_slots[url] = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+                pool = _db_pools[url] = LazyConnectionPool(DB_POOL_MAX_SIZE, url, cursor_factory=TracedCursor)
+    return pool
+
+def is_connection_healthy(conn) -> bool:
+    if conn.closed or conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+        return False
+    last_used = _db_last_used.get(id(conn))
+    if last_used is None or time.monotonic() - last_used < DB_POOL_PING_AFTER:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def get_db_connection(url: str = None):
+    url = url or os.environ['DATABASE_URL']
+    started = time.perf_counter()
+    pool = get_db_pool(url)
+    slots = _db_pool_slots[url]
+    if not slots.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT):
+        raise PoolError('Connection pool exhausted')
+    try:
+        conn = pool.getconn()
+        if not is_connection_healthy(conn):
+            _db_last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+            db_pool_stats['reconnects'] += 1
+    except Exception:
+        slots.release()
+        raise
+    _db_conn_urls[id(conn)] = url
+    wait_ms = (time.perf_counter() - started) * 1000
+    db_pool_stats['acquired'] += 1
+    db_pool_stats['wait_ms_total'] += wait_ms
+    db_pool_stats['wait_ms_max'] = max(db_pool_stats['wait_ms_max'], wait_ms)
+    return conn
+
+def release_db_connection(conn) -> None:
+    url = _db_conn_urls.pop(id(conn))
+    pool = _db_pools[url]
+    try:
+        if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        broken = bool(conn.closed)
+    except psycopg2.Error:
+        broken = True
     try:
-        if method == 'GET':
-            params = event.get('queryStringParameters') or {}
-            user_id = params.get('user_id')
-            
-            if not user_id:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'user_id обязателен'}, ensure_ascii=False),
-                    'isBase64Encoded': False
-                }
-            
+        if broken:
+            _db_last_used.pop(id(conn), None)
+        else:
+            _db_last_used[id(conn)] = time.monotonic()
+        pool.putconn(conn, close=broken)
+    finally:
+        _db_pool_slots[url].release()
+
+def parse_lsn(value):
+    '''pg_lsn вида 16/B374D848 в число для сравнения; None для пустого или некорректного значения'''
+    try:
+        high, low = value.split('/')
+        return (int(high, 16) << 32) + int(low, 16)
+    except (AttributeError, ValueError):
+        return None
+
+def mark_replica_down(url: str) -> None:
+    _replica_states[url] = {'ok': False, 'lag_seconds': None, 'replay_lsn': None, 'checked_at': time.monotonic()}
+
+def check_replica(url: str, conn, min_lsn) -> bool:
+    '''Реплика годится, если отстаёт не больше REPLICA_MAX_LAG_SECONDS и уже проиграла WAL до min_lsn клиента'''
+    now = time.monotonic()
+    state = _replica_states.get(url)
+    if (
+        state is None
+        or now - state['checked_at'] >= REPLICA_CHECK_INTERVAL
+        or (min_lsn is not None and (state['replay_lsn'] or 0) < min_lsn)
+    ):
+        with conn.cursor() as cur:
             cur.execute(
-                'SELECT article_id FROM t_p18143168_police_reminder_app.bookmarks WHERE user_id = %s',
-                (user_id,)
+                '''SELECT pg_last_wal_replay_lsn()::text,
+                          CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                               ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'''
             )
-            bookmarks = cur.fetchall()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps([b['article_id'] for b in bookmarks], ensure_ascii=False),
-                'isBase64Encoded': False
-            }
-        
-        elif method == 'POST':
-            data = json.loads(event.get('body', '{}'))
-            user_id = data.get('user_id')
-            article_id = data.get('article_id')
-            
-            if not all([user_id, article_id]):
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'user_id и article_id обязательны'}, ensure_ascii=False),
-                    'isBase64Encoded': False
-                }
-            
-            try:
-                cur.execute(
-                    'INSERT INTO t_p18143168_police_reminder_app.bookmarks (user_id, article_id) VALUES (%s, %s)',
-                    (user_id, article_id)
-                )
-                conn.commit()
-                
-                return {
-                    'statusCode': 201,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'success': True}, ensure_ascii=False),
-                    'isBase64Encoded': False
-                }
-            except psycopg2.IntegrityError:
-                conn.rollback()
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'success': True, 'message': 'Уже в закладках'}, ensure_ascii=False),
-                    'isBase64Encoded': False
-                }
-        
-        elif method == 'DELETE':
-            params = event.get('queryStringParameters') or {}
-            user_id = params.get('user_id')
-            article_id = params.get('article_id')
-            
-            if not all([user_id, article_id]):
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'user_id и article_id обязательны'}, ensure_ascii=False),
-                    'isBase64Encoded': False
-                }
-            
+            replay_lsn, lag = cur.fetchone()
+        conn.rollback()
+        lag = float(lag) if lag is not None else None
+        state = _replica_states[url] = {
+            'ok': replay_lsn is not None and lag is not None and lag <= REPLICA_MAX_LAG_SECONDS,
+            'lag_seconds': lag,
+            'replay_lsn': parse_lsn(replay_lsn),
+            'checked_at': now
+        }
+    return state['ok'] and (min_lsn is None or state['replay_lsn'] >= min_lsn)
+
+def get_read_connection(min_lsn=None):
+    '''Реплики по кругу; отстающие и недоступные пропускаются до следующей проверки, в крайнем случае — primary'''
+    for _ in range(len(DATABASE_REPLICA_URLS)):
+        url = DATABASE_REPLICA_URLS[next(_replica_turn) % len(DATABASE_REPLICA_URLS)]
+        state = _replica_states.get(url)
+        if state and not state['ok'] and time.monotonic() - state['checked_at'] < REPLICA_CHECK_INTERVAL:
+            continue
+        try:
+            conn = get_db_connection(url)
+        except (psycopg2.Error, PoolError):
+            mark_replica_down(url)
+            continue
+        try:
+            usable = check_replica(url, conn, min_lsn)
+        except psycopg2.Error:
+            mark_replica_down(url)
+            usable = False
+        if usable:
+            db_pool_stats['replica_reads'] += 1
+            return conn
+        release_db_connection(conn)
+    db_pool_stats['primary_fallbacks'] += 1
+    return get_db_connection()
+
+def get_request_connection(event: dict):
+    '''GET читает с реплики; записи, long-poll и чтение после своей записи без догнавшей реплики — с primary'''
+    params = event.get('queryStringParameters') or {}
+    if (
+        not DATABASE_REPLICA_URLS
+        or event.get('httpMethod', 'GET') != 'GET'
+        or any(params.get(name) for name in PRIMARY_READ_PARAMS)
+    ):
+        return get_db_connection()
+    return get_read_connection(parse_lsn(get_request_header(event, 'X-Min-LSN')))
+
+def write_position_headers(cur) -> dict:
+    '''LSN после записи: клиент возвращает его в X-Min-LSN, и следующее чтение увидит эту запись'''
+    try:
+        cur.execute('SELECT pg_current_wal_lsn()::text AS lsn')
+        lsn = cur.fetchone()['lsn']
+    except psycopg2.Error:
+        return {}
+    return {'X-LSN': lsn, 'Access-Control-Expose-Headers': 'X-LSN'}
+
+def get_db_pool_stats() -> dict:
+    pool = _db_pools.get(os.environ.get('DATABASE_URL'))
+    open_count, in_use = pool.counts() if pool else (0, 0)
+    acquired = db_pool_stats['acquired']
+    return {
+        **db_pool_stats,
+        'open': open_count,
+        'in_use': in_use,
+        'max_size': DB_POOL_MAX_SIZE,
+        'wait_ms_avg': db_pool_stats['wait_ms_total'] / acquired if acquired else 0.0,
+        'replicas': [
+            {'ok': state['ok'], 'lag_seconds': state['lag_seconds']} if state else None
+            for state in map(_replica_states.get, DATABASE_REPLICA_URLS)
+        ]
+    }
+
+class RequestTrace:
+    '''Суммарное время по именованным участкам запроса и счётчики SQL'''
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.queries = 0
+        self.rows = 0
+    
+    def add(self, name: str, elapsed_ms: float) -> None:
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + elapsed_ms, count + 1)
+    
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+    
+    def server_timing(self) -> str:
+        metrics = [f'{name};dur={total:.1f}' for name, (total, _) in self.spans.items()]
+        metrics.append(f'total;dur={self.elapsed_ms():.1f}')
+        return ', '.join(metrics)
+
+def current_trace():
+    return getattr(_trace_local, 'trace', None)
+
+@contextmanager
+def trace_span(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = current_trace()
+        if trace is not None:
+            trace.add(name, (time.perf_counter() - started) * 1000)
+
+def log_event(event: str, **fields) -> None:
+    if TRACE_LOG:
+        print(json.dumps({'event': event, 'function': FUNCTION_NAME, **fields}, ensure_ascii=False, default=str), flush=True)
+
+def explain_query(conn, query, vars) -> list:
+    '''План без выполнения запроса; под savepoint, чтобы ошибка EXPLAIN не сломала транзакцию обработчика'''
+    if conn.get_transaction_status() == TRANSACTION_STATUS_INERROR:
+        return None
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        cur.execute('SAVEPOINT trace_explain')
+        try:
+            cur.execute('EXPLAIN (FORMAT JSON) ' + query, vars)
+            plan = cur.fetchone()[0]
+            cur.execute('RELEASE SAVEPOINT trace_explain')
+            return plan
+        except psycopg2.Error:
+            cur.execute('ROLLBACK TO SAVEPOINT trace_explain')
+            return None
+
+def record_query(cursor, query, vars, elapsed_ms: float) -> None:
+    trace = current_trace()
+    if trace is None:
+        return
+    trace.add('sql', elapsed_ms)
+    trace.queries += 1
+    trace.rows += max(cursor.rowcount, 0)
+    
+    if elapsed_ms >= TRACE_SLOW_QUERY_MS:
+        text = query.decode() if isinstance(query, bytes) else str(query)
+        plan = None
+        if TRACE_EXPLAIN_SLOW and text.lstrip().upper().startswith(('SELECT', 'WITH')):
+            plan = explain_query(cursor.connection, text, vars)
+        log_event('slow_query', duration_ms=round(elapsed_ms, 1), rows=cursor.rowcount, query=' '.join(text.split()), plan=plan)
+
+class TracedCursorMixin:
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(self, query, vars, (time.perf_counter() - started) * 1000)
+
+class TracedCursor(TracedCursorMixin, psycopg2.extensions.cursor):
+    pass
+
+class TracedDictCursor(TracedCursorMixin, RealDictCursor):
+    pass
+
+def log_request(event: dict, trace: RequestTrace, response) -> None:
+    log_event(
+        'request',
+        request_id=(event.get('requestContext') or {}).get('requestId'),
+        method=event.get('httpMethod'),
+        status=response['statusCode'] if response else 500,
+        duration_ms=round(trace.elapsed_ms(), 1),
+        queries=trace.queries,
+        rows=trace.rows,
+        spans={name: {'ms': round(total, 1), 'count': count} for name, (total, count) in trace.spans.items()},
+        db_pool=get_db_pool_stats()
+    )
+
+def get_request_header(event: dict, name: str):
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def b64url_decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+def decode_token(token: str):
+    '''Проверяет HMAC-подпись и срок действия токена локально, без запроса к БД'''
+    try:
+        payload_part, signature_part = token.split('.')
+        expected = hmac.new(os.environ['AUTH_TOKEN_SECRET'].encode(), payload_part.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, b64url_decode(signature_part)):
+            return None
+        payload = json.loads(b64url_decode(payload_part))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(payload, dict) or payload.get('exp', 0) < time.time():
+        return None
+    return payload
+
+def refresh_revocations(conn) -> None:
+    '''Раз в REVOCATION_REFRESH_INTERVAL подтягивает отозванные версии токенов, изменившиеся с прошлой проверки'''
+    global _revocations_checked_at, _revocations_seen_until
+    now = time.monotonic()
+    if now - _revocations_checked_at < REVOCATION_REFRESH_INTERVAL:
+        return
+    
+    with conn.cursor() as cur:
+        if _revocations_seen_until is None:
+            cur.execute('SELECT id, token_version, token_revoked_at FROM t_p18143168_police_reminder_app.users WHERE token_revoked_at IS NOT NULL')
+        else:
             cur.execute(
-                'DELETE FROM t_p18143168_police_reminder_app.bookmarks WHERE user_id = %s AND article_id = %s',
-                (user_id, article_id)
+                "SELECT id, token_version, token_revoked_at FROM t_p18143168_police_reminder_app.users WHERE token_revoked_at > %s - INTERVAL '1 minute'",
+                (_revocations_seen_until,)
             )
-            conn.commit()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True}, ensure_ascii=False),
-                'isBase64Encoded': False
-            }
-        
+        for user_id, token_version, revoked_at in cur.fetchall():
+            _revoked_versions[user_id] = token_version
+            if _revocations_seen_until is None or revoked_at > _revocations_seen_until:
+                _revocations_seen_until = revoked_at
+    _revocations_checked_at = now
+
+def authenticate(event: dict, conn):
+    '''Данные пользователя из токена X-Auth-Token (или Authorization: Bearer) либо None'''
+    token = get_request_header(event, 'X-Auth-Token')
+    if not token:
+        authorization = get_request_header(event, 'Authorization') or ''
+        token = authorization[7:] if authorization.startswith('Bearer ') else None
+    if not token:
+        return None
+    
+    payload = decode_token(token)
+    if not payload:
+        return None
+    
+    refresh_revocations(conn)
+    if payload.get('ver', 0) < _revoked_versions.get(payload.get('sub'), 0):
+        return None
+    return payload
+
+def require_auth(event: dict, conn) -> dict:
+    auth = authenticate(event, conn)
+    if not auth:
+        raise HttpError(401, 'Требуется авторизация')
+    return auth
+
+class HttpError(Exception):
+    '''Ошибка с HTTP-статусом, которую dispatch превращает в единый JSON-ответ'''
+    
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def encode_json(data) -> str:
+    with trace_span('json_encode'):
+        if orjson is not None:
+            return orjson.dumps(data, default=json_default).decode()
+        return json.dumps(data, ensure_ascii=False, default=json_default, separators=(',', ':'))
+
+def raw_json_response(body: str, status: int = 200, headers: dict = None) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+def json_response(data, status: int = 200, headers: dict = None) -> dict:
+    return raw_json_response(encode_json(data), status, headers)
+
+def error_response(status: int, message: str, headers: dict = None) -> dict:
+    return json_response({'error': message}, status, headers)
+
+def parse_json_body(event: dict) -> dict:
+    '''Тело запроса как JSON-объект; пустое или отсутствующее тело — пустой объект'''
+    try:
+        data = json.loads(event.get('body') or '{}')
+    except ValueError:
+        raise HttpError(400, 'Invalid JSON body')
+    if not isinstance(data, dict):
+        raise HttpError(400, 'JSON body must be an object')
+    return data
+
+def parse_int(value, name: str) -> int:
+    '''Целое из query-параметра или поля тела; мусор и чужой тип — 400, а не 500'''
+    if isinstance(value, bool):
+        raise HttpError(400, f'{name} должен быть целым числом')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f'{name} должен быть целым числом')
+
+def compress_response(event: dict, response: dict) -> dict:
+    '''gzip для тел больше GZIP_MIN_BYTES, если клиент его принимает'''
+    body = response['body']
+    if response['isBase64Encoded'] or len(body) < GZIP_MIN_BYTES or 'Content-Encoding' in response['headers']:
+        return response
+    if 'gzip' not in (get_request_header(event, 'Accept-Encoding') or ''):
+        return response
+    
+    response['headers'] = {**response['headers'], 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
+    with trace_span('gzip'):
+        response['body'] = base64.b64encode(gzip.compress(body.encode(), compresslevel=GZIP_LEVEL)).decode()
+    response['isBase64Encoded'] = True
+    return response
+
+def dispatch(event: dict, routes: dict) -> dict:
+    '''Общий путь запроса: preflight, маршрут по методу, соединение из пула, единые ошибки, сжатие, трассировка'''
+    method = event.get('httpMethod', 'GET')
+    if method == 'OPTIONS':
+        return {'statusCode': 200, 'headers': PREFLIGHT_HEADERS, 'body': '', 'isBase64Encoded': False}
+    
+    route = routes.get(method)
+    if route is None:
+        return error_response(405, 'Method not allowed')
+    
+    trace = RequestTrace()
+    _trace_local.trace = trace
+    response = None
+    try:
+        try:
+            with trace_span('db_connect'):
+                conn = get_request_connection(event)
+        except (psycopg2.Error, PoolError) as e:
+            log_event('db_unavailable', error=str(e))
+            response = error_response(503, 'Database unavailable', {'Retry-After': '1'})
+        except Exception as e:
+            log_event('request_failed', error=repr(e), traceback=traceback.format_exc())
+            response = error_response(500, 'Internal server error')
         else:
-            return {
-                'statusCode': 405,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Method not allowed'}, ensure_ascii=False),
-                'isBase64Encoded': False
-            }
-    
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}, ensure_ascii=False),
-            'isBase64Encoded': False
-        }
+            cursor = conn.cursor(cursor_factory=TracedDictCursor)
+            try:
+                response = route(event, conn, cursor)
+                if DATABASE_REPLICA_URLS and method != 'GET' and response['statusCode'] < 400:
+                    response['headers'] = {**response['headers'], **write_position_headers(cursor)}
+            except HttpError as e:
+                response = error_response(e.status, e.message, e.headers)
+            except psycopg2.DataError as e:
+                response = error_response(400, e.diag.message_primary or 'Invalid value')
+            except Exception as e:
+                log_event('request_failed', error=repr(e), traceback=traceback.format_exc())
+                response = error_response(500, 'Internal server error')
+            finally:
+                cursor.close()
+                release_db_connection(conn)
+        response = compress_response(event, response)
     finally:
-        if 'cur' in locals():
-            cur.close()
-        if 'conn' in locals():
-            conn.close()
+        _trace_local.trace = None
+        log_request(event, trace, response)
+    
+    response['headers'] = {**response['headers'], 'Server-Timing': trace.server_timing(), 'Timing-Allow-Origin': '*'}
+    return response
+
+def parse_article_ids(value) -> list:
+    '''Список id статей из JSON-массива, одиночного значения или строки "1,2,3"'''
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    elif not isinstance(value, list):
+        value = [value]
+    article_ids = sorted({parse_int(v, 'article_id') for v in value})
+    if len(article_ids) > BOOKMARK_BATCH_MAX:
+        raise HttpError(400, f'Не больше {BOOKMARK_BATCH_MAX} статей за запрос')
+    return article_ids
+
+def parse_limit(value, default: int, maximum: int) -> int:
+    '''limit из query-параметра, зажатый в [1, maximum]'''
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, 'limit должен быть целым числом')
+    return max(1, min(limit, maximum))
+
+def encode_cursor(bookmark: dict) -> str:
+    raw = f"{bookmark['bookmarked_at'].isoformat()}|{bookmark['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, article_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return created_at, int(article_id)
+    except ValueError:
+        raise HttpError(400, 'Некорректный cursor')
+
+def list_bookmarked_articles(cur, user_id: int, after=None, limit: int = BOOKMARK_PAGE_DEFAULT) -> dict:
+    '''Закладки вместе с краткими карточками статей одним запросом, новые сверху'''
+    query = f'''SELECT {BOOKMARK_ARTICLE_COLUMNS}
+                FROM t_p18143168_police_reminder_app.bookmarks b
+                JOIN t_p18143168_police_reminder_app.articles a ON a.id = b.article_id
+                WHERE b.user_id = %s'''
+    query_params = [SUMMARY_EXCERPT_LENGTH, user_id]
+    
+    if after:
+        query += ' AND (b.created_at, b.article_id) < (%s, %s)'
+        query_params.extend(decode_cursor(after))
+    
+    query += ' ORDER BY b.created_at DESC, b.article_id DESC LIMIT %s'
+    query_params.append(limit + 1)
+    
+    cur.execute(query, query_params)
+    items = cur.fetchall()
+    has_more = len(items) > limit
+    items = items[:limit]
+    
+    return {
+        'items': [dict(i) for i in items],
+        'next_cursor': encode_cursor(items[-1]) if has_more else None
+    }
+
+def handle_get(event: dict, conn, cur) -> dict:
+    user_id = require_auth(event, conn)['sub']
+    params = event.get('queryStringParameters') or {}
+    
+    if params.get('expand') == 'articles':
+        limit = parse_limit(params.get('limit'), BOOKMARK_PAGE_DEFAULT, BOOKMARK_PAGE_MAX)
+        return json_response(list_bookmarked_articles(cur, user_id, params.get('cursor'), limit))
+    
+    cur.execute(
+        'SELECT article_id FROM t_p18143168_police_reminder_app.bookmarks WHERE user_id = %s',
+        (user_id,)
+    )
+    return json_response([b['article_id'] for b in cur.fetchall()])
+
+def handle_post(event: dict, conn, cur) -> dict:
+    user_id = require_auth(event, conn)['sub']
+    data = parse_json_body(event)
+    article_ids = parse_article_ids(data.get('article_ids', data.get('article_id')))
+    if not article_ids:
+        raise HttpError(400, 'article_id или article_ids обязательны')
+    
+    cur.execute(
+        '''INSERT INTO t_p18143168_police_reminder_app.bookmarks (user_id, article_id)
+           SELECT %s, a.id FROM t_p18143168_police_reminder_app.articles a WHERE a.id = ANY(%s)
+           ON CONFLICT (user_id, article_id) DO NOTHING
+           RETURNING article_id''',
+        (user_id, article_ids)
+    )
+    added = sorted(b['article_id'] for b in cur.fetchall())
+    conn.commit()
+    
+    result = {'success': True, 'added': added}
+    if not added:
+        result['message'] = 'Уже в закладках'
+    return json_response(result, 201 if added else 200)
+
+def handle_delete(event: dict, conn, cur) -> dict:
+    user_id = require_auth(event, conn)['sub']
+    params = event.get('queryStringParameters') or {}
+    article_ids = parse_article_ids(params.get('article_ids') or params.get('article_id'))
+    if not article_ids:
+        raise HttpError(400, 'article_id или article_ids обязательны')
+    
+    cur.execute(
+        'DELETE FROM t_p18143168_police_reminder_app.bookmarks WHERE user_id = %s AND article_id = ANY(%s) RETURNING article_id',
+        (user_id, article_ids)
+    )
+    removed = sorted(b['article_id'] for b in cur.fetchall())
+    conn.commit()
+    return json_response({'success': True, 'removed': removed})
+
+ROUTES = {'GET': handle_get, 'POST': handle_post, 'DELETE': handle_delete}
+
+def handler(event: dict, context) -> dict:
+    return dispatch(event, ROUTES)
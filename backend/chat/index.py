@@ -1,93 +1,821 @@
 import json
 import os
+import base64
+import hmac
+import hashlib
+import sys
+import gzip
+import time
+import select
+import threading
+import traceback
+import itertools
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
 import psycopg2
+import psycopg2.errors
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INERROR
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 
-def get_db_connection():
-    dsn = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(dsn)
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def handler(event: dict, context) -> dict:
-    method = event.get('httpMethod', 'GET')
+CHAT_CHANNEL = 'chat_messages'
+CHAT_LONG_POLL_MAX = float(os.environ.get('CHAT_LONG_POLL_MAX', '25'))
+CHAT_PARTITIONS_AHEAD = 2
+CHAT_RETENTION_MONTHS = int(os.environ.get('CHAT_RETENTION_MONTHS', '6'))
+CHAT_ARCHIVE_DIR = os.environ.get('CHAT_ARCHIVE_DIR', 'chat_archive')
+HOT_WINDOW_REFRESH_INTERVAL = 60
+UNREAD_BATCH_MAX = 100
+CHAT_PAGE_DEFAULT = 50
+CHAT_PAGE_MAX = 200
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, Authorization, X-Min-LSN',
+    'Access-Control-Max-Age': '86400'
+}
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.environ.get('DB_POOL_ACQUIRE_TIMEOUT', '5'))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', '30'))
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', '5'))
+PRIMARY_READ_PARAMS = ('wait',)
+
+_db_pools = {}
+_db_pool_lock = threading.Lock()
+_db_pool_slots = {}
+_db_conn_urls = {}
+_db_last_used = {}
+_replica_turn = itertools.count()
+_replica_states = {}
+db_pool_stats = {'acquired': 0, 'reconnects': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0, 'replica_reads': 0, 'primary_fallbacks': 0}
+
+FUNCTION_NAME = 'chat'
+TRACE_LOG = os.environ.get('TRACE_LOG', '1') == '1'
+TRACE_SLOW_QUERY_MS = float(os.environ.get('TRACE_SLOW_QUERY_MS', '200'))
+TRACE_EXPLAIN_SLOW = os.environ.get('TRACE_EXPLAIN_SLOW', '0') == '1'
+
+_trace_local = threading.local()
+
+_hot_window = None
+_hot_window_checked_at = 0.0
+
+REVOCATION_REFRESH_INTERVAL = float(os.environ.get('REVOCATION_REFRESH_INTERVAL', '30'))
+
+_revoked_versions = {}
+_revocations_checked_at = 0.0
+_revocations_seen_until = None
+
+class LazyConnectionPool(ThreadedConnectionPool):
+    '''Соединения открываются по требованию, а возвращённые остаются в пуле до maxconn штук'''
     
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': '',
-            'isBase64Encoded': False
+    def __init__(self, maxconn: int, *args, **kwargs):
+        super().__init__(0, maxconn, *args, **kwargs)
+        self.minconn = maxconn
+    
+    def counts(self) -> tuple:
+        '''(открыто, выдано) — читает внутренние списки ThreadedConnectionPool под его же блокировкой'''
+        with self._lock:
+            return len(self._pool) + len(self._used), len(self._used)
+
+def get_db_pool(url: str = None) -> ThreadedConnectionPool:
+    '''Пул соединений живёт между тёплыми вызовами функции; у primary и каждой реплики свой пул'''
+    url = url or os.environ['DATABASE_URL']
+    pool = _db_pools.get(url)
+    if pool is None:
+        with _db_pool_lock:
+            pool = _db_pools.get(url)
+            if pool is None:
+                _db_pool_slots[url] = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+                pool = _db_pools[url] = LazyConnectionPool(DB_POOL_MAX_SIZE, url, cursor_factory=TracedCursor)
+    return pool
+
+def is_connection_healthy(conn) -> bool:
+    if conn.closed or conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+        return False
+    last_used = _db_last_used.get(id(conn))
+    if last_used is None or time.monotonic() - last_used < DB_POOL_PING_AFTER:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def get_db_connection(url: str = None):
+    url = url or os.environ['DATABASE_URL']
+    started = time.perf_counter()
+    pool = get_db_pool(url)
+    slots = _db_pool_slots[url]
+    if not slots.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT):
+        raise PoolError('Connection pool exhausted')
+    try:
+        conn = pool.getconn()
+        if not is_connection_healthy(conn):
+            _db_last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+            db_pool_stats['reconnects'] += 1
+    except Exception:
+        slots.release()
+        raise
+    _db_conn_urls[id(conn)] = url
+    wait_ms = (time.perf_counter() - started) * 1000
+    db_pool_stats['acquired'] += 1
+    db_pool_stats['wait_ms_total'] += wait_ms
+    db_pool_stats['wait_ms_max'] = max(db_pool_stats['wait_ms_max'], wait_ms)
+    return conn
+
+def release_db_connection(conn) -> None:
+    url = _db_conn_urls.pop(id(conn))
+    pool = _db_pools[url]
+    try:
+        if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        broken = bool(conn.closed)
+    except psycopg2.Error:
+        broken = True
+    try:
+        if broken:
+            _db_last_used.pop(id(conn), None)
+        else:
+            _db_last_used[id(conn)] = time.monotonic()
+        pool.putconn(conn, close=broken)
+    finally:
+        _db_pool_slots[url].release()
+
+def parse_lsn(value):
+    '''pg_lsn вида 16/B374D848 в число для сравнения; None для пустого или некорректного значения'''
+    try:
+        high, low = value.split('/')
+        return (int(high, 16) << 32) + int(low, 16)
+    except (AttributeError, ValueError):
+        return None
+
+def mark_replica_down(url: str) -> None:
+    _replica_states[url] = {'ok': False, 'lag_seconds': None, 'replay_lsn': None, 'checked_at': time.monotonic()}
+
+def check_replica(url: str, conn, min_lsn) -> bool:
+    '''Реплика годится, если отстаёт не больше REPLICA_MAX_LAG_SECONDS и уже проиграла WAL до min_lsn клиента'''
+    now = time.monotonic()
+    state = _replica_states.get(url)
+    if (
+        state is None
+        or now - state['checked_at'] >= REPLICA_CHECK_INTERVAL
+        or (min_lsn is not None and (state['replay_lsn'] or 0) < min_lsn)
+    ):
+        with conn.cursor() as cur:
+            cur.execute(
+                '''SELECT pg_last_wal_replay_lsn()::text,
+                          CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                               ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'''
+            )
+            replay_lsn, lag = cur.fetchone()
+        conn.rollback()
+        lag = float(lag) if lag is not None else None
+        state = _replica_states[url] = {
+            'ok': replay_lsn is not None and lag is not None and lag <= REPLICA_MAX_LAG_SECONDS,
+            'lag_seconds': lag,
+            'replay_lsn': parse_lsn(replay_lsn),
+            'checked_at': now
         }
+    return state['ok'] and (min_lsn is None or state['replay_lsn'] >= min_lsn)
+
+def get_read_connection(min_lsn=None):
+    '''Реплики по кругу; отстающие и недоступные пропускаются до следующей проверки, в крайнем случае — primary'''
+    for _ in range(len(DATABASE_REPLICA_URLS)):
+        url = DATABASE_REPLICA_URLS[next(_replica_turn) % len(DATABASE_REPLICA_URLS)]
+        state = _replica_states.get(url)
+        if state and not state['ok'] and time.monotonic() - state['checked_at'] < REPLICA_CHECK_INTERVAL:
+            continue
+        try:
+            conn = get_db_connection(url)
+        except (psycopg2.Error, PoolError):
+            mark_replica_down(url)
+            continue
+        try:
+            usable = check_replica(url, conn, min_lsn)
+        except psycopg2.Error:
+            mark_replica_down(url)
+            usable = False
+        if usable:
+            db_pool_stats['replica_reads'] += 1
+            return conn
+        release_db_connection(conn)
+    db_pool_stats['primary_fallbacks'] += 1
+    return get_db_connection()
+
+def get_request_connection(event: dict):
+    '''GET читает с реплики; записи, long-poll и чтение после своей записи без догнавшей реплики — с primary'''
+    params = event.get('queryStringParameters') or {}
+    if (
+        not DATABASE_REPLICA_URLS
+        or event.get('httpMethod', 'GET') != 'GET'
+        or any(params.get(name) for name in PRIMARY_READ_PARAMS)
+    ):
+        return get_db_connection()
+    return get_read_connection(parse_lsn(get_request_header(event, 'X-Min-LSN')))
+
+def write_position_headers(cur) -> dict:
+    '''LSN после записи: клиент возвращает его в X-Min-LSN, и следующее чтение увидит эту запись'''
+    try:
+        cur.execute('SELECT pg_current_wal_lsn()::text AS lsn')
+        lsn = cur.fetchone()['lsn']
+    except psycopg2.Error:
+        return {}
+    return {'X-LSN': lsn, 'Access-Control-Expose-Headers': 'X-LSN'}
+
+def get_db_pool_stats() -> dict:
+    pool = _db_pools.get(os.environ.get('DATABASE_URL'))
+    open_count, in_use = pool.counts() if pool else (0, 0)
+    acquired = db_pool_stats['acquired']
+    return {
+        **db_pool_stats,
+        'open': open_count,
+        'in_use': in_use,
+        'max_size': DB_POOL_MAX_SIZE,
+        'wait_ms_avg': db_pool_stats['wait_ms_total'] / acquired if acquired else 0.0,
+        'replicas': [
+            {'ok': state['ok'], 'lag_seconds': state['lag_seconds']} if state else None
+            for state in map(_replica_states.get, DATABASE_REPLICA_URLS)
+        ]
+    }
+
+class RequestTrace:
+    '''Суммарное время по именованным участкам запроса и счётчики SQL'''
     
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.queries = 0
+        self.rows = 0
     
+    def add(self, name: str, elapsed_ms: float) -> None:
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + elapsed_ms, count + 1)
+    
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+    
+    def server_timing(self) -> str:
+        metrics = [f'{name};dur={total:.1f}' for name, (total, _) in self.spans.items()]
+        metrics.append(f'total;dur={self.elapsed_ms():.1f}')
+        return ', '.join(metrics)
+
+def current_trace():
+    return getattr(_trace_local, 'trace', None)
+
+@contextmanager
+def trace_span(name: str):
+    started = time.perf_counter()
     try:
-        if method == 'GET':
-            params = event.get('queryStringParameters') or {}
-            limit = int(params.get('limit', 50))
-            
+        yield
+    finally:
+        trace = current_trace()
+        if trace is not None:
+            trace.add(name, (time.perf_counter() - started) * 1000)
+
+def log_event(event: str, **fields) -> None:
+    if TRACE_LOG:
+        print(json.dumps({'event': event, 'function': FUNCTION_NAME, **fields}, ensure_ascii=False, default=str), flush=True)
+
+def explain_query(conn, query, vars) -> list:
+    '''План без выполнения запроса; под savepoint, чтобы ошибка EXPLAIN не сломала транзакцию обработчика'''
+    if conn.get_transaction_status() == TRANSACTION_STATUS_INERROR:
+        return None
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        cur.execute('SAVEPOINT trace_explain')
+        try:
+            cur.execute('EXPLAIN (FORMAT JSON) ' + query, vars)
+            plan = cur.fetchone()[0]
+            cur.execute('RELEASE SAVEPOINT trace_explain')
+            return plan
+        except psycopg2.Error:
+            cur.execute('ROLLBACK TO SAVEPOINT trace_explain')
+            return None
+
+def record_query(cursor, query, vars, elapsed_ms: float) -> None:
+    trace = current_trace()
+    if trace is None:
+        return
+    trace.add('sql', elapsed_ms)
+    trace.queries += 1
+    trace.rows += max(cursor.rowcount, 0)
+    
+    if elapsed_ms >= TRACE_SLOW_QUERY_MS:
+        text = query.decode() if isinstance(query, bytes) else str(query)
+        plan = None
+        if TRACE_EXPLAIN_SLOW and text.lstrip().upper().startswith(('SELECT', 'WITH')):
+            plan = explain_query(cursor.connection, text, vars)
+        log_event('slow_query', duration_ms=round(elapsed_ms, 1), rows=cursor.rowcount, query=' '.join(text.split()), plan=plan)
+
+class TracedCursorMixin:
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(self, query, vars, (time.perf_counter() - started) * 1000)
+
+class TracedCursor(TracedCursorMixin, psycopg2.extensions.cursor):
+    pass
+
+class TracedDictCursor(TracedCursorMixin, RealDictCursor):
+    pass
+
+def log_request(event: dict, trace: RequestTrace, response) -> None:
+    log_event(
+        'request',
+        request_id=(event.get('requestContext') or {}).get('requestId'),
+        method=event.get('httpMethod'),
+        status=response['statusCode'] if response else 500,
+        duration_ms=round(trace.elapsed_ms(), 1),
+        queries=trace.queries,
+        rows=trace.rows,
+        spans={name: {'ms': round(total, 1), 'count': count} for name, (total, count) in trace.spans.items()},
+        db_pool=get_db_pool_stats()
+    )
+
+def get_request_header(event: dict, name: str):
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def b64url_decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+def decode_token(token: str):
+    '''Проверяет HMAC-подпись и срок действия токена локально, без запроса к БД'''
+    try:
+        payload_part, signature_part = token.split('.')
+        expected = hmac.new(os.environ['AUTH_TOKEN_SECRET'].encode(), payload_part.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, b64url_decode(signature_part)):
+            return None
+        payload = json.loads(b64url_decode(payload_part))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(payload, dict) or payload.get('exp', 0) < time.time():
+        return None
+    return payload
+
+def refresh_revocations(conn) -> None:
+    '''Раз в REVOCATION_REFRESH_INTERVAL подтягивает отозванные версии токенов, изменившиеся с прошлой проверки'''
+    global _revocations_checked_at, _revocations_seen_until
+    now = time.monotonic()
+    if now - _revocations_checked_at < REVOCATION_REFRESH_INTERVAL:
+        return
+    
+    with conn.cursor() as cur:
+        if _revocations_seen_until is None:
+            cur.execute('SELECT id, token_version, token_revoked_at FROM t_p18143168_police_reminder_app.users WHERE token_revoked_at IS NOT NULL')
+        else:
             cur.execute(
-                'SELECT * FROM t_p18143168_police_reminder_app.chat_messages ORDER BY created_at DESC LIMIT %s',
-                (limit,)
+                "SELECT id, token_version, token_revoked_at FROM t_p18143168_police_reminder_app.users WHERE token_revoked_at > %s - INTERVAL '1 minute'",
+                (_revocations_seen_until,)
             )
-            messages = cur.fetchall()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps([dict(m) for m in reversed(messages)], ensure_ascii=False, default=str),
-                'isBase64Encoded': False
-            }
-        
-        elif method == 'POST':
-            data = json.loads(event.get('body', '{}'))
-            user_id = data.get('user_id')
-            username = data.get('username')
-            message = data.get('message', '').strip()
-            
-            if not all([user_id, username, message]):
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Все поля обязательны'}, ensure_ascii=False),
-                    'isBase64Encoded': False
-                }
-            
+        for user_id, token_version, revoked_at in cur.fetchall():
+            _revoked_versions[user_id] = token_version
+            if _revocations_seen_until is None or revoked_at > _revocations_seen_until:
+                _revocations_seen_until = revoked_at
+    _revocations_checked_at = now
+
+def authenticate(event: dict, conn):
+    '''Данные пользователя из токена X-Auth-Token (или Authorization: Bearer) либо None'''
+    token = get_request_header(event, 'X-Auth-Token')
+    if not token:
+        authorization = get_request_header(event, 'Authorization') or ''
+        token = authorization[7:] if authorization.startswith('Bearer ') else None
+    if not token:
+        return None
+    
+    payload = decode_token(token)
+    if not payload:
+        return None
+    
+    refresh_revocations(conn)
+    if payload.get('ver', 0) < _revoked_versions.get(payload.get('sub'), 0):
+        return None
+    return payload
+
+def require_auth(event: dict, conn) -> dict:
+    auth = authenticate(event, conn)
+    if not auth:
+        raise HttpError(401, 'Требуется авторизация')
+    return auth
+
+class HttpError(Exception):
+    '''Ошибка с HTTP-статусом, которую dispatch превращает в единый JSON-ответ'''
+    
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def encode_json(data) -> str:
+    with trace_span('json_encode'):
+        if orjson is not None:
+            return orjson.dumps(data, default=json_default).decode()
+        return json.dumps(data, ensure_ascii=False, default=json_default, separators=(',', ':'))
+
+def raw_json_response(body: str, status: int = 200, headers: dict = None) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+def json_response(data, status: int = 200, headers: dict = None) -> dict:
+    return raw_json_response(encode_json(data), status, headers)
+
+def error_response(status: int, message: str, headers: dict = None) -> dict:
+    return json_response({'error': message}, status, headers)
+
+def parse_json_body(event: dict) -> dict:
+    '''Тело запроса как JSON-объект; пустое или отсутствующее тело — пустой объект'''
+    try:
+        data = json.loads(event.get('body') or '{}')
+    except ValueError:
+        raise HttpError(400, 'Invalid JSON body')
+    if not isinstance(data, dict):
+        raise HttpError(400, 'JSON body must be an object')
+    return data
+
+def parse_int(value, name: str) -> int:
+    '''Целое из query-параметра или поля тела; мусор и чужой тип — 400, а не 500'''
+    if isinstance(value, bool):
+        raise HttpError(400, f'{name} должен быть целым числом')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f'{name} должен быть целым числом')
+
+def body_text(data: dict, field: str) -> str:
+    '''Строковое поле тела: отсутствие — пустая строка, чужой тип или NUL (его не примет TEXT) — 400'''
+    value = data.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise HttpError(400, f'Поле {field} должно быть строкой')
+    if '\x00' in value:
+        raise HttpError(400, f'Поле {field} не должно содержать NUL')
+    return value
+
+def compress_response(event: dict, response: dict) -> dict:
+    '''gzip для тел больше GZIP_MIN_BYTES, если клиент его принимает'''
+    body = response['body']
+    if response['isBase64Encoded'] or len(body) < GZIP_MIN_BYTES or 'Content-Encoding' in response['headers']:
+        return response
+    if 'gzip' not in (get_request_header(event, 'Accept-Encoding') or ''):
+        return response
+    
+    response['headers'] = {**response['headers'], 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
+    with trace_span('gzip'):
+        response['body'] = base64.b64encode(gzip.compress(body.encode(), compresslevel=GZIP_LEVEL)).decode()
+    response['isBase64Encoded'] = True
+    return response
+
+def dispatch(event: dict, routes: dict) -> dict:
+    '''Общий путь запроса: preflight, маршрут по методу, соединение из пула, единые ошибки, сжатие, трассировка'''
+    method = event.get('httpMethod', 'GET')
+    if method == 'OPTIONS':
+        return {'statusCode': 200, 'headers': PREFLIGHT_HEADERS, 'body': '', 'isBase64Encoded': False}
+    
+    route = routes.get(method)
+    if route is None:
+        return error_response(405, 'Method not allowed')
+    
+    trace = RequestTrace()
+    _trace_local.trace = trace
+    response = None
+    try:
+        try:
+            with trace_span('db_connect'):
+                conn = get_request_connection(event)
+        except (psycopg2.Error, PoolError) as e:
+            log_event('db_unavailable', error=str(e))
+            response = error_response(503, 'Database unavailable', {'Retry-After': '1'})
+        except Exception as e:
+            log_event('request_failed', error=repr(e), traceback=traceback.format_exc())
+            response = error_response(500, 'Internal server error')
+        else:
+            cursor = conn.cursor(cursor_factory=TracedDictCursor)
+            try:
+                response = route(event, conn, cursor)
+                if DATABASE_REPLICA_URLS and method != 'GET' and response['statusCode'] < 400:
+                    response['headers'] = {**response['headers'], **write_position_headers(cursor)}
+            except HttpError as e:
+                response = error_response(e.status, e.message, e.headers)
+            except psycopg2.DataError as e:
+                response = error_response(400, e.diag.message_primary or 'Invalid value')
+            except Exception as e:
+                log_event('request_failed', error=repr(e), traceback=traceback.format_exc())
+                response = error_response(500, 'Internal server error')
+            finally:
+                cursor.close()
+                release_db_connection(conn)
+        response = compress_response(event, response)
+    finally:
+        _trace_local.trace = None
+        log_request(event, trace, response)
+    
+    response['headers'] = {**response['headers'], 'Server-Timing': trace.server_timing(), 'Timing-Allow-Origin': '*'}
+    return response
+
+def parse_limit(value, default: int, maximum: int) -> int:
+    '''limit из query-параметра, зажатый в [1, maximum]'''
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, 'limit должен быть целым числом')
+    return max(1, min(limit, maximum))
+
+def get_hot_window(cur) -> tuple:
+    '''Начало текущего месяца, последние id и seq до него: пока курсор не старше, запрос трогает только новую партицию'''
+    global _hot_window, _hot_window_checked_at
+    now = time.monotonic()
+    if _hot_window is None or now - _hot_window_checked_at > HOT_WINDOW_REFRESH_INTERVAL:
+        cur.execute("SELECT date_trunc('month', LOCALTIMESTAMP) AS month_start")
+        month_start = cur.fetchone()['month_start']
+        cur.execute(
+            'SELECT max(id) AS max_id, max(seq) AS max_seq FROM t_p18143168_police_reminder_app.chat_messages WHERE created_at < %s',
+            (month_start,)
+        )
+        previous = cur.fetchone()
+        _hot_window = (month_start, previous['max_id'] or 0, previous['max_seq'] or 0)
+        _hot_window_checked_at = now
+    return _hot_window
+
+def seq_for_id(cur, message_id: int) -> int:
+    '''seq сообщения с наибольшим id не больше message_id: курсор since_id старых клиентов переводится в seq'''
+    cur.execute(
+        'SELECT seq FROM t_p18143168_police_reminder_app.chat_messages WHERE id <= %s ORDER BY id DESC LIMIT 1',
+        (message_id,)
+    )
+    row = cur.fetchone()
+    return row['seq'] if row else 0
+
+def fetch_messages(cur, limit: int, since_seq=None, before_id=None) -> list:
+    '''Новые — keyset по seq: он выдаётся в порядке коммита (V0021), и сообщение, закоммиченное позже, не окажется
+    ниже уже выданного курсора, как это бывало с id. История — по id до before_id, последние — без курсора'''
+    month_start, _, previous_max_seq = get_hot_window(cur)
+    
+    if since_seq is not None:
+        if since_seq >= previous_max_seq:
             cur.execute(
-                'INSERT INTO t_p18143168_police_reminder_app.chat_messages (user_id, username, message) VALUES (%s, %s, %s) RETURNING *',
-                (user_id, username, message)
+                'SELECT * FROM t_p18143168_police_reminder_app.chat_messages WHERE seq > %s AND created_at >= %s ORDER BY seq ASC LIMIT %s',
+                (since_seq, month_start, limit)
             )
-            new_message = cur.fetchone()
-            conn.commit()
-            
-            return {
-                'statusCode': 201,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps(dict(new_message), ensure_ascii=False, default=str),
-                'isBase64Encoded': False
-            }
+        else:
+            cur.execute(
+                'SELECT * FROM t_p18143168_police_reminder_app.chat_messages WHERE seq > %s ORDER BY seq ASC LIMIT %s',
+                (since_seq, limit)
+            )
+        return cur.fetchall()
+    
+    if before_id is not None:
+        cur.execute(
+            'SELECT * FROM t_p18143168_police_reminder_app.chat_messages WHERE id < %s ORDER BY id DESC LIMIT %s',
+            (before_id, limit)
+        )
+        return list(reversed(cur.fetchall()))
+    
+    cur.execute(
+        'SELECT * FROM t_p18143168_police_reminder_app.chat_messages WHERE created_at >= %s ORDER BY seq DESC LIMIT %s',
+        (month_start, limit)
+    )
+    messages = cur.fetchall()
+    if len(messages) < limit:
+        cur.execute(
+            'SELECT * FROM t_p18143168_police_reminder_app.chat_messages ORDER BY seq DESC LIMIT %s',
+            (limit,)
+        )
+        messages = cur.fetchall()
+    return list(reversed(messages))
+
+def insert_message(conn, cur, user_id: int, username: str, message: str) -> dict:
+    '''Вставка с созданием месячной партиции на лету, если регламентная задача её ещё не создала'''
+    query = 'INSERT INTO t_p18143168_police_reminder_app.chat_messages (user_id, username, message) VALUES (%s, %s, %s) RETURNING *'
+    try:
+        cur.execute(query, (user_id, username, message))
+    except psycopg2.errors.CheckViolation:
+        conn.rollback()
+        cur.execute('SELECT t_p18143168_police_reminder_app.chat_messages_ensure_partition(LOCALTIMESTAMP)')
+        cur.execute(query, (user_id, username, message))
+    return cur.fetchone()
+
+def parse_user_ids(value: str) -> list:
+    user_ids = sorted({parse_int(v, 'user_ids') for v in value.split(',') if v.strip()})
+    if len(user_ids) > UNREAD_BATCH_MAX:
+        raise HttpError(400, f'Не больше {UNREAD_BATCH_MAX} пользователей за запрос')
+    return user_ids
+
+def get_unread_counts(cur, user_ids: list) -> dict:
+    '''Непрочитанные — разница между головой chat_message_seq и seq у маркера: два чтения по первичному ключу на
+    пользователя. seq выдаются в порядке коммита (V0021), поэтому позже закоммиченное сообщение не окажется ниже маркера'''
+    cur.execute(
+        '''SELECT u.user_id, GREATEST(s.seq - COALESCE(m.last_read_seq, 0), 0) AS unread, m.last_read_id
+           FROM unnest(%s::int[]) AS u(user_id)
+           CROSS JOIN t_p18143168_police_reminder_app.chat_message_seq s
+           LEFT JOIN t_p18143168_police_reminder_app.chat_read_markers m ON m.user_id = u.user_id
+           WHERE s.id = 1''',
+        (user_ids,)
+    )
+    return {row['user_id']: {'unread': row['unread'], 'last_read_id': row['last_read_id']} for row in cur.fetchall()}
+
+def mark_read(cur, user_id: int, last_read_id: int) -> bool:
+    '''Двигает маркер пользователя вперёд до сообщения last_read_id; назад маркер не откатывается'''
+    month_start, previous_max_id, _ = get_hot_window(cur)
+    if last_read_id > previous_max_id:
+        cur.execute(
+            '''SELECT id, seq FROM t_p18143168_police_reminder_app.chat_messages
+               WHERE id <= %s AND created_at >= %s ORDER BY id DESC LIMIT 1''',
+            (last_read_id, month_start)
+        )
+    else:
+        cur.execute(
+            'SELECT id, seq FROM t_p18143168_police_reminder_app.chat_messages WHERE id <= %s ORDER BY id DESC LIMIT 1',
+            (last_read_id,)
+        )
+    message = cur.fetchone()
+    if message is None:
+        return False
+    save_read_marker(cur, user_id, message['id'], message['seq'])
+    return True
+
+def save_read_marker(cur, user_id: int, message_id: int, seq: int) -> None:
+    cur.execute(
+        '''INSERT INTO t_p18143168_police_reminder_app.chat_read_markers (user_id, last_read_id, last_read_seq)
+           VALUES (%s, %s, %s)
+           ON CONFLICT (user_id) DO UPDATE
+           SET last_read_id = EXCLUDED.last_read_id, last_read_seq = EXCLUDED.last_read_seq, updated_at = CURRENT_TIMESTAMP
+           WHERE chat_read_markers.last_read_seq < EXCLUDED.last_read_seq''',
+        (user_id, message_id, seq)
+    )
+
+def ensure_chat_partitions(conn, months_ahead: int = CHAT_PARTITIONS_AHEAD) -> list:
+    with conn.cursor() as cur:
+        cur.execute(
+            '''SELECT t_p18143168_police_reminder_app.chat_messages_ensure_partition(LOCALTIMESTAMP + n * INTERVAL '1 month')
+               FROM generate_series(0, %s) AS n''',
+            (months_ahead,)
+        )
+        partitions = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return partitions
+
+def archive_chat_partitions(conn, keep_months: int = CHAT_RETENTION_MONTHS, archive_dir: str = CHAT_ARCHIVE_DIR) -> list:
+    '''Отсоединяет партиции старше keep_months, выгружает их в JSONL.gz и удаляет'''
+    os.makedirs(archive_dir, exist_ok=True)
+    with conn.cursor() as cur:
+        cur.execute(
+            '''SELECT c.relname
+               FROM pg_inherits i
+               JOIN pg_class c ON c.oid = i.inhrelid
+               JOIN pg_class p ON p.oid = i.inhparent
+               JOIN pg_namespace n ON n.oid = p.relnamespace
+               WHERE n.nspname = 't_p18143168_police_reminder_app' AND p.relname = 'chat_messages'
+                 AND c.relname < 'chat_messages_' || to_char(date_trunc('month', LOCALTIMESTAMP) - %s * INTERVAL '1 month', 'YYYY_MM')
+               ORDER BY c.relname''',
+            (keep_months,)
+        )
+        partitions = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    
+    archived = []
+    for partition in partitions:
+        with conn.cursor() as cur:
+            cur.execute(f'ALTER TABLE t_p18143168_police_reminder_app.chat_messages DETACH PARTITION t_p18143168_police_reminder_app.{partition}')
+        conn.commit()
+        
+        path = os.path.join(archive_dir, f'{partition}.jsonl.gz')
+        rows = 0
+        with gzip.open(path, 'wt', encoding='utf-8') as archive, conn.cursor(name=f'archive_{partition}', cursor_factory=RealDictCursor) as cur:
+            cur.itersize = 5000
+            cur.execute(f'SELECT * FROM t_p18143168_police_reminder_app.{partition} ORDER BY id')
+            for row in cur:
+                archive.write(json.dumps(dict(row), ensure_ascii=False, default=str) + '\n')
+                rows += 1
+        conn.commit()
         
+        with conn.cursor() as cur:
+            cur.execute(f'DROP TABLE t_p18143168_police_reminder_app.{partition}')
+        conn.commit()
+        archived.append({'partition': partition, 'rows': rows, 'path': path})
+    return archived
+
+def wait_for_messages(conn, cur, limit: int, since_seq: int, timeout: float) -> list:
+    '''Long-poll: держит запрос до NOTIFY о новом сообщении или до таймаута'''
+    cur.execute(f'LISTEN {CHAT_CHANNEL}')
+    conn.commit()
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            messages = fetch_messages(cur, limit, since_seq=since_seq)
+            conn.rollback()
+            remaining = deadline - time.monotonic()
+            if messages or remaining <= 0:
+                return messages
+            
+            with trace_span('listen_wait'):
+                ready = select.select([conn], [], [], remaining)
+            if ready == ([], [], []):
+                return []
+            conn.poll()
+            conn.notifies.clear()
+    finally:
+        cur.execute(f'UNLISTEN {CHAT_CHANNEL}')
+        conn.commit()
+
+def handle_get(event: dict, conn, cur) -> dict:
+    params = event.get('queryStringParameters') or {}
+    if params.get('view') == 'unread':
+        auth = require_auth(event, conn)
+        if params.get('user_ids'):
+            if not auth.get('adm'):
+                raise HttpError(403, 'Недостаточно прав')
+            counts = get_unread_counts(cur, parse_user_ids(params['user_ids']))
+            return json_response({str(user_id): count for user_id, count in counts.items()})
+        return json_response(get_unread_counts(cur, [auth['sub']])[auth['sub']])
+    
+    limit = parse_limit(params.get('limit'), CHAT_PAGE_DEFAULT, CHAT_PAGE_MAX)
+    since_seq = parse_int(params['since_seq'], 'since_seq') if params.get('since_seq') else None
+    if since_seq is None and params.get('since_id'):
+        since_seq = seq_for_id(cur, parse_int(params['since_id'], 'since_id'))
+    before_id = parse_int(params['before_id'], 'before_id') if params.get('before_id') else None
+    try:
+        wait = min(float(params.get('wait') or 0), CHAT_LONG_POLL_MAX)
+    except ValueError:
+        raise HttpError(400, 'wait должен быть числом')
+    
+    if since_seq is not None and wait > 0:
+        messages = wait_for_messages(conn, cur, limit, since_seq, wait)
+    else:
+        messages = fetch_messages(cur, limit, since_seq=since_seq, before_id=before_id)
+    return json_response(messages)
+
+def handle_post(event: dict, conn, cur) -> dict:
+    auth = require_auth(event, conn)
+    data = parse_json_body(event)
+    if data.get('action') == 'read':
+        if not mark_read(cur, auth['sub'], parse_int(data.get('last_read_id', 0), 'last_read_id')):
+            raise HttpError(404, 'Сообщение не найдено')
+        conn.commit()
+        return json_response(get_unread_counts(cur, [auth['sub']])[auth['sub']])
+    
+    message = body_text(data, 'message').strip()
+    if not message:
+        raise HttpError(400, 'Сообщение не может быть пустым')
+    
+    new_message = insert_message(conn, cur, auth['sub'], auth['name'], message)
+    save_read_marker(cur, auth['sub'], new_message['id'], new_message['seq'])
+    cur.execute(
+        'SELECT pg_notify(%s, %s)',
+        (CHAT_CHANNEL, json.dumps({'id': new_message['id'], 'seq': new_message['seq'], 'created_at': new_message['created_at'].isoformat()}))
+    )
+    conn.commit()
+    return json_response(new_message, 201)
+
+ROUTES = {'GET': handle_get, 'POST': handle_post}
+
+def handler(event: dict, context) -> dict:
+    return dispatch(event, ROUTES)
+
+if __name__ == '__main__':
+    conn = get_db_connection()
+    try:
+        command = sys.argv[1] if len(sys.argv) > 1 else 'archive'
+        if command == 'partitions':
+            print(json.dumps(ensure_chat_partitions(conn)))
         else:
-            return {
-                'statusCode': 405,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Method not allowed'}, ensure_ascii=False),
-                'isBase64Encoded': False
-            }
-    
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}, ensure_ascii=False),
-            'isBase64Encoded': False
-        }
+            ensure_chat_partitions(conn)
+            keep_months = int(sys.argv[2]) if len(sys.argv) > 2 else CHAT_RETENTION_MONTHS
+            print(json.dumps(archive_chat_partitions(conn, keep_months), ensure_ascii=False))
     finally:
-        if 'cur' in locals():
-            cur.close()
-        if 'conn' in locals():
-            conn.close()
+        release_db_connection(conn)
@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+# Бюджет холодного старта (импорт модуля + первый вызов handler), мс
+COLDSTART_BUDGETS_MS = {
+    'articles': 250,
+    'auth': 150,
+    'bookmarks': 150,
+    'chat': 150,
+}
+
+# Модули, которые не должны попадать в sys.modules при импорте функции
+LAZY_MODULES = {
+    'articles': ('boto3', 'botocore', 'PIL', 'numpy', 'scipy'),
+}
+
+# Запросы для первого вызова; GET ходит в БД и выполняется только с --with-db
+FIRST_CALL_EVENTS = {
+    'articles': {'httpMethod': 'GET', 'queryStringParameters': {'view': 'summary', 'limit': '20'}},
+    'chat': {'httpMethod': 'GET', 'queryStringParameters': {'limit': '50'}},
+}
+PREFLIGHT_EVENT = {'httpMethod': 'OPTIONS'}
+
+CHILD_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import index
+imported = time.perf_counter()
+index.handler(json.loads(sys.argv[1]), None)
+finished = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_call_ms': (finished - imported) * 1000,
+    'loaded': sorted(name for name in json.loads(sys.argv[2]) if name in sys.modules)
+}))
+'''
+
+
+def parse_importtime(stderr: str, top: int) -> list:
+    '''Самые тяжёлые импорты по собственному времени из вывода -X importtime'''
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({'module': name.strip(), 'self_ms': int(self_us) / 1000, 'cumulative_ms': int(cumulative_us) / 1000})
+    rows.sort(key=lambda row: row['self_ms'], reverse=True)
+    return rows[:top]
+
+
+def run_once(function: str, event: dict, importtime: bool) -> tuple:
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD_SCRIPT, json.dumps(event), json.dumps(LAZY_MODULES.get(function, ()))]
+    completed = subprocess.run(
+        command,
+        cwd=os.path.join(BACKEND_DIR, function),
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'},
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f'{function}: {completed.stderr.strip().splitlines()[-1]}')
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def profile_function(function: str, runs: int, with_db: bool, top: int) -> dict:
+    event = FIRST_CALL_EVENTS.get(function, PREFLIGHT_EVENT) if with_db else PREFLIGHT_EVENT
+    _, stderr = run_once(function, event, importtime=True)
+    samples = [run_once(function, event, importtime=False)[0] for _ in range(runs)]
+
+    import_ms = statistics.median(s['import_ms'] for s in samples)
+    first_call_ms = statistics.median(s['first_call_ms'] for s in samples)
+    return {
+        'event': event['httpMethod'],
+        'import_ms': round(import_ms, 2),
+        'first_call_ms': round(first_call_ms, 2),
+        'total_ms': round(import_ms + first_call_ms, 2),
+        'budget_ms': COLDSTART_BUDGETS_MS.get(function),
+        'eager_lazy_modules': samples[0]['loaded'],
+        'top_imports': parse_importtime(stderr, top)
+    }
+
+
+def check(function: str, result: dict, baseline: dict, tolerance: float) -> list:
+    failures = []
+    if result['eager_lazy_modules']:
+        failures.append(f"{function}: при импорте загружены {', '.join(result['eager_lazy_modules'])}")
+    if result['budget_ms'] is not None and result['total_ms'] > result['budget_ms']:
+        failures.append(f"{function}: {result['total_ms']} мс > бюджета {result['budget_ms']} мс")
+    previous = baseline.get(function)
+    if previous and result['total_ms'] > previous['total_ms'] * (1 + tolerance):
+        failures.append(f"{function}: {result['total_ms']} мс, в базовом замере {previous['total_ms']} мс (+{tolerance:.0%} допуск)")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Профиль холодного старта облачных функций')
+    parser.add_argument('functions', nargs='*', default=sorted(COLDSTART_BUDGETS_MS))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--with-db', action='store_true', help='первый вызов — GET с запросом к DATABASE_URL')
+    parser.add_argument('--baseline', help='JSON с прошлым замером для проверки регрессии')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--save', help='записать результат как новый базовый замер')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report = {}
+    failures = []
+    for function in args.functions:
+        report[function] = profile_function(function, args.runs, args.with_db, args.top)
+        failures.extend(check(function, report[function], baseline, args.tolerance))
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
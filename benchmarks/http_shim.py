@@ -0,0 +1,80 @@
+import argparse
+import base64
+import importlib.util
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+FUNCTIONS = ('articles', 'auth', 'bookmarks', 'chat')
+
+
+def load_functions(names=FUNCTIONS) -> dict:
+    '''Загружает index.py каждой функции под своим именем модуля: у всех файлов одинаковое имя'''
+    modules = {}
+    for name in names:
+        spec = importlib.util.spec_from_file_location(f'bench_{name}', os.path.join(BACKEND_DIR, name, 'index.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        modules[name] = module
+    return modules
+
+
+def make_event(method: str, params: dict = None, body: str = None, headers: dict = None, source_ip: str = '127.0.0.1') -> dict:
+    return {
+        'httpMethod': method,
+        'queryStringParameters': params or {},
+        'headers': headers or {},
+        'body': body,
+        'requestContext': {'identity': {'sourceIp': source_ip}},
+        'isBase64Encoded': False
+    }
+
+
+def make_request_handler(modules: dict):
+    class ShimHandler(BaseHTTPRequestHandler):
+        '''Превращает HTTP-запрос в event облачной функции: /<функция>?параметры'''
+        protocol_version = 'HTTP/1.1'
+
+        def handle_any(self):
+            url = urlsplit(self.path)
+            module = modules.get(url.path.strip('/'))
+            if module is None:
+                self.send_error(404)
+                return
+
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode() if length else None
+            event = make_event(self.command, dict(parse_qsl(url.query)), body, dict(self.headers), self.client_address[0])
+            response = module.handler(event, None)
+
+            payload = response.get('body') or ''
+            payload = base64.b64decode(payload) if response.get('isBase64Encoded') else payload.encode()
+            self.send_response(response['statusCode'])
+            for key, value in (response.get('headers') or {}).items():
+                self.send_header(key, value)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = do_PUT = do_DELETE = do_OPTIONS = handle_any
+
+        def log_message(self, format, *args):
+            pass
+
+    return ShimHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Локальный HTTP-сервер, вызывающий handler функций из backend/')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_request_handler(load_functions()))
+    print(f'http://{args.host}:{args.port}/{{{",".join(FUNCTIONS)}}}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
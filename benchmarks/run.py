@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+import psycopg2
+
+from http_shim import load_functions, make_event
+from seed import SCHEMA, VOCABULARY
+
+# Смеси запросов: (имя операции, вес)
+SCENARIOS = {
+    'chat_polling': (('chat_since', 80), ('chat_unread', 10), ('chat_page', 5), ('chat_post', 5)),
+    'article_search': (('article_search', 60), ('article_summary', 20), ('article_get', 15), ('article_facets', 5)),
+    'bookmark_toggle': (('bookmark_add', 40), ('bookmark_remove', 40), ('bookmark_list', 20)),
+    'mixed': (('chat_since', 40), ('article_search', 20), ('article_summary', 10), ('article_get', 10),
+              ('bookmark_add', 5), ('bookmark_remove', 5), ('bookmark_list', 5), ('chat_post', 5)),
+}
+
+
+class Workload:
+    '''Диапазоны id из засеянной базы и токены пользователей для построения запросов'''
+
+    def __init__(self, auth_module):
+        conn = psycopg2.connect(os.environ['DATABASE_URL'])
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f'SELECT min(id), max(id) FROM {SCHEMA}.articles')
+                self.article_ids = cur.fetchone()
+                cur.execute(f'SELECT id, username FROM {SCHEMA}.users ORDER BY id LIMIT 200')
+                users = cur.fetchall()
+                cur.execute(f'SELECT seq FROM {SCHEMA}.chat_message_seq WHERE id = 1')
+                self.last_chat_seq = cur.fetchone()[0]
+        finally:
+            conn.close()
+        if not users or self.article_ids[0] is None:
+            raise SystemExit('База пуста: сначала запустите benchmarks/seed.py')
+        self.tokens = [
+            auth_module.issue_token({'id': user_id, 'username': username, 'is_admin': False, 'token_version': 0})
+            for user_id, username in users
+        ]
+
+    def article_id(self) -> str:
+        return str(random.randint(*self.article_ids))
+
+    def auth_headers(self) -> dict:
+        return {'X-Auth-Token': random.choice(self.tokens), 'Accept-Encoding': 'gzip'}
+
+    def build(self, op: str) -> tuple:
+        '''(функция, метод, query-параметры, тело, заголовки)'''
+        if op == 'chat_since':
+            return 'chat', 'GET', {'since_seq': str(self.last_chat_seq - random.randint(0, 20)), 'limit': '50'}, None, {}
+        if op == 'chat_page':
+            return 'chat', 'GET', {'limit': '50'}, None, {}
+        if op == 'chat_unread':
+            return 'chat', 'GET', {'view': 'unread'}, None, self.auth_headers()
+        if op == 'chat_post':
+            return 'chat', 'POST', {}, json.dumps({'message': 'benchmark'}), self.auth_headers()
+        if op == 'article_search':
+            return 'articles', 'GET', {'search': random.choice(VOCABULARY)}, None, {'Accept-Encoding': 'gzip'}
+        if op == 'article_summary':
+            return 'articles', 'GET', {'view': 'summary', 'category': random.choice(['administrative', 'rights', 'laws', 'documents'])}, None, {'Accept-Encoding': 'gzip'}
+        if op == 'article_get':
+            return 'articles', 'GET', {'id': self.article_id()}, None, {}
+        if op == 'article_facets':
+            return 'articles', 'GET', {'view': 'facets'}, None, {}
+        if op == 'bookmark_add':
+            return 'bookmarks', 'POST', {}, json.dumps({'article_id': self.article_id()}), self.auth_headers()
+        if op == 'bookmark_remove':
+            return 'bookmarks', 'DELETE', {'article_id': self.article_id()}, None, self.auth_headers()
+        if op == 'bookmark_list':
+            return 'bookmarks', 'GET', {'expand': 'articles'}, None, self.auth_headers()
+        raise ValueError(op)
+
+
+def call_direct(modules: dict):
+    def call(function, method, params, body, headers) -> int:
+        return modules[function].handler(make_event(method, params, body, headers), None)['statusCode']
+    return call
+
+
+def call_http(base_url: str):
+    def call(function, method, params, body, headers) -> int:
+        url = f'{base_url}/{function}' + (f'?{urlencode(params)}' if params else '')
+        request = urllib.request.Request(url, data=body.encode() if body else None, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+    return call
+
+
+def percentile(values: list, p: float):
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * p))], 2)
+
+
+def summarize(latencies: list, errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / seconds, 1) if seconds else None,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': round(latencies[-1], 2) if latencies else None
+    }
+
+
+def run_scenario(name: str, call, workload: Workload, duration: float, concurrency: int, warmup: float) -> dict:
+    ops = [op for op, _ in SCENARIOS[name]]
+    weights = [weight for _, weight in SCENARIOS[name]]
+    samples = {op: [] for op in ops}
+    errors = {op: 0 for op in ops}
+    lock = threading.Lock()
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+
+    def worker():
+        while True:
+            op = random.choices(ops, weights)[0]
+            request = workload.build(op)
+            started = time.perf_counter()
+            if started >= deadline:
+                return
+            try:
+                status = call(*request)
+            except Exception:
+                status = 599
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if started < measure_from:
+                continue
+            with lock:
+                samples[op].append(elapsed_ms)
+                if status >= 500:
+                    errors[op] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_latencies = [value for values in samples.values() for value in values]
+    return {
+        **summarize(all_latencies, sum(errors.values()), duration),
+        'ops': {op: summarize(samples[op], errors[op], duration) for op in ops if samples[op]}
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    '''Сравнивает p95 по сценариям и операциям с прошлым замером'''
+    regressions = []
+    for scenario, result in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(scenario)
+        if not previous:
+            continue
+        pairs = [(scenario, result, previous)] + [
+            (f'{scenario}.{op}', stats, previous['ops'][op]) for op, stats in result['ops'].items() if op in previous.get('ops', {})
+        ]
+        for label, current, before in pairs:
+            if current['p95_ms'] and before['p95_ms']:
+                change = current['p95_ms'] / before['p95_ms'] - 1
+                print(f"{label:36} p95 {before['p95_ms']:>9} -> {current['p95_ms']:>9} мс ({change:+.0%})", file=sys.stderr)
+                if change > tolerance:
+                    regressions.append(label)
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон handler-ов против локального Postgres')
+    parser.add_argument('scenarios', nargs='*', default=sorted(SCENARIOS))
+    parser.add_argument('--target', choices=('direct', 'http'), default='direct')
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--out', help='сохранить результат в JSON')
+    parser.add_argument('--compare', help='JSON прошлого прогона; код выхода 1 при росте p95 больше --tolerance')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    os.environ.setdefault('AUTH_TOKEN_SECRET', 'benchmark-secret')
+    os.environ.setdefault('TRACE_LOG', '0')
+    modules = load_functions() if args.target == 'direct' else load_functions(('auth',))
+    call = call_direct(modules) if args.target == 'direct' else call_http(args.url.rstrip('/'))
+    workload = Workload(modules['auth'])
+
+    report = {
+        'commit': git_commit(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'target': args.target,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'scenarios': {}
+    }
+    for name in args.scenarios:
+        report['scenarios'][name] = run_scenario(name, call, workload, args.duration, args.concurrency, args.warmup)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Регрессия p95: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
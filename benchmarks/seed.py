@@ -0,0 +1,127 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import psycopg2
+
+SCHEMA = 't_p18143168_police_reminder_app'
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'db_migrations')
+
+# Таблица пользователей создаётся платформой, а не миграциями — для локальной базы повторяем её схему
+USERS_BOOTSTRAP = f'''CREATE TABLE IF NOT EXISTS {SCHEMA}.users (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(50) UNIQUE NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    is_admin BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)'''
+
+CATEGORIES = ['administrative', 'rights', 'laws', 'documents']
+VOCABULARY = [
+    'полиция', 'задержание', 'протокол', 'штраф', 'административный', 'правонарушение', 'статья', 'кодекс',
+    'уголовный', 'кража', 'хищение', 'транспорт', 'водитель', 'опьянение', 'документ', 'постановление',
+    'досмотр', 'изъятие', 'понятые', 'свидетель', 'потерпевший', 'заявление', 'рапорт', 'участковый',
+    'патруль', 'оружие', 'сила', 'спецсредства', 'наручники', 'обыск', 'арест', 'суд', 'прокурор',
+    'следователь', 'дознание', 'преступление', 'хулиганство', 'порядок', 'гражданин', 'права',
+    'обязанности', 'полномочия', 'удостоверение', 'паспорт', 'регистрация', 'миграция', 'наркотики',
+    'экспертиза', 'освидетельствование', 'эвакуация', 'лишение', 'предупреждение', 'санкция', 'срок',
+    'жалоба', 'обжалование', 'доставление', 'личность', 'установление', 'фиксация', 'видеозапись'
+]
+
+
+def apply_migrations(conn) -> list:
+    '''Пересоздаёт схему и применяет все миграции по порядку'''
+    with conn.cursor() as cur:
+        cur.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        cur.execute(f'CREATE SCHEMA {SCHEMA}')
+        cur.execute(f'SET search_path TO {SCHEMA}, public')
+        cur.execute(USERS_BOOTSTRAP)
+        applied = []
+        for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, 'V*.sql'))):
+            with open(path, encoding='utf-8') as f:
+                cur.execute(f.read())
+            applied.append(os.path.basename(path))
+    conn.commit()
+    return applied
+
+
+def timed(conn, timings: dict, label: str, query: str, params=None) -> None:
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+    conn.commit()
+    timings[label] = round(time.perf_counter() - started, 2)
+
+
+def seed(conn, articles: int, users: int, bookmarks: int, chat_messages: int, chat_months: int) -> dict:
+    timings = {}
+    timed(conn, timings, 'users', f'''
+        INSERT INTO {SCHEMA}.users (username, email, password_hash)
+        SELECT 'bench_user_' || g, 'bench_user_' || g || '@example.com', 'bench'
+        FROM generate_series(1, %s) g''', (users,))
+
+    timed(conn, timings, 'articles', f'''
+        INSERT INTO {SCHEMA}.articles (title, content, category, tags, created_at, updated_at)
+        SELECT
+            'Статья ' || g || ' ' || w.words[1 + g %% array_length(w.words, 1)],
+            (SELECT string_agg(w.words[1 + (i + floor(random() * array_length(w.words, 1))::int) %% array_length(w.words, 1)], ' ' ORDER BY i)
+             FROM generate_series(1, 40 + g %% 160) AS s(i)),
+            (%s::text[])[1 + g %% 4],
+            ARRAY[w.words[1 + (g * 7) %% array_length(w.words, 1)], w.words[1 + (g * 13) %% array_length(w.words, 1)]],
+            LOCALTIMESTAMP - (%s - g) * INTERVAL '10 minutes',
+            LOCALTIMESTAMP - (%s - g) * INTERVAL '10 minutes'
+        FROM generate_series(1, %s) g, (SELECT %s::text[] AS words) w''',
+        (CATEGORIES, articles, articles, articles, VOCABULARY))
+
+    timed(conn, timings, 'bookmarks', f'''
+        INSERT INTO {SCHEMA}.bookmarks (user_id, article_id, created_at)
+        SELECT 1 + floor(random() * %s)::int, 1 + floor(random() * %s)::int, LOCALTIMESTAMP - random() * INTERVAL '90 days'
+        FROM generate_series(1, %s)
+        ON CONFLICT DO NOTHING''', (users, articles, bookmarks))
+
+    timed(conn, timings, 'chat_partitions', f'''
+        SELECT {SCHEMA}.chat_messages_ensure_partition(LOCALTIMESTAMP - n * INTERVAL '1 month')
+        FROM generate_series(0, %s) n''', (chat_months,))
+
+    timed(conn, timings, 'chat_messages', f'''
+        INSERT INTO {SCHEMA}.chat_messages (user_id, username, message, created_at)
+        SELECT u, 'bench_user_' || u, 'Сообщение ' || g, created_at
+        FROM (
+            SELECT g, 1 + g %% %s AS u,
+                   LOCALTIMESTAMP - (1 - g::float / %s) * %s * INTERVAL '1 month' AS created_at
+            FROM generate_series(1, %s) g
+        ) s
+        ORDER BY g''', (users, chat_messages, chat_months, chat_messages))
+
+    started = time.perf_counter()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute('ANALYZE')
+    conn.autocommit = False
+    timings['analyze'] = round(time.perf_counter() - started, 2)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Пересоздаёт локальную схему и наполняет её синтетическими данными')
+    parser.add_argument('--articles', type=int, default=50000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--bookmarks', type=int, default=100000)
+    parser.add_argument('--chat-messages', type=int, default=1000000)
+    parser.add_argument('--chat-months', type=int, default=6)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        migrations = apply_migrations(conn)
+        timings = seed(conn, args.articles, args.users, args.bookmarks, args.chat_messages, args.chat_months)
+    finally:
+        conn.close()
+    print(json.dumps({'migrations': migrations, 'volumes': vars(args), 'seconds': timings}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+-- Full-text search: russian-stemmed tsvector maintained by trigger, title weighted highest
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE t_p18143168_police_reminder_app.articles
+ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.articles_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(array_to_string(NEW.tags, ' '), '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.content, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER articles_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, content, tags ON t_p18143168_police_reminder_app.articles
+FOR EACH ROW EXECUTE FUNCTION t_p18143168_police_reminder_app.articles_search_vector_update();
+
+UPDATE t_p18143168_police_reminder_app.articles SET title = title;
+
+CREATE INDEX IF NOT EXISTS idx_articles_search_vector
+ON t_p18143168_police_reminder_app.articles USING GIN(search_vector);
+
+-- Trigram index on titles for typo-tolerant fallback ("КоАП", "КАП", "коап")
+CREATE INDEX IF NOT EXISTS idx_articles_title_trgm
+ON t_p18143168_police_reminder_app.articles USING GIN(lower(title) gin_trgm_ops);
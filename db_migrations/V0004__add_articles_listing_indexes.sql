@@ -0,0 +1,6 @@
+-- Keyset pagination of the article list: (created_at, id) with optional category filter
+CREATE INDEX IF NOT EXISTS idx_articles_category_created_at
+ON t_p18143168_police_reminder_app.articles (category, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_articles_created_at
+ON t_p18143168_police_reminder_app.articles (created_at DESC, id DESC);
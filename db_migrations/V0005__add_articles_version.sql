@@ -0,0 +1,21 @@
+-- Collection version for HTTP conditional caching, bumped by any write to articles
+CREATE TABLE IF NOT EXISTS t_p18143168_police_reminder_app.articles_version (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO t_p18143168_police_reminder_app.articles_version (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.articles_version_bump() RETURNS trigger AS $$
+BEGIN
+    UPDATE t_p18143168_police_reminder_app.articles_version
+    SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER articles_version_trigger
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON t_p18143168_police_reminder_app.articles
+FOR EACH STATEMENT EXECUTE FUNCTION t_p18143168_police_reminder_app.articles_version_bump();
@@ -0,0 +1,46 @@
+-- Category/tag counts maintained incrementally by trigger instead of unnest(tags) over the whole table
+CREATE TABLE IF NOT EXISTS t_p18143168_police_reminder_app.article_facets (
+    kind VARCHAR(20) NOT NULL CHECK (kind IN ('category', 'tag')),
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, value)
+);
+
+INSERT INTO t_p18143168_police_reminder_app.article_facets (kind, value, count)
+SELECT 'category', category, count(*) FROM t_p18143168_police_reminder_app.articles GROUP BY category
+UNION ALL
+SELECT 'tag', tag, count(*)
+FROM (SELECT DISTINCT id, unnest(tags) AS tag FROM t_p18143168_police_reminder_app.articles) t
+GROUP BY tag
+ON CONFLICT (kind, value) DO UPDATE SET count = EXCLUDED.count;
+
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.article_facets_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.category IS NOT DISTINCT FROM NEW.category AND OLD.tags IS NOT DISTINCT FROM NEW.tags THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO t_p18143168_police_reminder_app.article_facets (kind, value, count)
+        SELECT 'category', OLD.category, -1
+        UNION ALL
+        SELECT 'tag', tag, -1 FROM (SELECT DISTINCT unnest(OLD.tags) AS tag) t
+        ON CONFLICT (kind, value) DO UPDATE SET count = article_facets.count + EXCLUDED.count;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO t_p18143168_police_reminder_app.article_facets (kind, value, count)
+        SELECT 'category', NEW.category, 1
+        UNION ALL
+        SELECT 'tag', tag, 1 FROM (SELECT DISTINCT unnest(NEW.tags) AS tag) t
+        ON CONFLICT (kind, value) DO UPDATE SET count = article_facets.count + EXCLUDED.count;
+    END IF;
+
+    DELETE FROM t_p18143168_police_reminder_app.article_facets WHERE count <= 0;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER article_facets_trigger
+AFTER INSERT OR DELETE OR UPDATE OF category, tags ON t_p18143168_police_reminder_app.articles
+FOR EACH ROW EXECUTE FUNCTION t_p18143168_police_reminder_app.article_facets_update();
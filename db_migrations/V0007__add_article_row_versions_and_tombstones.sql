@@ -0,0 +1,41 @@
+-- Per-row change versions and deletion tombstones for offline snapshot/delta sync
+CREATE SEQUENCE IF NOT EXISTS t_p18143168_police_reminder_app.articles_row_version_seq;
+
+ALTER TABLE t_p18143168_police_reminder_app.articles
+ADD COLUMN IF NOT EXISTS row_version BIGINT NOT NULL DEFAULT nextval('t_p18143168_police_reminder_app.articles_row_version_seq');
+
+CREATE INDEX IF NOT EXISTS idx_articles_row_version
+ON t_p18143168_police_reminder_app.articles (row_version);
+
+CREATE TABLE IF NOT EXISTS t_p18143168_police_reminder_app.article_tombstones (
+    article_id INTEGER PRIMARY KEY,
+    row_version BIGINT NOT NULL,
+    deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_article_tombstones_row_version
+ON t_p18143168_police_reminder_app.article_tombstones (row_version);
+
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.articles_row_version_update() RETURNS trigger AS $$
+BEGIN
+    NEW.row_version := nextval('t_p18143168_police_reminder_app.articles_row_version_seq');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER articles_row_version_trigger
+BEFORE UPDATE ON t_p18143168_police_reminder_app.articles
+FOR EACH ROW EXECUTE FUNCTION t_p18143168_police_reminder_app.articles_row_version_update();
+
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.articles_tombstone_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO t_p18143168_police_reminder_app.article_tombstones (article_id, row_version)
+    VALUES (OLD.id, nextval('t_p18143168_police_reminder_app.articles_row_version_seq'))
+    ON CONFLICT (article_id) DO UPDATE SET row_version = EXCLUDED.row_version, deleted_at = CURRENT_TIMESTAMP;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER articles_tombstone_trigger
+AFTER DELETE ON t_p18143168_police_reminder_app.articles
+FOR EACH ROW EXECUTE FUNCTION t_p18143168_police_reminder_app.articles_tombstone_insert();
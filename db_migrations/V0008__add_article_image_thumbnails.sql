@@ -0,0 +1,3 @@
+-- WebP thumbnails derived from the article image, keyed by width
+ALTER TABLE t_p18143168_police_reminder_app.articles
+ADD COLUMN IF NOT EXISTS image_thumbnails JSONB NOT NULL DEFAULT '{}';
@@ -0,0 +1,27 @@
+-- Background image ingestion: articles are written immediately, a SKIP LOCKED worker attaches the image
+ALTER TABLE t_p18143168_police_reminder_app.articles
+ADD COLUMN IF NOT EXISTS image_status VARCHAR(20) NOT NULL DEFAULT 'none'
+CHECK (image_status IN ('none', 'pending', 'ready', 'failed'));
+
+UPDATE t_p18143168_police_reminder_app.articles SET image_status = 'ready' WHERE image_url IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS t_p18143168_police_reminder_app.image_jobs (
+    id SERIAL PRIMARY KEY,
+    article_id INTEGER NOT NULL REFERENCES t_p18143168_police_reminder_app.articles(id) ON DELETE CASCADE,
+    image_key VARCHAR(500),
+    image_data BYTEA,
+    filename VARCHAR(255),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'done', 'cancelled', 'dead')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_image_jobs_pending
+ON t_p18143168_police_reminder_app.image_jobs (run_after) WHERE status = 'pending';
+
+CREATE INDEX IF NOT EXISTS idx_image_jobs_article
+ON t_p18143168_police_reminder_app.image_jobs (article_id) WHERE status = 'pending';
@@ -0,0 +1,9 @@
+-- Signed session tokens carry token_version; bumping it revokes every token issued before
+ALTER TABLE t_p18143168_police_reminder_app.users
+ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE t_p18143168_police_reminder_app.users
+ADD COLUMN IF NOT EXISTS token_revoked_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_users_token_revoked_at
+ON t_p18143168_police_reminder_app.users (token_revoked_at) WHERE token_revoked_at IS NOT NULL;
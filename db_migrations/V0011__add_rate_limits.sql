@@ -0,0 +1,7 @@
+-- Sliding-window counters for login/registration throttling shared across function instances
+CREATE UNLOGGED TABLE IF NOT EXISTS t_p18143168_police_reminder_app.rate_limits (
+    key VARCHAR(300) NOT NULL,
+    bucket BIGINT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (key, bucket)
+);
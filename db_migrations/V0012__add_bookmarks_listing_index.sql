@@ -0,0 +1,3 @@
+-- Bookmarks listed newest first per user with keyset pagination on (created_at, article_id)
+CREATE INDEX IF NOT EXISTS idx_bookmarks_user_created_at
+ON t_p18143168_police_reminder_app.bookmarks (user_id, created_at DESC, article_id DESC);
@@ -0,0 +1,43 @@
+-- Monthly range partitions for chat_messages; existing rows are moved into the partitioned table
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.chat_messages_ensure_partition(ts TIMESTAMP) RETURNS TEXT AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', ts);
+    partition_name TEXT := 'chat_messages_' || to_char(month_start, 'YYYY_MM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS t_p18143168_police_reminder_app.%I PARTITION OF t_p18143168_police_reminder_app.chat_messages FOR VALUES FROM (%L) TO (%L)',
+        partition_name, month_start, month_start + INTERVAL '1 month'
+    );
+    RETURN partition_name;
+END
+$$ LANGUAGE plpgsql;
+
+ALTER TABLE t_p18143168_police_reminder_app.chat_messages RENAME TO chat_messages_legacy;
+ALTER INDEX t_p18143168_police_reminder_app.chat_messages_pkey RENAME TO chat_messages_legacy_pkey;
+
+CREATE TABLE t_p18143168_police_reminder_app.chat_messages (
+    id INTEGER NOT NULL DEFAULT nextval('t_p18143168_police_reminder_app.chat_messages_id_seq'),
+    user_id INTEGER REFERENCES t_p18143168_police_reminder_app.users(id),
+    username VARCHAR(50) NOT NULL,
+    message TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_chat_messages_created_at
+ON t_p18143168_police_reminder_app.chat_messages (created_at DESC, id DESC);
+
+SELECT t_p18143168_police_reminder_app.chat_messages_ensure_partition(month_start)
+FROM generate_series(
+    date_trunc('month', COALESCE((SELECT min(created_at) FROM t_p18143168_police_reminder_app.chat_messages_legacy), LOCALTIMESTAMP)),
+    date_trunc('month', LOCALTIMESTAMP) + INTERVAL '2 months',
+    INTERVAL '1 month'
+) AS month_start;
+
+INSERT INTO t_p18143168_police_reminder_app.chat_messages (id, user_id, username, message, created_at)
+SELECT id, user_id, username, message, COALESCE(created_at, LOCALTIMESTAMP)
+FROM t_p18143168_police_reminder_app.chat_messages_legacy;
+
+ALTER SEQUENCE t_p18143168_police_reminder_app.chat_messages_id_seq OWNED BY t_p18143168_police_reminder_app.chat_messages.id;
+
+DROP TABLE t_p18143168_police_reminder_app.chat_messages_legacy;
@@ -0,0 +1,14 @@
+-- Natural key for bulk imports: code (koap, uk, fz_police...) plus article number; re-importing a code updates rows in place
+ALTER TABLE t_p18143168_police_reminder_app.articles
+ADD COLUMN IF NOT EXISTS source_code VARCHAR(50);
+
+ALTER TABLE t_p18143168_police_reminder_app.articles
+ADD COLUMN IF NOT EXISTS source_number VARCHAR(50);
+
+UPDATE t_p18143168_police_reminder_app.articles
+SET source_code = CASE WHEN title LIKE '%КоАП РФ' THEN 'koap' ELSE 'uk' END,
+    source_number = substring(title FROM '^Статья ([0-9.]+) ')
+WHERE source_code IS NULL AND title ~ '^Статья [0-9.]+ (КоАП|УК) РФ$';
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_source_key
+ON t_p18143168_police_reminder_app.articles (source_code, source_number);
@@ -0,0 +1,49 @@
+-- Precomputed related articles: top-k TF-IDF cosine neighbours per article, refreshed by a batch job from a dirty queue
+CREATE TABLE IF NOT EXISTS t_p18143168_police_reminder_app.article_neighbors (
+    article_id INTEGER NOT NULL REFERENCES t_p18143168_police_reminder_app.articles(id) ON DELETE CASCADE,
+    rank SMALLINT NOT NULL,
+    neighbor_id INTEGER NOT NULL REFERENCES t_p18143168_police_reminder_app.articles(id) ON DELETE CASCADE,
+    score REAL NOT NULL,
+    PRIMARY KEY (article_id, rank)
+);
+
+CREATE INDEX IF NOT EXISTS idx_article_neighbors_neighbor
+ON t_p18143168_police_reminder_app.article_neighbors (neighbor_id);
+
+CREATE TABLE IF NOT EXISTS t_p18143168_police_reminder_app.article_similarity_queue (
+    article_id INTEGER PRIMARY KEY,
+    queued_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO t_p18143168_police_reminder_app.article_similarity_queue (article_id)
+SELECT id FROM t_p18143168_police_reminder_app.articles
+ON CONFLICT (article_id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.article_similarity_enqueue() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- Articles that listed the deleted one lose that row by cascade and need a fresh neighbour list
+        INSERT INTO t_p18143168_police_reminder_app.article_similarity_queue (article_id)
+        SELECT article_id FROM t_p18143168_police_reminder_app.article_neighbors WHERE neighbor_id = OLD.id
+        ON CONFLICT (article_id) DO NOTHING;
+        RETURN OLD;
+    END IF;
+
+    IF TG_OP = 'UPDATE' AND OLD.title IS NOT DISTINCT FROM NEW.title AND OLD.content IS NOT DISTINCT FROM NEW.content
+       AND OLD.tags IS NOT DISTINCT FROM NEW.tags THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO t_p18143168_police_reminder_app.article_similarity_queue (article_id) VALUES (NEW.id)
+    ON CONFLICT (article_id) DO UPDATE SET queued_at = EXCLUDED.queued_at;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER article_similarity_enqueue_trigger
+AFTER INSERT OR UPDATE OF title, content, tags ON t_p18143168_police_reminder_app.articles
+FOR EACH ROW EXECUTE FUNCTION t_p18143168_police_reminder_app.article_similarity_enqueue();
+
+CREATE TRIGGER article_similarity_delete_trigger
+BEFORE DELETE ON t_p18143168_police_reminder_app.articles
+FOR EACH ROW EXECUTE FUNCTION t_p18143168_police_reminder_app.article_similarity_enqueue();
@@ -0,0 +1,41 @@
+-- Gapless message sequence and per-user read markers: unread = current seq - seq at the marker, without counting chat_messages
+CREATE TABLE IF NOT EXISTS t_p18143168_police_reminder_app.chat_message_seq (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    seq BIGINT NOT NULL DEFAULT 0
+);
+
+ALTER TABLE t_p18143168_police_reminder_app.chat_messages ADD COLUMN IF NOT EXISTS seq BIGINT;
+
+UPDATE t_p18143168_police_reminder_app.chat_messages m
+SET seq = numbered.seq
+FROM (
+    SELECT id, created_at, row_number() OVER (ORDER BY id) AS seq
+    FROM t_p18143168_police_reminder_app.chat_messages
+) numbered
+WHERE m.id = numbered.id AND m.created_at = numbered.created_at;
+
+INSERT INTO t_p18143168_police_reminder_app.chat_message_seq (id, seq)
+SELECT 1, count(*) FROM t_p18143168_police_reminder_app.chat_messages
+ON CONFLICT (id) DO NOTHING;
+
+-- The counter row lock is held until commit, so concurrent inserts take numbers one after another and a rollback leaves no gap
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.chat_message_seq_next() RETURNS trigger AS $$
+BEGIN
+    UPDATE t_p18143168_police_reminder_app.chat_message_seq
+    SET seq = seq + 1
+    WHERE id = 1
+    RETURNING seq INTO NEW.seq;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER chat_message_seq_trigger
+BEFORE INSERT ON t_p18143168_police_reminder_app.chat_messages
+FOR EACH ROW EXECUTE FUNCTION t_p18143168_police_reminder_app.chat_message_seq_next();
+
+CREATE TABLE IF NOT EXISTS t_p18143168_police_reminder_app.chat_read_markers (
+    user_id INTEGER PRIMARY KEY REFERENCES t_p18143168_police_reminder_app.users(id) ON DELETE CASCADE,
+    last_read_id INTEGER NOT NULL,
+    last_read_seq BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
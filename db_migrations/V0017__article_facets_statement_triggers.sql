@@ -0,0 +1,72 @@
+-- Facet counts per statement from transition tables; zero counts are removed only for the keys the statement touched
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.article_facets_apply_delta(
+    delta_kinds TEXT[], delta_values TEXT[], delta_counts INTEGER[]
+) RETURNS void AS $$
+BEGIN
+    INSERT INTO t_p18143168_police_reminder_app.article_facets (kind, value, count)
+    SELECT kind, value, sum(count)
+    FROM unnest(delta_kinds, delta_values, delta_counts) AS d(kind, value, count)
+    GROUP BY kind, value
+    HAVING sum(count) <> 0
+    ON CONFLICT (kind, value) DO UPDATE SET count = article_facets.count + EXCLUDED.count;
+
+    DELETE FROM t_p18143168_police_reminder_app.article_facets f
+    USING (SELECT DISTINCT kind, value FROM unnest(delta_kinds, delta_values) AS d(kind, value)) d
+    WHERE f.kind = d.kind AND f.value = d.value AND f.count <= 0;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.article_facets_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM t_p18143168_police_reminder_app.article_facets_apply_delta(array_agg(kind), array_agg(value), array_agg(count))
+        FROM (
+            SELECT 'category' AS kind, category AS value, 1 AS count FROM new_rows
+            UNION ALL
+            SELECT 'tag', t.tag, 1 FROM new_rows r CROSS JOIN LATERAL (SELECT DISTINCT unnest(r.tags) AS tag) t
+        ) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM t_p18143168_police_reminder_app.article_facets_apply_delta(array_agg(kind), array_agg(value), array_agg(count))
+        FROM (
+            SELECT 'category' AS kind, category AS value, -1 AS count FROM old_rows
+            UNION ALL
+            SELECT 'tag', t.tag, -1 FROM old_rows r CROSS JOIN LATERAL (SELECT DISTINCT unnest(r.tags) AS tag) t
+        ) d;
+    ELSE
+        PERFORM t_p18143168_police_reminder_app.article_facets_apply_delta(array_agg(kind), array_agg(value), array_agg(count))
+        FROM (
+            WITH changed AS (
+                SELECT o.category AS old_category, o.tags AS old_tags, n.category AS new_category, n.tags AS new_tags
+                FROM old_rows o JOIN new_rows n ON n.id = o.id
+                WHERE o.category IS DISTINCT FROM n.category OR o.tags IS DISTINCT FROM n.tags
+            )
+            SELECT 'category' AS kind, old_category AS value, -1 AS count FROM changed
+            UNION ALL
+            SELECT 'tag', t.tag, -1 FROM changed c CROSS JOIN LATERAL (SELECT DISTINCT unnest(c.old_tags) AS tag) t
+            UNION ALL
+            SELECT 'category', new_category, 1 FROM changed
+            UNION ALL
+            SELECT 'tag', t.tag, 1 FROM changed c CROSS JOIN LATERAL (SELECT DISTINCT unnest(c.new_tags) AS tag) t
+        ) d;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS article_facets_trigger ON t_p18143168_police_reminder_app.articles;
+
+-- Transition tables need one event per trigger and no UPDATE OF column list
+CREATE TRIGGER article_facets_insert_trigger
+AFTER INSERT ON t_p18143168_police_reminder_app.articles
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION t_p18143168_police_reminder_app.article_facets_update();
+
+CREATE TRIGGER article_facets_update_trigger
+AFTER UPDATE ON t_p18143168_police_reminder_app.articles
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION t_p18143168_police_reminder_app.article_facets_update();
+
+CREATE TRIGGER article_facets_delete_trigger
+AFTER DELETE ON t_p18143168_police_reminder_app.articles
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION t_p18143168_police_reminder_app.article_facets_update();
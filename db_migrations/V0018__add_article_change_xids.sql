@@ -0,0 +1,31 @@
+-- Delta sync cursor by transaction id: a sequence value is taken at write time but becomes visible at commit,
+-- so "row_version > since" skips rows committed out of order. Clients now keep the xmin of their last snapshot.
+ALTER TABLE t_p18143168_police_reminder_app.articles
+ADD COLUMN IF NOT EXISTS row_xid xid8 NOT NULL DEFAULT pg_current_xact_id();
+
+ALTER TABLE t_p18143168_police_reminder_app.article_tombstones
+ADD COLUMN IF NOT EXISTS row_xid xid8 NOT NULL DEFAULT pg_current_xact_id();
+
+CREATE INDEX IF NOT EXISTS idx_articles_row_xid
+ON t_p18143168_police_reminder_app.articles (row_xid);
+
+CREATE INDEX IF NOT EXISTS idx_article_tombstones_row_xid
+ON t_p18143168_police_reminder_app.article_tombstones (row_xid);
+
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.articles_row_version_update() RETURNS trigger AS $$
+BEGIN
+    NEW.row_version := nextval('t_p18143168_police_reminder_app.articles_row_version_seq');
+    NEW.row_xid := pg_current_xact_id();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.articles_tombstone_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO t_p18143168_police_reminder_app.article_tombstones (article_id, row_version)
+    VALUES (OLD.id, nextval('t_p18143168_police_reminder_app.articles_row_version_seq'))
+    ON CONFLICT (article_id) DO UPDATE
+    SET row_version = EXCLUDED.row_version, row_xid = EXCLUDED.row_xid, deleted_at = CURRENT_TIMESTAMP;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,3 @@
+-- Jobs carry only the S3 key of the uploaded original; NOT VALID keeps rows queued with image_data until the worker drains them
+ALTER TABLE t_p18143168_police_reminder_app.image_jobs
+ADD CONSTRAINT image_jobs_image_key_required CHECK (image_key IS NOT NULL) NOT VALID;
@@ -0,0 +1,23 @@
+-- Message numbers from a sequence instead of the chat_message_seq counter row: the row lock serialised every chat insert.
+-- Numbers may now have gaps, so unread is counted as messages with seq above the read marker via idx_chat_messages_seq
+LOCK TABLE t_p18143168_police_reminder_app.chat_messages IN ACCESS EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS chat_message_seq_trigger ON t_p18143168_police_reminder_app.chat_messages;
+DROP FUNCTION IF EXISTS t_p18143168_police_reminder_app.chat_message_seq_next();
+DROP TABLE IF EXISTS t_p18143168_police_reminder_app.chat_message_seq;
+
+CREATE SEQUENCE IF NOT EXISTS t_p18143168_police_reminder_app.chat_messages_seq_seq AS BIGINT
+OWNED BY t_p18143168_police_reminder_app.chat_messages.seq;
+
+SELECT setval(
+    't_p18143168_police_reminder_app.chat_messages_seq_seq',
+    COALESCE((SELECT max(seq) FROM t_p18143168_police_reminder_app.chat_messages), 0) + 1,
+    false
+);
+
+ALTER TABLE t_p18143168_police_reminder_app.chat_messages
+ALTER COLUMN seq SET DEFAULT nextval('t_p18143168_police_reminder_app.chat_messages_seq_seq'),
+ALTER COLUMN seq SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_chat_messages_seq
+ON t_p18143168_police_reminder_app.chat_messages (seq);
@@ -0,0 +1,38 @@
+-- Commit-ordered message numbers with a maintained head for O(1) unread counts.
+-- A BEFORE INSERT statement trigger locks the counter row until commit, so seq values from the sequence become visible in
+-- allocation order, and a reader's marker never passes a message that commits later. The AFTER INSERT statement trigger
+-- advances the head once per statement from the transition table, not once per row. A rolled-back insert leaves a gap that
+-- is counted as one extra unread message
+CREATE TABLE IF NOT EXISTS t_p18143168_police_reminder_app.chat_message_seq (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    seq BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO t_p18143168_police_reminder_app.chat_message_seq (id, seq)
+SELECT 1, COALESCE(max(seq), 0) FROM t_p18143168_police_reminder_app.chat_messages
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.chat_message_seq_lock() RETURNS trigger AS $$
+BEGIN
+    PERFORM 1 FROM t_p18143168_police_reminder_app.chat_message_seq WHERE id = 1 FOR UPDATE;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.chat_message_seq_advance() RETURNS trigger AS $$
+BEGIN
+    UPDATE t_p18143168_police_reminder_app.chat_message_seq
+    SET seq = GREATEST(seq, (SELECT max(seq) FROM new_rows))
+    WHERE id = 1 AND EXISTS (SELECT 1 FROM new_rows);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER chat_message_seq_lock_trigger
+BEFORE INSERT ON t_p18143168_police_reminder_app.chat_messages
+FOR EACH STATEMENT EXECUTE FUNCTION t_p18143168_police_reminder_app.chat_message_seq_lock();
+
+CREATE TRIGGER chat_message_seq_advance_trigger
+AFTER INSERT ON t_p18143168_police_reminder_app.chat_messages
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION t_p18143168_police_reminder_app.chat_message_seq_advance();
@@ -0,0 +1,27 @@
+-- An edited article can drop out of the top-k of articles that currently list it; queue those too so their lists are rebuilt
+CREATE OR REPLACE FUNCTION t_p18143168_police_reminder_app.article_similarity_enqueue() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- Articles that listed the deleted one lose that row by cascade and need a fresh neighbour list
+        INSERT INTO t_p18143168_police_reminder_app.article_similarity_queue (article_id)
+        SELECT article_id FROM t_p18143168_police_reminder_app.article_neighbors WHERE neighbor_id = OLD.id
+        ON CONFLICT (article_id) DO NOTHING;
+        RETURN OLD;
+    END IF;
+
+    IF TG_OP = 'UPDATE' AND OLD.title IS NOT DISTINCT FROM NEW.title AND OLD.content IS NOT DISTINCT FROM NEW.content
+       AND OLD.tags IS NOT DISTINCT FROM NEW.tags THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO t_p18143168_police_reminder_app.article_similarity_queue (article_id) VALUES (NEW.id)
+    ON CONFLICT (article_id) DO UPDATE SET queued_at = EXCLUDED.queued_at;
+
+    IF TG_OP = 'UPDATE' THEN
+        INSERT INTO t_p18143168_police_reminder_app.article_similarity_queue (article_id)
+        SELECT article_id FROM t_p18143168_police_reminder_app.article_neighbors WHERE neighbor_id = NEW.id
+        ON CONFLICT (article_id) DO UPDATE SET queued_at = EXCLUDED.queued_at;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
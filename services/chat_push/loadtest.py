@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import time
+
+import aiohttp
+import asyncpg
+
+
+async def idle_client(session: aiohttp.ClientSession, url: str, ready: asyncio.Event, counter: dict, arrivals: list):
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=None, sock_read=None)) as response:
+        counter['connected'] += 1
+        if counter['connected'] == counter['target']:
+            ready.set()
+        async for line in response.content:
+            if line.startswith(b'data: '):
+                arrivals.append(time.perf_counter())
+                return
+
+
+async def main(args) -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, args.clients * 2 + 100)), hard))
+
+    url = f'{args.url}/chat/stream'
+    counter = {'connected': 0, 'target': args.clients}
+    ready = asyncio.Event()
+    arrivals = []
+
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(idle_client(session, url, ready, counter, arrivals)) for _ in range(args.clients)]
+        await asyncio.wait_for(ready.wait(), timeout=120)
+        connect_seconds = time.perf_counter() - started
+
+        await asyncio.sleep(args.idle)
+        async with session.get(f'{args.url}/stats') as response:
+            stats_before = await response.json()
+
+        conn = await asyncpg.connect(os.environ['DATABASE_URL'])
+        sent_at = time.perf_counter()
+        row = await conn.fetchrow(
+            '''INSERT INTO t_p18143168_police_reminder_app.chat_messages (username, message)
+               VALUES ('loadtest', 'ping') RETURNING id, created_at'''
+        )
+        await conn.execute('SELECT pg_notify($1, $2)', 'chat_messages', json.dumps({'id': row['id'], 'created_at': row['created_at'].isoformat()}))
+        await conn.close()
+
+        await asyncio.wait(tasks, timeout=30)
+        latencies = sorted((t - sent_at) * 1000 for t in arrivals)
+
+    def percentile(p: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2) if latencies else None
+
+    print(json.dumps({
+        'clients': args.clients,
+        'connect_seconds': round(connect_seconds, 2),
+        'idle_seconds': args.idle,
+        'server_stats': stats_before,
+        'received': len(latencies),
+        'fanout_ms': {'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99), 'max': percentile(1.0)}
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Держит N простаивающих SSE-подключений и измеряет задержку рассылки одного сообщения')
+    parser.add_argument('--url', default='http://127.0.0.1:8081')
+    parser.add_argument('--clients', type=int, default=5000)
+    parser.add_argument('--idle', type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
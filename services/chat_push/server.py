@@ -0,0 +1,292 @@
+import asyncio
+import json
+import os
+import random
+from datetime import datetime
+
+import asyncpg
+from aiohttp import web, WSMsgType
+
+CHAT_CHANNEL = 'chat_messages'
+HOST = os.environ.get('CHAT_PUSH_HOST', '0.0.0.0')
+PORT = int(os.environ.get('CHAT_PUSH_PORT', '8081'))
+CLIENT_QUEUE_MAX_MESSAGES = int(os.environ.get('CHAT_PUSH_QUEUE_MAX', '256'))
+CLIENT_QUEUE_MAX_BYTES = int(os.environ.get('CHAT_PUSH_QUEUE_MAX_BYTES', str(256 * 1024)))
+BACKLOG_LIMIT = 100
+HEARTBEAT_INTERVAL = 25
+BATCH_WINDOW = 0.01
+FLUSH_RETRY_DELAY = 1.0
+RECONNECT_BACKOFF_BASE = 0.5
+RECONNECT_BACKOFF_MAX = 30.0
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Last-Event-ID'
+}
+
+
+def log_event(event: str, **fields) -> None:
+    print(json.dumps({'event': event, 'service': 'chat_push', **fields}, ensure_ascii=False, default=str), flush=True)
+
+
+class Client:
+    '''Очередь уже закодированных кадров для одного подключения с лимитом по числу и по байтам'''
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=CLIENT_QUEUE_MAX_MESSAGES)
+        self.queued_bytes = 0
+        self.closed = asyncio.Event()
+
+    def offer(self, frame: bytes) -> bool:
+        if self.queued_bytes + len(frame) > CLIENT_QUEUE_MAX_BYTES:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        self.queued_bytes += len(frame)
+        return True
+
+    async def next_frame(self, timeout: float):
+        try:
+            frame = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.queued_bytes -= len(frame)
+        return frame
+
+
+class Broker:
+    '''Один LISTEN на процесс, рассылка каждого сообщения всем подключениям без повторного кодирования.
+    Обрыв LISTEN-соединения лечится переподключением с backoff и дочитыванием пропущенного по last_seq:
+    seq выдаётся в порядке коммита, поэтому сообщение, закоммиченное позже, не окажется ниже курсора'''
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.pool = None
+        self.listener = None
+        self.reconnect_task = None
+        self.stopping = False
+        self.last_seq = 0
+        self.replayed_ids = set()
+        self.sse_clients = set()
+        self.ws_clients = set()
+        self.pending = []
+        self.flush_scheduled = False
+        self.stats = {'delivered': 0, 'dropped_slow': 0, 'messages': 0, 'reconnects': 0, 'flush_errors': 0}
+
+    async def start(self, app: web.Application) -> None:
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=4)
+        self.last_seq = await self.pool.fetchval('SELECT seq FROM t_p18143168_police_reminder_app.chat_message_seq WHERE id = 1') or 0
+        await self.listen()
+
+    async def stop(self, app: web.Application) -> None:
+        self.stopping = True
+        if self.reconnect_task is not None:
+            self.reconnect_task.cancel()
+        if self.listener is not None and not self.listener.is_closed():
+            self.listener.remove_termination_listener(self.on_listener_terminated)
+            await self.listener.close()
+        await self.pool.close()
+
+    async def listen(self) -> None:
+        listener = await asyncpg.connect(self.dsn)
+        listener.add_termination_listener(self.on_listener_terminated)
+        await listener.add_listener(CHAT_CHANNEL, self.on_notify)
+        self.listener = listener
+
+    def on_listener_terminated(self, connection) -> None:
+        if self.stopping or connection is not self.listener or self.reconnect_task is not None:
+            return
+        log_event('listener_lost', last_seq=self.last_seq)
+        self.reconnect_task = asyncio.ensure_future(self.reconnect())
+
+    async def reconnect(self) -> None:
+        '''Повторяет LISTEN с экспоненциальной задержкой, затем рассылает сообщения, пришедшие без уведомлений'''
+        attempt = 0
+        try:
+            while True:
+                delay = min(RECONNECT_BACKOFF_BASE * 2 ** attempt, RECONNECT_BACKOFF_MAX) * random.uniform(0.8, 1.2)
+                await asyncio.sleep(delay)
+                attempt += 1
+                try:
+                    await self.listen()
+                    await self.catch_up()
+                except (OSError, asyncpg.PostgresError, asyncio.TimeoutError) as e:
+                    log_event('listener_reconnect_failed', attempt=attempt, error=str(e))
+                    continue
+                self.stats['reconnects'] += 1
+                log_event('listener_reconnected', attempt=attempt, last_seq=self.last_seq)
+                return
+        finally:
+            self.reconnect_task = None
+
+    async def catch_up(self) -> None:
+        '''LISTEN уже восстановлен, поэтому уведомления о тех же сообщениях могут прийти повторно — их отсекает replayed_ids'''
+        self.replayed_ids = set()
+        while True:
+            messages = await self.backlog(self.last_seq)
+            for message in messages:
+                self.replayed_ids.add(message['id'])
+                self.broadcast(message)
+            if len(messages) < BACKLOG_LIMIT:
+                return
+
+    def on_notify(self, connection, pid, channel, payload: str) -> None:
+        self.pending.append(json.loads(payload))
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_later(BATCH_WINDOW, lambda: asyncio.ensure_future(self.flush()))
+
+    async def flush(self) -> None:
+        '''Пачка уведомлений за BATCH_WINDOW — один запрос в БД, затрагивающий только нужные партиции.
+        Ошибка БД возвращает уведомления в очередь с повтором через FLUSH_RETRY_DELAY, битая пачка отбрасывается'''
+        pending, self.pending, self.flush_scheduled = self.pending, [], False
+        try:
+            ids = [p['id'] for p in pending if p['id'] not in self.replayed_ids]
+            if not ids:
+                return
+            since = min(datetime.fromisoformat(p['created_at']) for p in pending)
+            rows = await self.pool.fetch(
+                '''SELECT * FROM t_p18143168_police_reminder_app.chat_messages
+                   WHERE id = ANY($1::int[]) AND created_at >= $2
+                   ORDER BY seq''',
+                ids, since
+            )
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError, asyncio.TimeoutError) as e:
+            self.stats['flush_errors'] += 1
+            log_event('flush_failed', messages=len(pending), error=str(e))
+            self.pending = pending + self.pending
+            if not self.flush_scheduled and not self.stopping:
+                self.flush_scheduled = True
+                asyncio.get_running_loop().call_later(FLUSH_RETRY_DELAY, lambda: asyncio.ensure_future(self.flush()))
+            return
+        except Exception as e:
+            self.stats['flush_errors'] += 1
+            log_event('flush_dropped', messages=len(pending), error=str(e))
+            return
+        for row in rows:
+            self.broadcast(dict(row))
+
+    def broadcast(self, message: dict) -> None:
+        data = json.dumps(message, ensure_ascii=False, default=str)
+        sse_frame = f'id: {message["seq"]}\nevent: message\ndata: {data}\n\n'.encode()
+        ws_frame = data.encode()
+        self.stats['messages'] += 1
+        self.last_seq = max(self.last_seq, message['seq'])
+        for clients, frame in ((self.sse_clients, sse_frame), (self.ws_clients, ws_frame)):
+            for client in list(clients):
+                if client.offer(frame):
+                    self.stats['delivered'] += 1
+                else:
+                    self.stats['dropped_slow'] += 1
+                    clients.discard(client)
+                    client.closed.set()
+
+    async def backlog(self, since_seq: int) -> list:
+        rows = await self.pool.fetch(
+            'SELECT * FROM t_p18143168_police_reminder_app.chat_messages WHERE seq > $1 ORDER BY seq LIMIT $2',
+            since_seq, BACKLOG_LIMIT
+        )
+        return [dict(row) for row in rows]
+
+    async def since_seq(self, request: web.Request):
+        '''Курсор подключения: Last-Event-ID или since_seq; since_id старых клиентов переводится в seq'''
+        value = request.headers.get('Last-Event-ID') or request.query.get('since_seq')
+        if value and value.isdigit():
+            return int(value)
+        value = request.query.get('since_id')
+        if value and value.isdigit():
+            return await self.pool.fetchval(
+                'SELECT seq FROM t_p18143168_police_reminder_app.chat_messages WHERE id <= $1 ORDER BY id DESC LIMIT 1',
+                int(value)
+            ) or 0
+        return None
+
+
+async def sse_handler(request: web.Request) -> web.StreamResponse:
+    broker = request.app['broker']
+    response = web.StreamResponse(headers={
+        **CORS_HEADERS,
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    await response.prepare(request)
+
+    client = Client()
+    broker.sse_clients.add(client)
+    try:
+        since_seq = await broker.since_seq(request)
+        if since_seq is not None:
+            for message in await broker.backlog(since_seq):
+                data = json.dumps(message, ensure_ascii=False, default=str)
+                await response.write(f'id: {message["seq"]}\nevent: message\ndata: {data}\n\n'.encode())
+
+        while not client.closed.is_set():
+            frame = await client.next_frame(HEARTBEAT_INTERVAL)
+            await response.write(frame if frame is not None else b': ping\n\n')
+    except (ConnectionResetError, asyncio.CancelledError):
+        pass
+    finally:
+        broker.sse_clients.discard(client)
+    return response
+
+
+async def ws_handler(request: web.Request) -> web.WebSocketResponse:
+    broker = request.app['broker']
+    ws = web.WebSocketResponse(heartbeat=HEARTBEAT_INTERVAL, max_msg_size=4096)
+    await ws.prepare(request)
+
+    client = Client()
+    broker.ws_clients.add(client)
+
+    async def drain_incoming():
+        async for msg in ws:
+            if msg.type in (WSMsgType.ERROR, WSMsgType.CLOSE):
+                break
+        client.closed.set()
+
+    reader = asyncio.ensure_future(drain_incoming())
+    try:
+        since_seq = await broker.since_seq(request)
+        if since_seq is not None:
+            for message in await broker.backlog(since_seq):
+                await ws.send_str(json.dumps(message, ensure_ascii=False, default=str))
+
+        while not client.closed.is_set():
+            frame = await client.next_frame(HEARTBEAT_INTERVAL)
+            if frame is not None:
+                await ws.send_str(frame.decode())
+    except (ConnectionResetError, asyncio.CancelledError):
+        pass
+    finally:
+        broker.ws_clients.discard(client)
+        reader.cancel()
+        await ws.close()
+    return ws
+
+
+async def stats_handler(request: web.Request) -> web.Response:
+    broker = request.app['broker']
+    return web.json_response({
+        **broker.stats,
+        'sse_clients': len(broker.sse_clients),
+        'ws_clients': len(broker.ws_clients)
+    })
+
+
+def create_app(dsn: str) -> web.Application:
+    broker = Broker(dsn)
+    app = web.Application()
+    app['broker'] = broker
+    app.on_startup.append(broker.start)
+    app.on_cleanup.append(broker.stop)
+    app.router.add_get('/chat/stream', sse_handler)
+    app.router.add_get('/chat/ws', ws_handler)
+    app.router.add_get('/stats', stats_handler)
+    return app
+
+
+if __name__ == '__main__':
+    web.run_app(create_app(os.environ['DATABASE_URL']), host=HOST, port=PORT, backlog=4096)
@@ -50,6 +50,14 @@ export const authService = {
   },
 
   logout() {
+    const token = this.getToken();
+    if (token) {
+      fetch(AUTH_API, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-Auth-Token': token },
+        body: JSON.stringify({ action: 'logout' })
+      }).catch(() => undefined);
+    }
     localStorage.removeItem('auth_token');
     localStorage.removeItem('user');
   },
@@ -63,6 +71,11 @@ export const authService = {
     return localStorage.getItem('auth_token');
   },
 
+  authHeaders(): Record<string, string> {
+    const token = this.getToken();
+    return token ? { 'X-Auth-Token': token } : {};
+  },
+
   isAuthenticated(): boolean {
     return !!this.getToken();
   },
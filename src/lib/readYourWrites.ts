@@ -0,0 +1,12 @@
+let lastWriteLsn: string | null = null;
+
+export const readYourWrites = {
+  remember(response: Response) {
+    const lsn = response.headers.get('X-LSN');
+    if (lsn) lastWriteLsn = lsn;
+  },
+
+  headers(): Record<string, string> {
+    return lastWriteLsn ? { 'X-Min-LSN': lastWriteLsn } : {};
+  }
+};
@@ -9,6 +9,8 @@ import { Badge } from '@/components/ui/badge';
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogTrigger } from '@/components/ui/dialog';
 import { useToast } from '@/hooks/use-toast';
 import Icon from '@/components/ui/icon';
+import { authService } from '@/lib/auth';
+import { readYourWrites } from '@/lib/readYourWrites';
 
 const API_URL = 'https://functions.poehali.dev/ae53e1c2-96ac-4a9e-924e-9692a718ddf1';
 
@@ -48,21 +50,27 @@ export default function Admin() {
     loadArticles();
   }, []);
 
-  const convertImageToBase64 = (file: File): Promise<string> => {
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-      reader.onload = () => {
-        const base64 = reader.result as string;
-        resolve(base64.split(',')[1]);
-      };
-      reader.onerror = reject;
-      reader.readAsDataURL(file);
+  const uploadImage = async (file: File): Promise<string> => {
+    const response = await fetch(API_URL, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', ...authService.authHeaders() },
+      body: JSON.stringify({ action: 'upload_url', filename: file.name, content_type: file.type })
     });
+    if (!response.ok) throw new Error(`Upload URL failed: ${response.status}`);
+    const { upload_url, image_key } = await response.json();
+
+    const upload = await fetch(upload_url, {
+      method: 'PUT',
+      headers: { 'Content-Type': file.type },
+      body: file
+    });
+    if (!upload.ok) throw new Error(`Image upload failed: ${upload.status}`);
+    return image_key;
   };
 
   const loadArticles = async () => {
     try {
-      const response = await fetch(API_URL);
+      const response = await fetch(API_URL, { headers: readYourWrites.headers() });
       const data = await response.json();
       setArticles(data);
     } catch (error) {
@@ -82,13 +90,8 @@ export default function Admin() {
     const tagsArray = formData.tags.split(',').map(t => t.trim()).filter(t => t);
     
     try {
-      let imageData = null;
-      let filename = null;
-
-      if (formData.imageFile) {
-        imageData = await convertImageToBase64(formData.imageFile);
-        filename = formData.imageFile.name;
-      }
+      const { imageFile, ...fields } = formData;
+      const imageKey = imageFile ? await uploadImage(imageFile) : undefined;
 
       const url = editingArticle 
         ? API_URL 
@@ -97,14 +100,15 @@ export default function Admin() {
       const method = editingArticle ? 'PUT' : 'POST';
       
       const body = editingArticle
-        ? { id: editingArticle.id, ...formData, tags: tagsArray, image: imageData, filename }
-        : { ...formData, tags: tagsArray, image: imageData, filename };
+        ? { id: editingArticle.id, ...fields, tags: tagsArray, image_key: imageKey }
+        : { ...fields, tags: tagsArray, image_key: imageKey };
       
       const response = await fetch(url, {
         method,
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', ...authService.authHeaders() },
         body: JSON.stringify(body)
       });
+      readYourWrites.remember(response);
       
       if (response.ok) {
         toast({
@@ -143,8 +147,10 @@ export default function Admin() {
     
     try {
       const response = await fetch(`${API_URL}?id=${id}`, {
-        method: 'DELETE'
+        method: 'DELETE',
+        headers: authService.authHeaders()
       });
+      readYourWrites.remember(response);
       
       if (response.ok) {
         toast({
@@ -259,7 +265,7 @@ export default function Admin() {
                   <label className="text-sm font-medium mb-2 block">Изображение (необязательно)</label>
                   <Input
                     type="file"
-                    accept="image/*"
+                    accept="image/jpeg,image/png,image/gif,image/webp"
                     onChange={(e) => setFormData({ ...formData, imageFile: e.target.files?.[0] || null })}
                   />
                   {formData.imageFile && (
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Input } from '@/components/ui/input';
 import { Card } from '@/components/ui/card';
@@ -9,10 +9,12 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { Sheet, SheetContent, SheetHeader, SheetTitle, SheetTrigger } from '@/components/ui/sheet';
 import Icon from '@/components/ui/icon';
 import { authService } from '@/lib/auth';
+import { readYourWrites } from '@/lib/readYourWrites';
 
 const API_URL = 'https://functions.poehali.dev/ae53e1c2-96ac-4a9e-924e-9692a718ddf1';
 const BOOKMARKS_API = 'https://functions.poehali.dev/b6eb6b5d-3b18-4485-9db8-78d520d1e550';
 const CHAT_API = 'https://functions.poehali.dev/1a769b02-9097-45b0-889b-2ce26ee269c3';
+const UNREAD_POLL_INTERVAL = 30000;
 
 interface Article {
   id: number;
@@ -25,6 +27,7 @@ interface Article {
 
 interface ChatMessage {
   id: number;
+  seq: number;
   username: string;
   message: string;
   created_at: string;
@@ -49,15 +52,49 @@ export default function Index() {
   const [chatMessages, setChatMessages] = useState<ChatMessage[]>([]);
   const [newMessage, setNewMessage] = useState('');
   const [chatOpen, setChatOpen] = useState(false);
+  const [unreadCount, setUnreadCount] = useState(0);
+  const lastMessageId = useRef(0);
+  const lastMessageSeq = useRef(0);
 
   useEffect(() => {
     loadArticles();
     loadBookmarks();
-    loadChatMessages();
-    const interval = setInterval(loadChatMessages, 5000);
-    return () => clearInterval(interval);
   }, []);
 
+  useEffect(() => {
+    if (chatOpen || !user) return;
+    loadUnreadCount();
+    const timer = setInterval(loadUnreadCount, UNREAD_POLL_INTERVAL);
+    return () => clearInterval(timer);
+  }, [chatOpen]);
+
+  useEffect(() => {
+    if (!chatOpen) return;
+
+    let active = true;
+    const pollChat = async () => {
+      await loadChatMessages();
+      while (active) {
+        try {
+          const response = await fetch(`${CHAT_API}?since_seq=${lastMessageSeq.current}&wait=25`);
+          if (!response.ok) throw new Error(`Chat poll failed: ${response.status}`);
+          appendChatMessages(await response.json());
+        } catch (error) {
+          console.error('Failed to poll chat:', error);
+          await new Promise((resolve) => setTimeout(resolve, 5000));
+        }
+      }
+    };
+    pollChat();
+    return () => {
+      active = false;
+    };
+  }, [chatOpen]);
+
+  useEffect(() => {
+    if (chatOpen && user && chatMessages.length) markChatRead();
+  }, [chatOpen, chatMessages]);
+
   const loadArticles = async () => {
     try {
       const response = await fetch(API_URL);
@@ -73,7 +110,7 @@ export default function Index() {
   const loadBookmarks = async () => {
     if (!user) return;
     try {
-      const response = await fetch(`${BOOKMARKS_API}?user_id=${user.id}`);
+      const response = await fetch(BOOKMARKS_API, { headers: { ...authService.authHeaders(), ...readYourWrites.headers() } });
       const data = await response.json();
       setBookmarks(new Set(data));
     } catch (error) {
@@ -83,29 +120,66 @@ export default function Index() {
 
   const loadChatMessages = async () => {
     try {
-      const response = await fetch(CHAT_API);
-      const data = await response.json();
+      const response = await fetch(CHAT_API, { headers: readYourWrites.headers() });
+      const data: ChatMessage[] = await response.json();
       setChatMessages(data);
+      if (data.length) {
+        lastMessageId.current = Math.max(...data.map((msg) => msg.id));
+        lastMessageSeq.current = data[data.length - 1].seq;
+      }
     } catch (error) {
       console.error('Failed to load chat:', error);
     }
   };
 
+  const loadUnreadCount = async () => {
+    try {
+      const response = await fetch(`${CHAT_API}?view=unread`, {
+        headers: { ...authService.authHeaders(), ...readYourWrites.headers() }
+      });
+      if (!response.ok) return;
+      const data = await response.json();
+      setUnreadCount(data.unread);
+    } catch (error) {
+      console.error('Failed to load unread count:', error);
+    }
+  };
+
+  const markChatRead = async () => {
+    try {
+      const response = await fetch(CHAT_API, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', ...authService.authHeaders() },
+        body: JSON.stringify({ action: 'read', last_read_id: lastMessageId.current })
+      });
+      readYourWrites.remember(response);
+      setUnreadCount(0);
+    } catch (error) {
+      console.error('Failed to mark chat read:', error);
+    }
+  };
+
+  const appendChatMessages = (data: ChatMessage[]) => {
+    if (!data.length) return;
+    lastMessageId.current = Math.max(lastMessageId.current, ...data.map((msg) => msg.id));
+    lastMessageSeq.current = Math.max(lastMessageSeq.current, data[data.length - 1].seq);
+    setChatMessages((prev) => {
+      const known = new Set(prev.map((msg) => msg.id));
+      return [...prev, ...data.filter((msg) => !known.has(msg.id))].slice(-50);
+    });
+  };
+
   const sendMessage = async () => {
     if (!newMessage.trim() || !user) return;
 
     try {
-      await fetch(CHAT_API, {
+      const response = await fetch(CHAT_API, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          user_id: user.id,
-          username: user.username,
-          message: newMessage
-        })
+        headers: { 'Content-Type': 'application/json', ...authService.authHeaders() },
+        body: JSON.stringify({ message: newMessage })
       });
+      readYourWrites.remember(response);
       setNewMessage('');
-      loadChatMessages();
     } catch (error) {
       console.error('Failed to send message:', error);
     }
@@ -118,16 +192,18 @@ export default function Index() {
 
     try {
       if (isBookmarked) {
-        await fetch(`${BOOKMARKS_API}?user_id=${user.id}&article_id=${id}`, { method: 'DELETE' });
+        const response = await fetch(`${BOOKMARKS_API}?article_id=${id}`, { method: 'DELETE', headers: authService.authHeaders() });
+        readYourWrites.remember(response);
         const newBookmarks = new Set(bookmarks);
         newBookmarks.delete(id);
         setBookmarks(newBookmarks);
       } else {
-        await fetch(BOOKMARKS_API, {
+        const response = await fetch(BOOKMARKS_API, {
           method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ user_id: user.id, article_id: id })
+          headers: { 'Content-Type': 'application/json', ...authService.authHeaders() },
+          body: JSON.stringify({ article_id: id })
         });
+        readYourWrites.remember(response);
         const newBookmarks = new Set(bookmarks);
         newBookmarks.add(id);
         setBookmarks(newBookmarks);
@@ -164,8 +240,13 @@ export default function Index() {
             <div className="flex items-center gap-2">
               <Sheet open={chatOpen} onOpenChange={setChatOpen}>
                 <SheetTrigger asChild>
-                  <Button variant="secondary" size="icon" title="Чат">
+                  <Button variant="secondary" size="icon" title="Чат" className="relative">
                     <Icon name="MessageSquare" size={20} />
+                    {unreadCount > 0 && (
+                      <Badge variant="destructive" className="absolute -top-2 -right-2 h-5 min-w-5 px-1 text-xs">
+                        {unreadCount > 99 ? '99+' : unreadCount}
+                      </Badge>
+                    )}
                   </Button>
                 </SheetTrigger>
                 <SheetContent className="w-full sm:max-w-md">
@@ -0,0 +1,93 @@
+import importlib.util
+import io
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BACKEND_DIR = os.path.join(ROOT_DIR, 'backend')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+
+os.environ.setdefault('AUTH_TOKEN_SECRET', 'test-secret')
+os.environ.setdefault('TRACE_LOG', '0')
+
+_modules = {}
+
+
+def load_function(name: str):
+    '''index.py функции под уникальным именем модуля: у всех функций одинаковое имя файла'''
+    if name not in _modules:
+        spec = importlib.util.spec_from_file_location(f'test_{name}_index', os.path.join(BACKEND_DIR, name, 'index.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[name] = module
+    return _modules[name]
+
+
+@pytest.fixture(scope='session')
+def database():
+    '''Пересоздаёт схему в TEST_DATABASE_URL; без переменной тесты с базой пропускаются'''
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL не задан')
+    import psycopg2
+    from seed import apply_migrations
+
+    os.environ['DATABASE_URL'] = url
+    conn = psycopg2.connect(url)
+    try:
+        apply_migrations(conn)
+    finally:
+        conn.close()
+    return url
+
+
+@pytest.fixture
+def db(database):
+    import psycopg2
+
+    conn = psycopg2.connect(database)
+    yield conn
+    conn.rollback()
+    conn.close()
+
+
+def make_event(method: str = 'GET', params: dict = None, body=None, headers: dict = None) -> dict:
+    return {
+        'httpMethod': method,
+        'queryStringParameters': params or {},
+        'headers': headers or {},
+        'body': body,
+        'requestContext': {'identity': {'sourceIp': '127.0.0.1'}},
+        'isBase64Encoded': False
+    }
+
+
+def auth_headers(user_id: int = 1, username: str = 'test_user', admin: bool = False) -> dict:
+    token = load_function('auth').issue_token({'id': user_id, 'username': username, 'is_admin': admin, 'token_version': 0})
+    return {'X-Auth-Token': token}
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    '''Бакет функции статей в moto; клиент S3 пересоздаётся под подменённые ключи'''
+    moto = pytest.importorskip('moto')
+    articles = load_function('articles')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('MOTO_S3_CUSTOM_ENDPOINTS', articles.S3_ENDPOINT_URL)
+    monkeypatch.setattr(articles, '_s3_client', None)
+    with moto.mock_aws():
+        client = articles.get_s3_client()
+        client.create_bucket(Bucket=articles.S3_BUCKET)
+        yield client
+
+
+def png_bytes(size=(900, 600)) -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'PNG')
+    return buffer.getvalue()
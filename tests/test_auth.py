@@ -0,0 +1,167 @@
+import hashlib
+import json
+import time
+import uuid
+
+import pytest
+
+from conftest import load_function, make_event
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    module = load_function('auth')
+    monkeypatch.setattr(module, '_rate_limit_store', module.MemoryRateLimitStore())
+    return module
+
+
+def post(body: dict, headers: dict = None) -> dict:
+    return load_function('auth').handler(make_event('POST', body=json.dumps(body), headers=headers), None)
+
+
+def register(password: str = 'correct horse') -> dict:
+    username = f'user_{uuid.uuid4().hex[:12]}'
+    response = post({'action': 'register', 'username': username, 'email': f'{username}@example.com', 'password': password})
+    assert response['statusCode'] == 200, response['body']
+    return {**json.loads(response['body']), 'password': password}
+
+
+def bookmarks_status(token: str) -> int:
+    return load_function('bookmarks').handler(make_event('GET', headers={'X-Auth-Token': token}), None)['statusCode']
+
+
+def test_issued_token_verifies_locally(database, auth):
+    account = register()
+    payload = auth.decode_token(account['token'])
+
+    assert payload['sub'] == account['user']['id']
+    assert payload['name'] == account['user']['username']
+    assert payload['adm'] is False
+    assert bookmarks_status(account['token']) == 200
+
+
+def test_tampered_and_expired_tokens_are_rejected(database, auth, monkeypatch):
+    token = register()['token']
+    payload_part, signature = token.split('.')
+    forged = auth.b64url_encode(json.dumps({**auth.decode_token(token), 'adm': True}).encode())
+
+    assert auth.decode_token(f'{forged}.{signature}') is None
+    assert auth.decode_token(f'{payload_part}.{signature[:-2]}AA') is None
+    assert auth.decode_token('garbage') is None
+    assert bookmarks_status(f'{forged}.{signature}') == 401
+
+    monkeypatch.setattr(auth, 'TOKEN_TTL', -1)
+    expired = auth.issue_token({'id': 1, 'username': 'u', 'is_admin': False, 'token_version': 0})
+    assert auth.decode_token(expired) is None
+
+
+def test_logout_revokes_outstanding_tokens(database, auth, monkeypatch):
+    bookmarks = load_function('bookmarks')
+    monkeypatch.setattr(bookmarks, 'REVOCATION_REFRESH_INTERVAL', 0)
+    account = register()
+    token = account['token']
+    assert bookmarks_status(token) == 200
+
+    assert post({'action': 'logout'}, {'X-Auth-Token': token})['statusCode'] == 200
+
+    assert post({'action': 'logout'}, {'X-Auth-Token': token})['statusCode'] == 401
+    assert bookmarks_status(token) == 401
+
+    login = post({'action': 'login', 'username': account['user']['username'], 'password': account['password']})
+    fresh = json.loads(login['body'])['token']
+    assert auth.decode_token(fresh)['ver'] > auth.decode_token(token)['ver']
+    assert bookmarks_status(fresh) == 200
+
+
+def stored_hash(db, user_id: int) -> str:
+    with db.cursor() as cursor:
+        cursor.execute('SELECT password_hash FROM t_p18143168_police_reminder_app.users WHERE id = %s', (user_id,))
+        return cursor.fetchone()[0]
+
+
+def test_login_rehashes_weaker_scrypt_parameters(database, db, auth, monkeypatch):
+    monkeypatch.setattr(auth, 'SCRYPT_N', 2 ** 12)
+    account = register()
+    old_hash = stored_hash(db, account['user']['id'])
+    assert old_hash.startswith(f'scrypt${2 ** 12}$')
+
+    monkeypatch.setattr(auth, 'SCRYPT_N', 2 ** 13)
+    assert auth.needs_rehash(old_hash)
+    login = post({'action': 'login', 'username': account['user']['username'], 'password': account['password']})
+    assert login['statusCode'] == 200
+
+    db.rollback()
+    new_hash = stored_hash(db, account['user']['id'])
+    assert new_hash.startswith(f'scrypt${2 ** 13}$')
+    assert not auth.needs_rehash(new_hash)
+    assert auth.verify_password(account['password'], new_hash)
+    assert post({'action': 'login', 'username': account['user']['username'], 'password': 'wrong'})['statusCode'] == 401
+
+
+def test_login_upgrades_legacy_sha256_hash(database, db, auth):
+    account = register()
+    with db.cursor() as cursor:
+        cursor.execute(
+            'UPDATE t_p18143168_police_reminder_app.users SET password_hash = %s WHERE id = %s',
+            (hashlib.sha256(account['password'].encode()).hexdigest(), account['user']['id'])
+        )
+    db.commit()
+
+    login = post({'action': 'login', 'username': account['user']['username'], 'password': account['password']})
+    assert login['statusCode'] == 200
+    assert stored_hash(db, account['user']['id']).startswith(f'scrypt${auth.SCRYPT_N}$')
+
+
+def test_kdf_timeout_is_service_unavailable(database, auth, monkeypatch):
+    monkeypatch.setattr(auth, 'KDF_TIMEOUT', 0.01)
+    monkeypatch.setattr(auth, 'derive_key', lambda *args: time.sleep(0.2) or b'')
+    monkeypatch.setattr(auth, '_dummy_hash', None)
+
+    response = post({'action': 'login', 'username': 'nobody', 'password': 'x'})
+
+    assert response['statusCode'] == 503
+    assert response['headers']['Retry-After'] == '1'
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.mark.parametrize('store', ['memory', 'postgres'])
+def test_sliding_window_weights_previous_bucket(database, db, auth, monkeypatch, store):
+    monkeypatch.setattr(auth, '_rate_limit_store', auth.RATE_LIMIT_STORES[store]())
+    window = auth.RATE_LIMIT_WINDOW
+    bucket_start = (int(time.time() // window) + 10) * window
+    clock = Clock(bucket_start - window + 10)
+    monkeypatch.setattr(auth, 'time', clock)
+    limits = {f'test:{uuid.uuid4().hex}': 10}
+
+    assert [auth.check_rate_limit(db, limits) for _ in range(10)] == [None] * 10
+    assert auth.check_rate_limit(db, limits) == window - 10
+
+    # На середине следующего окна прошлые 11 попыток весят половину: 5.5 + 4 ≤ 10, пятая уже сверх лимита.
+    # Вес прошлого окна опустится до 5 через 300 * (1 - 5 / 11) - 150 ≈ 13.6 с
+    clock.now = bucket_start + window / 2
+    assert [auth.check_rate_limit(db, limits) for _ in range(4)] == [None] * 4
+    assert auth.check_rate_limit(db, limits) == 14
+
+    clock.now = bucket_start + 2 * window
+    assert auth.check_rate_limit(db, limits) is None
+
+
+def test_repeated_logins_get_retry_after(database, auth):
+    username = f'user_{uuid.uuid4().hex[:12]}'
+    statuses = [
+        post({'action': 'login', 'username': username, 'password': 'wrong'})['statusCode']
+        for _ in range(auth.RATE_LIMITS['login:user'])
+    ]
+    assert statuses == [401] * auth.RATE_LIMITS['login:user']
+
+    response = post({'action': 'login', 'username': username.upper(), 'password': 'wrong'})
+    assert response['statusCode'] == 429
+    assert 1 <= int(response['headers']['Retry-After']) <= auth.RATE_LIMIT_WINDOW
+    assert 'Retry-After' in response['headers']['Access-Control-Expose-Headers']
@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+
+import psycopg2
+
+from conftest import auth_headers, load_function, make_event
+
+SCHEMA = 't_p18143168_police_reminder_app'
+
+
+def get_messages(**params) -> list:
+    response = load_function('chat').handler(make_event('GET', params={k: str(v) for k, v in params.items()}), None)
+    assert response['statusCode'] == 200, response['body']
+    return json.loads(response['body'])
+
+
+def head_seq(database) -> int:
+    conn = psycopg2.connect(database)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'SELECT seq FROM {SCHEMA}.chat_message_seq WHERE id = 1')
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def chat_user(database, username: str) -> dict:
+    conn = psycopg2.connect(database)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""INSERT INTO {SCHEMA}.users (username, email, password_hash) VALUES (%s, %s, 'x')
+                    ON CONFLICT (username) DO UPDATE SET email = EXCLUDED.email RETURNING id""",
+                (username, f'{username}@example.com')
+            )
+            user_id = cur.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+    return auth_headers(user_id=user_id, username=username)
+
+
+def test_cursor_keeps_message_that_commits_late(database, db):
+    cursor = head_seq(database)
+    with db.cursor() as cur:
+        cur.execute(f"INSERT INTO {SCHEMA}.chat_messages (username, message) VALUES ('cursor', 'начат первым') RETURNING id")
+        first_id = cur.fetchone()[0]
+
+    def write_second():
+        conn = psycopg2.connect(database)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"INSERT INTO {SCHEMA}.chat_messages (username, message) VALUES ('cursor', 'начат вторым')")
+            conn.commit()
+        finally:
+            conn.close()
+
+    writer = threading.Thread(target=write_second)
+    writer.start()
+    time.sleep(0.3)
+    assert get_messages(since_seq=cursor) == []
+    db.commit()
+    writer.join(5)
+
+    messages = get_messages(since_seq=cursor)
+    assert [m['message'] for m in messages] == ['начат первым', 'начат вторым']
+    assert messages[0]['id'] == first_id
+    assert messages[0]['seq'] < messages[1]['seq']
+    assert get_messages(since_seq=messages[-1]['seq']) == []
+
+
+def test_legacy_since_id_is_translated_to_seq(database, db):
+    before = get_messages(limit=1)
+    with db.cursor() as cur:
+        cur.execute(f"INSERT INTO {SCHEMA}.chat_messages (username, message) VALUES ('cursor', 'после since_id')")
+    db.commit()
+
+    messages = get_messages(since_id=before[-1]['id'] if before else 0)
+    assert messages[-1]['message'] == 'после since_id'
+
+
+def test_long_poll_wakes_on_new_message(database):
+    headers = chat_user(database, 'long_poll_writer')
+    cursor = head_seq(database)
+    result = {}
+
+    def poll():
+        started = time.monotonic()
+        result['messages'] = get_messages(since_seq=cursor, wait=5)
+        result['elapsed'] = time.monotonic() - started
+
+    poller = threading.Thread(target=poll)
+    poller.start()
+    time.sleep(0.3)
+    response = load_function('chat').handler(make_event('POST', body=json.dumps({'message': 'разбуди'}), headers=headers), None)
+    assert response['statusCode'] == 201, response['body']
+    poller.join(5)
+
+    assert [m['message'] for m in result['messages']] == ['разбуди']
+    assert result['elapsed'] < 3
+
+
+def test_long_poll_times_out_empty(database):
+    started = time.monotonic()
+    assert get_messages(since_seq=head_seq(database), wait=0.5) == []
+    assert 0.4 < time.monotonic() - started < 3
@@ -0,0 +1,88 @@
+import asyncio
+import importlib.util
+import json
+import os
+
+import pytest
+
+pytest.importorskip('aiohttp')
+asyncpg = pytest.importorskip('asyncpg')
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'chat_push', 'server.py')
+INSERT_MESSAGE = '''INSERT INTO t_p18143168_police_reminder_app.chat_messages (username, message)
+                    VALUES ('push_test', $1) RETURNING id, created_at'''
+
+
+def load_server():
+    spec = importlib.util.spec_from_file_location('test_chat_push_server', SERVER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def next_message(client, timeout: float = 5) -> dict:
+    frame = await client.next_frame(timeout)
+    assert frame is not None, 'no frame delivered'
+    return json.loads(frame.decode().split('data: ', 1)[1])
+
+
+class FlakyPool:
+    '''Пул, у которого первый fetch падает, как при обрыве соединения'''
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.failed = False
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)
+
+    async def fetch(self, *args):
+        if not self.failed:
+            self.failed = True
+            raise ConnectionResetError('connection lost')
+        return await self.pool.fetch(*args)
+
+
+async def with_broker(check):
+    server = load_server()
+    server.RECONNECT_BACKOFF_BASE = 0.05
+    server.FLUSH_RETRY_DELAY = 0.05
+    broker = server.Broker(os.environ['DATABASE_URL'])
+    await broker.start(None)
+    client = server.Client()
+    broker.sse_clients.add(client)
+    try:
+        await check(broker, client)
+    finally:
+        await broker.stop(None)
+
+
+def test_listener_reconnects_and_catches_up(database):
+    async def check(broker, client):
+        await broker.pool.execute('SELECT pg_terminate_backend($1)', broker.listener.get_server_pid())
+        missed = await broker.pool.fetchrow(INSERT_MESSAGE, 'пока LISTEN лежал')
+
+        assert (await next_message(client))['id'] == missed['id']
+        assert broker.stats['reconnects'] == 1
+
+        async with broker.pool.acquire() as conn, conn.transaction():
+            notified = await conn.fetchrow(INSERT_MESSAGE, 'после переподключения')
+            await conn.execute(
+                'SELECT pg_notify($1, $2)', 'chat_messages',
+                json.dumps({'id': notified['id'], 'created_at': notified['created_at'].isoformat()})
+            )
+        assert (await next_message(client))['id'] == notified['id']
+
+    asyncio.run(with_broker(check))
+
+
+def test_flush_retries_after_database_error(database):
+    async def check(broker, client):
+        row = await broker.pool.fetchrow(INSERT_MESSAGE, 'повтор пачки')
+        broker.pool = FlakyPool(broker.pool)
+        broker.on_notify(None, 0, 'chat_messages', json.dumps({'id': row['id'], 'created_at': row['created_at'].isoformat()}))
+
+        assert (await next_message(client))['id'] == row['id']
+        assert broker.stats['flush_errors'] == 1
+
+    asyncio.run(with_broker(check))
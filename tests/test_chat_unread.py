@@ -0,0 +1,71 @@
+import threading
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from conftest import load_function
+
+SCHEMA = 't_p18143168_police_reminder_app'
+
+
+def insert_message(cur, text: str) -> tuple:
+    cur.execute(f"INSERT INTO {SCHEMA}.chat_messages (username, message) VALUES ('unread_test', %s) RETURNING id, seq", (text,))
+    return cur.fetchone()
+
+
+def create_user(cur, username: str) -> int:
+    cur.execute(
+        f"INSERT INTO {SCHEMA}.users (username, email, password_hash) VALUES (%s, %s, 'x') RETURNING id",
+        (username, f'{username}@example.com')
+    )
+    return cur.fetchone()[0]
+
+
+def test_unread_is_exact_for_large_backlogs(db):
+    chat = load_function('chat')
+    with db.cursor() as cur:
+        reader = create_user(cur, 'unread_reader')
+        newcomer = create_user(cur, 'unread_newcomer')
+        read_id, read_seq = insert_message(cur, 'прочитано')
+        chat.save_read_marker(cur, reader, read_id, read_seq)
+        cur.execute(
+            f"INSERT INTO {SCHEMA}.chat_messages (username, message) SELECT 'unread_test', 'новое ' || g FROM generate_series(1, 1500) g"
+        )
+        cur.execute(f'SELECT seq FROM {SCHEMA}.chat_message_seq WHERE id = 1')
+        head = cur.fetchone()[0]
+
+    with db.cursor(cursor_factory=RealDictCursor) as cur:
+        counts = chat.get_unread_counts(cur, [reader, newcomer])
+
+    assert counts[reader] == {'unread': 1500, 'last_read_id': read_id}
+    assert counts[newcomer] == {'unread': head, 'last_read_id': None}
+
+
+def test_seq_follows_commit_order(db):
+    '''Второй писатель ждёт коммита первого, поэтому его seq больше и маркер не обгонит незакоммиченное сообщение'''
+    with db.cursor() as cur:
+        _, first_seq = insert_message(cur, 'первым начал')
+
+    second = {}
+
+    def write_second():
+        conn = psycopg2.connect(db.dsn)
+        try:
+            with conn.cursor() as cur:
+                second['id'], second['seq'] = insert_message(cur, 'вторым начал')
+            conn.rollback()
+        finally:
+            conn.close()
+
+    writer = threading.Thread(target=write_second)
+    writer.start()
+    time.sleep(0.3)
+    assert writer.is_alive(), 'второй INSERT не ждёт открытую транзакцию первого'
+    db.commit()
+    writer.join(5)
+
+    assert second['seq'] > first_seq
+    with db.cursor() as cur:
+        cur.execute(f'DELETE FROM {SCHEMA}.chat_messages WHERE seq = %s', (first_seq,))
+    db.commit()
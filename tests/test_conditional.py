@@ -0,0 +1,73 @@
+import json
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+import pytest
+
+from conftest import auth_headers, load_function, make_event
+
+
+def get(params: dict, headers: dict = None) -> dict:
+    return load_function('articles').handler(make_event('GET', params=params, headers=headers), None)
+
+
+@pytest.fixture
+def article(database):
+    response = load_function('articles').handler(make_event(
+        'POST', body=json.dumps({'title': 'Условный запрос', 'content': 'Текст', 'category': 'rights'}),
+        headers=auth_headers(admin=True)
+    ), None)
+    return json.loads(response['body'])
+
+
+def test_matching_etag_is_not_modified(article):
+    first = get({'id': str(article['id'])})
+    etag = first['headers']['ETag']
+    assert first['statusCode'] == 200
+
+    for header in (etag, f'"other", {etag}', '*'):
+        response = get({'id': str(article['id'])}, {'If-None-Match': header})
+        assert response['statusCode'] == 304
+        assert response['body'] == ''
+        assert response['headers']['ETag'] == etag
+    assert get({'id': str(article['id'])}, {'If-None-Match': '"other"'})['statusCode'] == 200
+
+
+def test_etag_changes_after_update(article):
+    etag = get({'id': str(article['id'])})['headers']['ETag']
+    load_function('articles').handler(make_event(
+        'PUT', body=json.dumps({'id': article['id'], 'title': 'Новый заголовок'}), headers=auth_headers(admin=True)
+    ), None)
+
+    response = get({'id': str(article['id'])}, {'If-None-Match': etag})
+    assert response['statusCode'] == 200
+    assert response['headers']['ETag'] != etag
+    assert json.loads(response['body'])['title'] == 'Новый заголовок'
+
+
+def test_if_modified_since(article):
+    last_modified = get({'id': str(article['id'])})['headers']['Last-Modified']
+    earlier = format_datetime(parsedate_to_datetime(last_modified) - timedelta(seconds=1), usegmt=True)
+
+    assert get({'id': str(article['id'])}, {'If-Modified-Since': last_modified})['statusCode'] == 304
+    assert get({'id': str(article['id'])}, {'If-Modified-Since': earlier})['statusCode'] == 200
+    assert get({'id': str(article['id'])}, {'If-Modified-Since': 'yesterday'})['statusCode'] == 200
+    # Дата без зоны (-0000) тоже трактуется как UTC, а не роняет сравнение
+    naive = parsedate_to_datetime(last_modified).strftime('%a, %d %b %Y %H:%M:%S -0000')
+    assert get({'id': str(article['id'])}, {'If-Modified-Since': naive})['statusCode'] == 304
+    # При If-None-Match дата не учитывается
+    assert get({'id': str(article['id'])}, {'If-None-Match': '"other"', 'If-Modified-Since': last_modified})['statusCode'] == 200
+
+
+def test_collection_revalidates_until_a_write(article):
+    params = {'category': 'rights'}
+    etag = get(params)['headers']['ETag']
+    assert get(params, {'If-None-Match': etag})['statusCode'] == 304
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(days=1), usegmt=True)
+    assert get(params, {'If-Modified-Since': future})['statusCode'] == 304
+
+    load_function('articles').handler(make_event(
+        'POST', body=json.dumps({'title': 'Ещё одна', 'content': 'Текст', 'category': 'rights'}),
+        headers=auth_headers(admin=True)
+    ), None)
+    assert get(params, {'If-None-Match': etag})['statusCode'] == 200
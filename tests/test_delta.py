@@ -0,0 +1,76 @@
+import threading
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from conftest import load_function
+
+INSERT_ARTICLE = '''INSERT INTO t_p18143168_police_reminder_app.articles (title, content, category, tags)
+                    VALUES (%s, 'text', 'laws', ARRAY[]::text[]) RETURNING id'''
+
+
+def delta(database, since: int) -> dict:
+    conn = psycopg2.connect(database)
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            return load_function('articles').build_delta(cur, since)
+    finally:
+        conn.close()
+
+
+def test_delta_keeps_rows_committed_out_of_order(database):
+    '''Первая строка медленной вставки получает версию раньше быстрой записи, а фиксируется позже'''
+    slow = psycopg2.connect(database)
+    fast = psycopg2.connect(database)
+    slow_ids = []
+
+    def slow_insert():
+        with slow.cursor() as cur:
+            cur.execute(
+                '''INSERT INTO t_p18143168_police_reminder_app.articles (title, content, category, tags)
+                   SELECT 'Delta slow writer ' || g, 'text', 'laws', ARRAY[]::text[]
+                   FROM generate_series(1, 2) g
+                   WHERE (SELECT true FROM pg_sleep(1.5 * (g - 1)))
+                   RETURNING id'''
+            )
+            slow_ids.extend(row[0] for row in cur.fetchall())
+        slow.commit()
+
+    writer = threading.Thread(target=slow_insert)
+    try:
+        writer.start()
+        time.sleep(0.5)
+        with fast.cursor() as cur:
+            cur.execute(INSERT_ARTICLE, ('Delta fast writer',))
+            fast_id = cur.fetchone()[0]
+        fast.commit()
+
+        first = delta(database, 0)
+        assert fast_id in [a['id'] for a in first['updated']]
+
+        writer.join()
+        second = delta(database, first['version'])
+        assert len(slow_ids) == 2
+        assert set(slow_ids) <= {a['id'] for a in second['updated']}
+        assert second['version'] >= first['version']
+    finally:
+        writer.join()
+        slow.close()
+        fast.close()
+
+
+def test_delta_reports_deleted_articles(database):
+    conn = psycopg2.connect(database)
+    try:
+        version = delta(database, 0)['version']
+        with conn.cursor() as cur:
+            cur.execute(INSERT_ARTICLE, ('Delta deleted',))
+            article_id = cur.fetchone()[0]
+        conn.commit()
+        with conn.cursor() as cur:
+            cur.execute('DELETE FROM t_p18143168_police_reminder_app.articles WHERE id = %s', (article_id,))
+        conn.commit()
+        assert article_id in delta(database, version)['deleted']
+    finally:
+        conn.close()
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from conftest import auth_headers, load_function, make_event
+
+BODY_ROUTES = [('auth', 'POST'), ('chat', 'POST'), ('bookmarks', 'POST'), ('articles', 'POST'), ('articles', 'PUT')]
+
+
+def call(name: str, method: str, **kwargs) -> dict:
+    kwargs.setdefault('headers', auth_headers(admin=True))
+    return load_function(name).handler(make_event(method, **kwargs), None)
+
+
+def assert_error(response: dict, status: int, message: str = None) -> None:
+    assert response['statusCode'] == status, response['body']
+    assert response['headers']['Access-Control-Allow-Origin'] == '*'
+    if message is not None:
+        assert json.loads(response['body'])['error'] == message
+
+
+@pytest.mark.parametrize('name, method', BODY_ROUTES)
+@pytest.mark.parametrize('body, message', [
+    ('{"title": ', 'Invalid JSON body'),
+    ('[1, 2]', 'JSON body must be an object'),
+    ('"text"', 'JSON body must be an object'),
+])
+def test_malformed_body_is_bad_request(database, name, method, body, message):
+    assert_error(call(name, method, body=body), 400, message)
+
+
+@pytest.mark.parametrize('name, method', BODY_ROUTES)
+def test_missing_body_is_bad_request(database, name, method):
+    event = make_event(method, headers=auth_headers(admin=True))
+    event['body'] = None
+    assert_error(load_function(name).handler(event, None), 400)
+
+
+def test_data_error_is_bad_request(database):
+    assert_error(call('articles', 'DELETE', params={'id': 'abc'}), 400)
+
+
+@pytest.mark.parametrize('name', ['auth', 'chat', 'bookmarks', 'articles'])
+def test_unreachable_database_keeps_cors(database, monkeypatch, name):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://postgres@127.0.0.1:1/unreachable?connect_timeout=1')
+    response = call(name, 'POST', body='{}')
+    assert_error(response, 503, 'Database unavailable')
+    assert response['headers']['Retry-After'] == '1'
+
+
+@pytest.mark.parametrize('name, method, kwargs', [
+    ('auth', 'POST', {'body': json.dumps({'action': 'login', 'username': ['admin'], 'password': 'x'})}),
+    ('auth', 'POST', {'body': json.dumps({'action': 'register', 'username': 'u', 'email': {'a': 1}, 'password': 'x'})}),
+    ('auth', 'POST', {'body': json.dumps({'action': ['login']})}),
+    ('chat', 'POST', {'body': json.dumps({'message': 42})}),
+    ('chat', 'POST', {'body': json.dumps({'message': 'a\u0000b'})}),
+    ('chat', 'POST', {'body': json.dumps({'action': 'read', 'last_read_id': {'id': 1}})}),
+    ('chat', 'GET', {'params': {'since_seq': 'abc'}}),
+    ('chat', 'GET', {'params': {'wait': 'soon', 'since_seq': '1'}}),
+    ('chat', 'GET', {'params': {'view': 'unread', 'user_ids': '1,x'}}),
+    ('bookmarks', 'POST', {'body': json.dumps({'article_ids': [1, 'x']})}),
+    ('bookmarks', 'GET', {'params': {'expand': 'articles', 'cursor': '!!!'}}),
+    ('articles', 'GET', {'params': {'id': 'abc', 'view': 'related'}}),
+    ('articles', 'GET', {'params': {'view': 'delta', 'since': 'abc'}}),
+    ('articles', 'GET', {'params': {'view': 'summary', 'cursor': 'bm9wZQ=='}}),
+    ('articles', 'POST', {'body': json.dumps({'title': {'a': 1}, 'content': 'c', 'category': 'laws'})}),
+    ('articles', 'POST', {'body': json.dumps({'title': 't', 'content': 'c', 'category': 'unknown'})}),
+    ('articles', 'POST', {'body': json.dumps({'title': 't', 'content': 'c', 'category': 'laws', 'tags': 'a'})}),
+    ('articles', 'POST', {'body': json.dumps({'title': 't', 'content': 'c', 'category': 'laws', 'image': 'not base64!'})}),
+    ('articles', 'POST', {'body': json.dumps({'action': 'process_image_jobs', 'limit': 'many'})}),
+    ('articles', 'PUT', {'body': json.dumps({'id': 1, 'content': ['c']})}),
+    ('articles', 'PUT', {'body': json.dumps({'id': 'one', 'title': 't'})}),
+    ('articles', 'POST', {'params': {'action': 'import', 'format': 'xml'}, 'body': ''}),
+])
+def test_invalid_input_is_bad_request(database, name, method, kwargs):
+    assert_error(call(name, method, **kwargs), 400)
+
+
+@pytest.mark.parametrize('name', ['auth', 'chat', 'bookmarks', 'articles'])
+def test_unexpected_error_hides_details(database, name):
+    module = load_function(name)
+    route = 'POST'
+
+    def explode(event, conn, cur):
+        raise ValueError('secret detail')
+
+    response = module.dispatch(make_event(route, body='{}'), {route: explode})
+    assert_error(response, 500, 'Internal server error')
+    assert 'secret' not in response['body']
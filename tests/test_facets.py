@@ -0,0 +1,31 @@
+FACETS_FROM_ARTICLES = '''
+    SELECT 'category', category, count(*) FROM t_p18143168_police_reminder_app.articles GROUP BY category
+    UNION ALL
+    SELECT 'tag', tag, count(*)
+    FROM (SELECT DISTINCT id, unnest(tags) AS tag FROM t_p18143168_police_reminder_app.articles) t
+    GROUP BY tag'''
+
+
+def facet_counts(cur, query: str) -> dict:
+    cur.execute(query)
+    return {(kind, value): count for kind, value, count in cur.fetchall()}
+
+
+def test_facet_counts_follow_bulk_writes(db):
+    with db.cursor() as cur:
+        cur.execute(
+            '''INSERT INTO t_p18143168_police_reminder_app.articles (title, content, category, tags)
+               SELECT 'Facet ' || g, 'text', (ARRAY['laws', 'rights'])[1 + g % 2], ARRAY['facet_a', 'facet_' || (g % 3), 'facet_a']
+               FROM generate_series(1, 30) g'''
+        )
+        cur.execute(
+            '''UPDATE t_p18143168_police_reminder_app.articles
+               SET tags = ARRAY['facet_b'], category = 'documents'
+               WHERE title LIKE 'Facet %' AND right(title, 1) IN ('1', '2')'''
+        )
+        cur.execute("UPDATE t_p18143168_police_reminder_app.articles SET content = 'changed' WHERE title LIKE 'Facet %'")
+        cur.execute("DELETE FROM t_p18143168_police_reminder_app.articles WHERE title LIKE 'Facet %' AND right(title, 1) = '0'")
+
+        maintained = facet_counts(cur, 'SELECT kind, value, count FROM t_p18143168_police_reminder_app.article_facets')
+        assert maintained == facet_counts(cur, FACETS_FROM_ARTICLES)
+        assert all(count > 0 for count in maintained.values())
@@ -0,0 +1,127 @@
+import base64
+import json
+import threading
+
+import pytest
+
+from conftest import auth_headers, load_function, make_event, png_bytes
+
+TIMER_EVENT = {
+    'messages': [{
+        'event_metadata': {'event_type': 'yandex.cloud.events.serverless.triggers.TimerMessage'},
+        'details': {'trigger_id': 'articles-image-jobs'},
+    }]
+}
+
+
+def create_article(body: dict) -> dict:
+    payload = {'title': 'Статья с фото', 'content': 'Текст', 'category': 'administrative', **body}
+    response = load_function('articles').handler(
+        make_event('POST', body=json.dumps(payload), headers=auth_headers(admin=True)), None
+    )
+    assert response['statusCode'] == 201, response['body']
+    return json.loads(response['body'])
+
+
+def image_job(db, article_id):
+    with db.cursor() as cursor:
+        cursor.execute(
+            'SELECT image_key, image_data, status FROM t_p18143168_police_reminder_app.image_jobs WHERE article_id = %s',
+            (article_id,)
+        )
+        return cursor.fetchone()
+
+
+def test_base64_image_is_queued_as_s3_key(database, db, s3):
+    articles = load_function('articles')
+    article = create_article({'image': base64.b64encode(png_bytes()).decode(), 'filename': 'фото.png'})
+
+    key, image_data, status = image_job(db, article['id'])
+    assert image_data is None
+    assert status == 'pending'
+    assert articles.IMAGE_KEY_RE.fullmatch(key)
+    assert s3.head_object(Bucket=articles.S3_BUCKET, Key=key)['ContentType'] == 'image/png'
+
+
+def test_base64_non_image_is_rejected(database, s3):
+    payload = {'title': 't', 'content': 'c', 'category': 'administrative', 'image': base64.b64encode(b'<svg/>').decode()}
+    response = load_function('articles').handler(
+        make_event('POST', body=json.dumps(payload), headers=auth_headers(admin=True)), None
+    )
+    assert response['statusCode'] == 400
+
+
+def test_timer_trigger_drains_image_queue(database, db, s3):
+    articles = load_function('articles')
+    key = articles.create_upload_url('photo.png', 'image/png')['image_key']
+    s3.put_object(Bucket=articles.S3_BUCKET, Key=key, Body=png_bytes(), ContentType='image/png')
+    article = create_article({'image_key': key})
+
+    response = articles.handler(TIMER_EVENT, None)
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['done'] >= 1
+    assert image_job(db, article['id'])[2] == 'done'
+    with db.cursor() as cursor:
+        cursor.execute(
+            'SELECT image_status, image_url, image_thumbnails FROM t_p18143168_police_reminder_app.articles WHERE id = %s',
+            (article['id'],)
+        )
+        image_status, image_url, thumbnails = cursor.fetchone()
+    assert image_status == 'ready'
+    assert image_url.endswith(key)
+    assert set(thumbnails) == {str(width) for width in articles.THUMBNAIL_WIDTHS}
+
+
+@pytest.mark.parametrize('event', [
+    {'httpMethod': 'GET', 'messages': TIMER_EVENT['messages']},
+    {'messages': [{'event_metadata': {'event_type': 'yandex.cloud.events.storage.ObjectCreate'}}]},
+    {'messages': []},
+])
+def test_http_and_foreign_events_are_not_triggers(event):
+    assert not load_function('articles').is_trigger_event(event)
+
+
+def test_failure_waits_for_locked_job_instead_of_dropping_it(database, db, s3):
+    articles = load_function('articles')
+    key = articles.create_upload_url('photo.png', 'image/png')['image_key']
+    article = create_article({'image_key': key})
+    with db.cursor() as cursor:
+        cursor.execute(
+            'SELECT id FROM t_p18143168_police_reminder_app.image_jobs WHERE article_id = %s FOR UPDATE',
+            (article['id'],)
+        )
+        job_id = cursor.fetchone()[0]
+
+    conn = articles.get_db_connection()
+    cursor = conn.cursor(cursor_factory=articles.TracedDictCursor)
+    worker = threading.Thread(target=articles.fail_image_job, args=(conn, cursor, {'id': job_id}, RuntimeError('boom')))
+    try:
+        worker.start()
+        worker.join(0.3)
+        assert worker.is_alive()
+        db.commit()
+        worker.join(5)
+        assert not worker.is_alive()
+    finally:
+        cursor.close()
+        articles.release_db_connection(conn)
+
+    with db.cursor() as check:
+        check.execute('SELECT attempts, last_error FROM t_p18143168_police_reminder_app.image_jobs WHERE id = %s', (job_id,))
+        assert check.fetchone() == (1, 'boom')
+
+
+def test_image_worker_queries_are_traced(database, db, s3, monkeypatch):
+    articles = load_function('articles')
+    key = articles.create_upload_url('photo.png', 'image/png')['image_key']
+    s3.put_object(Bucket=articles.S3_BUCKET, Key=key, Body=png_bytes(), ContentType='image/png')
+    create_article({'image_key': key})
+    events = []
+    monkeypatch.setattr(articles, 'log_event', lambda name, **fields: events.append((name, fields)))
+
+    articles.handler(TIMER_EVENT, None)
+
+    image_jobs = dict(events)['image_jobs']
+    assert image_jobs['done'] >= 1
+    assert image_jobs['queries'] >= 3
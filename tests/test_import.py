@@ -0,0 +1,53 @@
+import io
+import json
+
+import pytest
+
+from conftest import auth_headers, load_function, make_event
+
+VALID = {'code': 'КоАП', 'number': '19.3', 'title': 'Неповиновение', 'content': 'Текст статьи', 'category': 'laws', 'tags': ['арест']}
+
+
+def import_ndjson(records) -> dict:
+    body = '\n'.join(json.dumps(record, ensure_ascii=False) for record in records)
+    response = load_function('articles').handler(
+        make_event('POST', params={'action': 'import', 'format': 'ndjson'}, body=body, headers=auth_headers(admin=True)), None
+    )
+    assert response['statusCode'] == 200, response['body']
+    return json.loads(response['body'])
+
+
+@pytest.mark.parametrize('override, error', [
+    ({'title': 5}, 'title must be a string'),
+    ({'content': 5}, 'content must be a string'),
+    ({'content': ['Текст']}, 'content must be a string'),
+    ({'code': {'x': 1}}, 'code must be a string'),
+    ({'number': True}, 'number must be a string'),
+    ({'category': ['laws']}, 'Unknown category'),
+    ({'title': 'Заголовок\x00'}, 'title must not contain NUL characters'),
+    ({'content': 'Текст\x00статьи'}, 'content must not contain NUL characters'),
+    ({'code': 'Ко\x00АП'}, 'code must not contain NUL characters'),
+    ({'tags': ['ар\x00ест']}, 'tags must not contain NUL characters'),
+])
+def test_bad_fields_are_row_errors(database, override, error):
+    report = import_ndjson([{**VALID, 'number': 'bad-1', **override}, {**VALID, 'number': 'ok-1'}])
+
+    assert report['received'] == 2
+    assert report['error_count'] == 1
+    assert report['errors'][0]['line'] == 1
+    assert report['errors'][0]['error'].startswith(error)
+    assert report['inserted'] + report['updated'] + report['unchanged'] == 1
+
+
+def test_nul_in_csv_is_a_row_error(database, db):
+    csv_body = 'code,number,title,content,category,tags\nКоАП,nul-1,Заголовок,Те\x00кст,laws,\nКоАП,nul-2,Заголовок,Текст,laws,арест;штраф\n'
+    report = load_function('articles').import_articles(db, io.StringIO(csv_body, newline=''), 'csv')
+
+    assert report['error_count'] == 1
+    assert report['errors'] == [{'line': 2, 'error': 'content must not contain NUL characters'}]
+    assert report['inserted'] == 1
+
+
+def test_integer_keys_are_accepted():
+    values = load_function('articles').validate_import_record({**VALID, 'code': 'УК', 'number': 318})
+    assert values[:2] == ('УК', '318')
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from conftest import auth_headers, load_function, make_event
+
+
+@pytest.mark.parametrize('function', ['articles', 'auth', 'bookmarks', 'chat'])
+def test_second_checkout_reuses_connection(database, function):
+    module = load_function(function)
+    first = module.get_db_connection()
+    backend_pid = first.get_backend_pid()
+    module.release_db_connection(first)
+
+    second = module.get_db_connection()
+    try:
+        assert second is first
+        assert second.get_backend_pid() == backend_pid
+        assert module.get_db_pool_stats()['open'] >= 1
+    finally:
+        module.release_db_connection(second)
+
+
+@pytest.mark.parametrize('function', ['articles', 'auth', 'bookmarks', 'chat'])
+def test_request_log_carries_pool_stats(database, function, monkeypatch, capsys):
+    module = load_function(function)
+    monkeypatch.setattr(module, 'TRACE_LOG', True)
+    method, body = ('POST', '{"action": "noop"}') if function == 'auth' else ('GET', None)
+    module.handler(make_event(method, body=body, headers=auth_headers()), None)
+
+    record = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert record['event'] == 'request'
+    assert record['db_pool']['acquired'] >= 1
+    assert record['db_pool']['open'] >= 1
+    assert record['db_pool']['in_use'] == 0
+    assert record['db_pool']['max_size'] == module.DB_POOL_MAX_SIZE
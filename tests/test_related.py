@@ -0,0 +1,58 @@
+import json
+
+from conftest import load_function
+from test_image_jobs import TIMER_EVENT
+
+SCHEMA = 't_p18143168_police_reminder_app'
+
+
+def insert_article(db, title: str, content: str) -> int:
+    with db.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {SCHEMA}.articles (title, content, category) VALUES (%s, %s, 'administrative') RETURNING id",
+            (title, content)
+        )
+        article_id = cursor.fetchone()[0]
+    db.commit()
+    return article_id
+
+
+def neighbors(db, article_id: int) -> set:
+    with db.cursor() as cursor:
+        cursor.execute(f'SELECT neighbor_id FROM {SCHEMA}.article_neighbors WHERE article_id = %s', (article_id,))
+        return {row[0] for row in cursor.fetchall()}
+
+
+def queued(db) -> set:
+    with db.cursor() as cursor:
+        cursor.execute(f'SELECT article_id FROM {SCHEMA}.article_similarity_queue')
+        return {row[0] for row in cursor.fetchall()}
+
+
+def test_timer_drops_edited_article_from_stale_neighbor_lists(database, db):
+    articles = load_function('articles')
+    first = insert_article(db, 'Задержание с оружием', 'Порядок задержания вооружённого нарушителя патрулём')
+    second = insert_article(db, 'Задержание нарушителя', 'Патруль задерживает вооружённого нарушителя с оружием')
+    conn = articles.get_db_connection()
+    try:
+        articles.recompute_related(conn, full=True)
+    finally:
+        articles.release_db_connection(conn)
+    db.commit()
+    assert second in neighbors(db, first)
+
+    with db.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {SCHEMA}.articles SET title = 'Налоговая декларация', content = 'Бухгалтерия сдаёт отчётность' WHERE id = %s",
+            (second,)
+        )
+    db.commit()
+    assert {first, second} <= queued(db)
+
+    response = articles.handler(TIMER_EVENT, None)
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['related']['recomputed'] >= 2
+    db.commit()
+    assert second not in neighbors(db, first)
+    assert queued(db) == set()
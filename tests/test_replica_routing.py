@@ -0,0 +1,118 @@
+import json
+from urllib.parse import quote
+
+import pytest
+
+from conftest import auth_headers, load_function, make_event
+
+# Реплику изображает та же база: схема fake_replica стоит в search_path раньше pg_catalog
+# и подменяет функции, по которым check_replica узнаёт позицию и отставание
+FAKE_REPLICA_SQL = '''
+CREATE SCHEMA IF NOT EXISTS fake_replica;
+CREATE TABLE IF NOT EXISTS fake_replica.state (replay_lsn pg_lsn, receive_lsn pg_lsn, replayed_at timestamptz);
+CREATE OR REPLACE FUNCTION fake_replica.pg_last_wal_replay_lsn() RETURNS pg_lsn AS 'SELECT replay_lsn FROM fake_replica.state' LANGUAGE sql;
+CREATE OR REPLACE FUNCTION fake_replica.pg_last_wal_receive_lsn() RETURNS pg_lsn AS 'SELECT receive_lsn FROM fake_replica.state' LANGUAGE sql;
+CREATE OR REPLACE FUNCTION fake_replica.pg_last_xact_replay_timestamp() RETURNS timestamptz AS 'SELECT replayed_at FROM fake_replica.state' LANGUAGE sql;
+'''
+
+GET_EVENTS = {
+    'articles': lambda min_lsn=None: make_event('GET', params={'category': 'laws'}, headers=lsn_headers(min_lsn)),
+    'bookmarks': lambda min_lsn=None: make_event('GET', headers={**auth_headers(), **lsn_headers(min_lsn)}),
+    'chat': lambda min_lsn=None: make_event('GET', headers={**auth_headers(), **lsn_headers(min_lsn)}),
+}
+
+
+def lsn_headers(min_lsn) -> dict:
+    return {'X-Min-LSN': min_lsn} if min_lsn else {}
+
+
+@pytest.fixture
+def replica(database, db):
+    with db.cursor() as cursor:
+        cursor.execute(FAKE_REPLICA_SQL)
+        cursor.execute('TRUNCATE fake_replica.state')
+        cursor.execute('INSERT INTO fake_replica.state VALUES (pg_current_wal_lsn(), pg_current_wal_lsn(), now())')
+    db.commit()
+
+    def set_state(replay_lsn: str = None, lag_seconds: float = 0):
+        with db.cursor() as cursor:
+            cursor.execute(
+                '''UPDATE fake_replica.state SET replay_lsn = COALESCE(%s::pg_lsn, pg_current_wal_lsn()),
+                       receive_lsn = pg_current_wal_lsn() + 1, replayed_at = now() - %s * INTERVAL '1 second' ''',
+                (replay_lsn, lag_seconds)
+            )
+        db.commit()
+
+    separator = '&' if '?' in database else '?'
+    set_state.url = f"{database}{separator}options={quote('-csearch_path=fake_replica,pg_catalog,public')}"
+    return set_state
+
+
+def route(monkeypatch, name: str, replica_url: str):
+    module = load_function(name)
+    monkeypatch.setattr(module, 'DATABASE_REPLICA_URLS', [replica_url])
+    monkeypatch.setattr(module, 'REPLICA_CHECK_INTERVAL', 0)
+    monkeypatch.setattr(module, '_replica_states', {})
+    return module
+
+
+def served_by(module, event: dict) -> str:
+    before = dict(module.db_pool_stats)
+    response = module.handler(event, None)
+    assert response['statusCode'] == 200, response['body']
+    if module.db_pool_stats['replica_reads'] > before['replica_reads']:
+        return 'replica'
+    assert module.db_pool_stats['primary_fallbacks'] > before['primary_fallbacks']
+    return 'primary'
+
+
+def test_read_your_writes_falls_back_until_replica_catches_up(replica, monkeypatch):
+    articles = route(monkeypatch, 'articles', replica.url)
+    replica('0/1')
+    write = articles.handler(make_event(
+        'POST', body=json.dumps({'title': 'Реплика', 'content': 'Текст', 'category': 'laws'}), headers=auth_headers(admin=True)
+    ), None)
+    assert write['statusCode'] == 201
+    lsn = write['headers']['X-LSN']
+    assert 'X-LSN' in write['headers']['Access-Control-Expose-Headers']
+
+    assert served_by(articles, GET_EVENTS['articles'](lsn)) == 'primary'
+    assert served_by(articles, GET_EVENTS['articles']()) == 'replica'
+
+    replica(lsn)
+    assert served_by(articles, GET_EVENTS['articles'](lsn)) == 'replica'
+
+
+@pytest.mark.parametrize('name', sorted(GET_EVENTS))
+def test_lagging_replica_is_skipped(replica, monkeypatch, name):
+    module = route(monkeypatch, name, replica.url)
+    replica()
+    assert served_by(module, GET_EVENTS[name]()) == 'replica'
+
+    replica(lag_seconds=module.REPLICA_MAX_LAG_SECONDS + 10)
+    assert served_by(module, GET_EVENTS[name]()) == 'primary'
+    assert module.get_db_pool_stats()['replicas'][0]['ok'] is False
+
+
+@pytest.mark.parametrize('name', sorted(GET_EVENTS))
+def test_unreachable_replica_falls_back_to_primary(database, monkeypatch, name):
+    module = route(monkeypatch, name, 'postgresql://postgres@127.0.0.1:1/replica?connect_timeout=1')
+    assert served_by(module, GET_EVENTS[name]()) == 'primary'
+    assert module.get_db_pool_stats()['replicas'] == [{'ok': False, 'lag_seconds': None}]
+
+
+def test_primary_without_replay_position_is_not_a_replica(database, monkeypatch):
+    articles = route(monkeypatch, 'articles', f'{database}{"&" if "?" in database else "?"}application_name=not_a_replica')
+    assert served_by(articles, GET_EVENTS['articles']()) == 'primary'
+
+
+def test_writes_never_touch_replicas(replica, monkeypatch):
+    articles = route(monkeypatch, 'articles', replica.url)
+    replica()
+    before = dict(articles.db_pool_stats)
+    response = articles.handler(make_event(
+        'POST', body=json.dumps({'title': 'Запись', 'content': 'Текст', 'category': 'laws'}), headers=auth_headers(admin=True)
+    ), None)
+    assert response['statusCode'] == 201
+    assert articles.db_pool_stats['replica_reads'] == before['replica_reads']
+    assert articles.db_pool_stats['primary_fallbacks'] == before['primary_fallbacks']
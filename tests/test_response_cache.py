@@ -0,0 +1,114 @@
+import json
+import sys
+import time
+
+import pytest
+
+from conftest import auth_headers, load_function, make_event
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    articles = load_function('articles')
+    monkeypatch.setattr(articles, '_response_cache', type(articles._response_cache)())
+    monkeypatch.setattr(articles, 'response_cache_stats', dict.fromkeys(articles.response_cache_stats, 0))
+    return articles
+
+
+def body_of(size: int) -> str:
+    body = 'x' * size
+    return body[:size - (sys.getsizeof(body) - size)]
+
+
+def test_lru_evicts_least_recently_used(cache, monkeypatch):
+    monkeypatch.setattr(cache, 'RESPONSE_CACHE_MAX_BYTES', 4000)
+    for key in 'abc':
+        cache.response_cache_put(('collection', key), 'v1', body_of(900))
+    assert cache.response_cache_get(('collection', 'a'), 'v1') is not None
+
+    cache.response_cache_put(('collection', 'd'), 'v1', body_of(900))
+    cache.response_cache_put(('collection', 'e'), 'v1', body_of(900))
+
+    assert cache.response_cache_get(('collection', 'b'), 'v1') is None
+    assert cache.response_cache_get(('collection', 'a'), 'v1') is not None
+    stats = cache.get_response_cache_stats()
+    assert stats['evictions'] == 1
+    assert stats['entries'] == 4
+    assert stats['bytes'] <= 4000
+
+
+def test_byte_cap_skips_oversized_bodies(cache, monkeypatch):
+    monkeypatch.setattr(cache, 'RESPONSE_CACHE_MAX_BYTES', 4000)
+    cache.response_cache_put(('collection', 'big'), 'v1', body_of(1100))
+
+    assert cache.response_cache_get(('collection', 'big'), 'v1') is None
+    assert cache.get_response_cache_stats()['bytes'] == 0
+
+
+def test_ttl_expires_entries(cache, monkeypatch):
+    monkeypatch.setattr(cache, 'RESPONSE_CACHE_TTL', 0.05)
+    cache.response_cache_put(('article', '1'), 'v1', '{}')
+    assert cache.response_cache_get(('article', '1'), 'v1') == '{}'
+    time.sleep(0.1)
+
+    assert cache.response_cache_get(('article', '1'), 'v1') is None
+    stats = cache.get_response_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['expirations'], stats['entries'], stats['bytes']) == (1, 1, 1, 0, 0)
+
+
+def test_version_mismatch_is_stale(cache):
+    cache.response_cache_put(('article', '1'), 'v1', '{}')
+    assert cache.response_cache_get(('article', '1'), 'v2') is None
+    assert cache.get_response_cache_stats()['stale'] == 1
+
+
+def call(method: str, **kwargs) -> dict:
+    return load_function('articles').handler(make_event(method, **kwargs), None)
+
+
+def test_writes_invalidate_cached_responses(database, cache):
+    admin = auth_headers(admin=True)
+    created = call('POST', body=json.dumps({'title': 'Кэш', 'content': 'Текст', 'category': 'laws'}), headers=admin)
+    article_id = str(json.loads(created['body'])['id'])
+
+    def warm():
+        assert call('GET', params={'category': 'laws'})['statusCode'] == 200
+        assert call('GET', params={'id': article_id})['statusCode'] == 200
+        assert call('GET', params={'id': article_id})['headers']['X-Cache'] == 'HIT'
+        assert {('article', article_id)} <= set(cache._response_cache)
+
+    def collections():
+        return [key for key in cache._response_cache if key[0] == 'collection']
+
+    warm()
+    call('POST', body=json.dumps({'title': 'Ещё', 'content': 'Текст', 'category': 'laws'}), headers=admin)
+    assert collections() == []
+    assert ('article', article_id) in cache._response_cache
+
+    warm()
+    call('PUT', body=json.dumps({'id': int(article_id), 'title': 'Кэш 2'}), headers=admin)
+    assert collections() == []
+    assert ('article', article_id) not in cache._response_cache
+
+    warm()
+    call('DELETE', params={'id': article_id}, headers=admin)
+    assert collections() == []
+    assert ('article', article_id) not in cache._response_cache
+    assert cache.get_response_cache_stats()['invalidations'] >= 5
+
+
+def test_cache_stats_view_is_admin_only(database, cache):
+    assert call('GET', params={'view': 'cache_stats'})['statusCode'] == 401
+    assert call('GET', params={'view': 'cache_stats'}, headers=auth_headers())['statusCode'] == 403
+
+    response = call('GET', params={'view': 'cache_stats'}, headers=auth_headers(admin=True))
+    assert response['statusCode'] == 200
+    assert {'hits', 'misses', 'evictions', 'expirations', 'invalidations', 'bytes', 'entries'} <= set(json.loads(response['body']))
+
+
+def test_request_log_carries_cache_stats(database, cache, monkeypatch, capsys):
+    monkeypatch.setattr(cache, 'TRACE_LOG', True)
+    call('GET', params={'view': 'facets'})
+    record = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert record['event'] == 'request'
+    assert record['response_cache']['misses'] >= 1
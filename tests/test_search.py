@@ -0,0 +1,23 @@
+from psycopg2.extras import RealDictCursor
+
+from conftest import load_function
+
+
+def insert_article(db, title: str, content: str = 'Текст статьи') -> int:
+    with db.cursor() as cur:
+        cur.execute(
+            '''INSERT INTO t_p18143168_police_reminder_app.articles (title, content, category, tags)
+               VALUES (%s, %s, 'laws', ARRAY[]::text[]) RETURNING id''',
+            (title, content)
+        )
+        return cur.fetchone()[0]
+
+
+def test_short_misspelled_query_falls_back_to_trigrams(db):
+    articles = load_function('articles')
+    article_id = insert_article(db, 'Статья 19.3 КоАП РФ')
+    with db.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute('SET LOCAL search_path TO t_p18143168_police_reminder_app, public')
+        found = articles.search_articles(cur, 'КАП')
+    assert article_id in [row['id'] for row in found]
+    assert all(row['snippet'] is None for row in found)
@@ -0,0 +1,84 @@
+import io
+import json
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pytest
+
+from conftest import auth_headers, load_function, make_event, png_bytes
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def test_upload_url_signs_prefixed_key_and_content_type(s3):
+    articles = load_function('articles')
+    upload = articles.create_upload_url('../../etc/фото 1.png', 'image/png')
+
+    assert upload['image_key'].startswith(articles.IMAGE_KEY_PREFIX)
+    assert articles.IMAGE_KEY_RE.fullmatch(upload['image_key'])
+    assert '..' not in upload['image_key']
+    url = urlsplit(upload['upload_url'])
+    assert unquote(url.path).endswith('/' + upload['image_key'])
+    query = parse_qs(url.query)
+    # SigV4 перечисляет подписанные заголовки, SigV2 подписывает Content-Type всегда
+    signed = query.get('X-Amz-SignedHeaders', query.get('content-type', ['']))[0]
+    assert 'content-type' in signed or signed == 'image/png'
+    assert 'X-Amz-Signature' in query or 'Signature' in query
+    assert upload['expires_in'] == articles.UPLOAD_URL_TTL
+
+
+@pytest.mark.parametrize('key', [
+    'other/photo.png',
+    'articles/../secrets.png',
+    'articles/photo.png',
+    '/articles/00000000-0000-0000-0000-000000000000_photo.png',
+    ['articles/00000000-0000-0000-0000-000000000000_photo.png'],
+])
+def test_foreign_image_key_is_rejected(key):
+    articles = load_function('articles')
+    with pytest.raises(articles.HttpError) as error:
+        articles.prepare_image_job({'image_key': key})
+    assert error.value.status == 400
+
+
+def test_uploaded_key_is_sniffed_and_thumbnailed(s3):
+    articles = load_function('articles')
+    key = articles.create_upload_url('photo.png', 'image/png')['image_key']
+    s3.put_object(Bucket=articles.S3_BUCKET, Key=key, Body=png_bytes(), ContentType='image/png')
+
+    image = articles.process_image_job(articles.prepare_image_job({'image_key': key}))
+
+    assert set(image['image_thumbnails']) == {str(width) for width in articles.THUMBNAIL_WIDTHS}
+    for width in articles.THUMBNAIL_WIDTHS:
+        thumbnail = s3.get_object(Bucket=articles.S3_BUCKET, Key=f"{key.rsplit('.', 1)[0]}_w{width}.webp")
+        assert thumbnail['ContentType'] == 'image/webp'
+        assert Image.open(io.BytesIO(thumbnail['Body'].read())).width == width
+
+
+def test_uploaded_non_image_is_rejected_by_content(s3):
+    articles = load_function('articles')
+    key = articles.create_upload_url('photo.png', 'image/png')['image_key']
+    s3.put_object(Bucket=articles.S3_BUCKET, Key=key, Body=b'<html>not an image</html>', ContentType='image/png')
+
+    with pytest.raises(ValueError, match='Unsupported image format'):
+        articles.process_image_job(articles.prepare_image_job({'image_key': key}))
+
+
+@pytest.mark.parametrize('content_type, status', [
+    ('image/png', 200),
+    ('image/webp', 200),
+    ('image/svg+xml', 400),
+    ('text/html', 400),
+    (None, 400),
+])
+def test_upload_url_content_types(database, s3, content_type, status):
+    articles = load_function('articles')
+    body = json.dumps({'action': 'upload_url', 'filename': 'photo', 'content_type': content_type})
+    response = articles.handler(make_event('POST', body=body, headers=auth_headers(admin=True)), None)
+    assert response['statusCode'] == status
+
+
+def test_upload_url_requires_admin(database, s3):
+    articles = load_function('articles')
+    body = json.dumps({'action': 'upload_url', 'filename': 'photo.png', 'content_type': 'image/png'})
+    assert articles.handler(make_event('POST', body=body), None)['statusCode'] == 401
+    assert articles.handler(make_event('POST', body=body, headers=auth_headers()), None)['statusCode'] == 403